@@ -0,0 +1,104 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+
+MAX_CONCURRENT_CHATS = int(os.getenv("MAX_CONCURRENT_CHATS", "16"))
+MAX_QUEUED_CHATS = int(os.getenv("MAX_QUEUED_CHATS", "64"))
+MAX_QUEUED_PER_USER = int(os.getenv("MAX_QUEUED_PER_USER", "4"))
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be queued; retry_after is a suggested wait in seconds"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Mailbox:
+    def __init__(self):
+        self.lock = asyncio.Lock()  # asyncio.Lock wakes waiters in FIFO order
+        self.pending = 0
+
+
+class AdmissionTicket:
+    """Yielded by ChatAdmission.admit while the message holds a global slot and its user's mailbox"""
+
+    def __init__(self, admission: "ChatAdmission"):
+        self._admission = admission
+        self._started = time.monotonic()
+        self.holds_slot = True
+
+    def release_slot(self):
+        """Give the global slot back but keep the user's mailbox, e.g. before waiting on a sub-agent"""
+        if self.holds_slot:
+            self.holds_slot = False
+            self._admission._release(time.monotonic() - self._started)
+
+
+class ChatAdmission:
+    """Global concurrency cap with a bounded queue, plus an ordered mailbox per user"""
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_CHATS, max_queued: int = MAX_QUEUED_CHATS,
+                 max_queued_per_user: int = MAX_QUEUED_PER_USER):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.max_queued_per_user = max_queued_per_user
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._mailboxes: Dict[str, _Mailbox] = {}
+        self._admitted = 0  # running + waiting
+        self._running = 0
+        self._avg_service_time = 1.0  # seconds, moving average
+
+    def stats(self) -> dict:
+        return {
+            "running": self._running,
+            "queued": self._admitted - self._running,
+            "users": len(self._mailboxes),
+            "avg_service_time": round(self._avg_service_time, 3),
+        }
+
+    def _retry_after(self) -> float:
+        # Time for the current backlog to drain at full concurrency
+        backlog = max(self._admitted - self.max_concurrent, 0) + 1
+        return max(1.0, round(backlog * self._avg_service_time / self.max_concurrent, 1))
+
+    @asynccontextmanager
+    async def admit(self, user_id: str):
+        """Wait for this user's earlier messages and a free slot, or fail fast when the queue is full"""
+        if self._admitted >= self.max_concurrent + self.max_queued:
+            raise AdmissionRejected("server busy", self._retry_after())
+
+        mailbox = self._mailboxes.get(user_id)
+        if mailbox is None:
+            mailbox = self._mailboxes[user_id] = _Mailbox()
+        if mailbox.pending >= self.max_queued_per_user:
+            raise AdmissionRejected("too many messages in flight for this user", self._retry_after())
+
+        mailbox.pending += 1
+        self._admitted += 1
+        ticket = None
+        try:
+            async with mailbox.lock:
+                await self._slots.acquire()
+                self._running += 1
+                ticket = AdmissionTicket(self)
+                try:
+                    yield ticket
+                finally:
+                    ticket.release_slot()
+        finally:
+            if ticket is None:
+                self._admitted -= 1  # gave up before getting a slot
+            mailbox.pending -= 1
+            if mailbox.pending == 0:
+                del self._mailboxes[user_id]
+
+    def _release(self, elapsed: float):
+        self._slots.release()
+        self._running -= 1
+        self._admitted -= 1
+        self._avg_service_time = 0.9 * self._avg_service_time + 0.1 * elapsed
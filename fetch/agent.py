@@ -1,3 +1,5 @@
+import asyncio
+import contextvars
 import os
 from dotenv import load_dotenv
 import requests
@@ -16,6 +18,16 @@ from datetime import datetime, timezone
 from uuid import uuid4
 from typing import List, Optional
 from pydantic import BaseModel
+from pending_requests import PendingRequestRegistry, ResponseWaiters
+from state_backend import MemoryStateBackend, create_state_backend
+from admission import AdmissionRejected, AdmissionTicket, ChatAdmission
+from local_backups import normalize_entry, unconfirmed_entries
+from result_inbox import ResultInbox
+from reminder_scheduler import REMINDER_TICK, ReminderScheduler, next_fire_text
+from router import HashRing
+from emergency import detect_emergency
+from specialty_resolver import MIN_CONFIDENCE as SPECIALTY_MIN_CONFIDENCE, normalize_specialty, resolve_specialty
+from wellness_analytics import WellnessAnalytics
 
 # Load environment variables
 load_dotenv()
@@ -32,7 +44,7 @@ HEADERS = {
 # ASI1 API settings
 # Create yours at: https://asi1.ai/dashboard/api-keys
 ASI1_API_KEY = os.getenv("ASI1_API_KEY")
-ASI1_BASE_URL = "https://api.asi1.ai/v1"
+ASI1_BASE_URL = os.getenv("ASI1_BASE_URL", "https://api.asi1.ai/v1")
 
 if not ASI1_API_KEY:
     raise ValueError("ASI1_API_KEY not found in environment variables. Please check your .env file.")
@@ -44,12 +56,15 @@ ASI1_HEADERS = {
 }
 
 # Healthcare data storage (local backup, primary storage is ICP canister)
-user_symptoms = []
-user_reminders = []
 emergency_status = False
 
-# Conversation context tracking
-user_contexts = {}  # Store user conversation states
+# Conversation context, local symptom/reminder backups, pending requests and agent addresses.
+# STATE_BACKEND=sqlite or redis lets several HealthAgent processes share them and keeps them across restarts.
+state = create_state_backend()
+CONTEXT_TTL = int(os.getenv("CONTEXT_TTL_SECONDS", "1800"))  # idle conversation context expires after this
+# Symptoms and reminders the canister has not confirmed are kept per user, newest first out, until it does
+LOCAL_HISTORY_LIMIT = 20
+LOCAL_HISTORY_TTL = 7 * 24 * 3600  # seconds
 
 # REST endpoint models for Flask API integration
 class FileData(Model):
@@ -62,6 +77,7 @@ class ChatRequest(Model):
     message: str
     user_id: str
     file: Optional[FileData] = None
+    wait_seconds: Optional[float] = None  # wait up to this long for a sub-agent's final answer
 
 class ChatResponse(Model):
     response: str
@@ -73,6 +89,20 @@ class ChatResponse(Model):
     user_id: str
     communication_status: str
     file_analysis: Optional[dict] = None
+    retry_after: Optional[float] = None  # seconds, set when communication_status is "busy"
+    result: Optional[dict] = None  # sub-agent's final result, when wait_seconds was given and it arrived in time
+
+class ResultsRequest(Model):
+    user_id: str
+    after: int = 0  # last seq the client has seen
+    epoch: Optional[str] = None  # inbox epoch that seq belongs to; a different one resets the cursor
+    timeout: float = 25.0  # seconds to hold the request open when nothing is waiting
+
+class ResultsResponse(Model):
+    user_id: str
+    results: List[dict]
+    last_seq: int
+    epoch: str  # send back with last_seq; changes when the agent restarts
 
 # Protocol definitions for inter-agent communication
 class DoctorBookingRequest(Model):
@@ -107,6 +137,7 @@ class MedicineCheckResponse(Model):
     pharmacy_name: str = "HealthPlus Pharmacy"
     status: str
     message: str
+    alternatives: Optional[List[dict]] = None  # in-stock substitutes when unavailable
 
 class MedicineOrderRequest(Model):
     medicine_id: str
@@ -114,6 +145,7 @@ class MedicineOrderRequest(Model):
     quantity: int
     user_id: str
     prescription_id: Optional[str] = None
+    request_id: Optional[str] = None
 
 class MedicineOrderResponse(Model):
     type: str = "MedicineOrderResponse"
@@ -125,6 +157,8 @@ class MedicineOrderResponse(Model):
     order_id: Optional[str] = None
     message: str
     suggested_alternatives: Optional[List[dict]] = None
+    request_id: Optional[str] = None  # echoed from MedicineOrderRequest
+    user_id: Optional[str] = None
 
 # === NEW: Unified Medicine Purchase Models (like Doctor Booking) ===
 class MedicinePurchaseRequest(Model):
@@ -142,6 +176,26 @@ class MedicinePurchaseResponse(Model):
     order_id: Optional[str] = None
     total_price: Optional[float] = None
     message: str
+    suggested_alternatives: Optional[List[dict]] = None  # in-stock substitutes when out of stock
+
+# Cart purchase: several medicines in one message
+class CartLine(Model):
+    medicine_name: str
+    quantity: int = 1
+
+class MedicineCartRequest(Model):
+    request_id: str  # For correlation
+    lines: List[CartLine]
+    user_id: str
+    prescription_id: Optional[str] = None
+    auto_order: bool = True  # Place the available lines in one batched order
+
+class MedicineCartResponse(Model):
+    request_id: str  # Echo back for correlation
+    status: str  # "success", "available", "partial", "error"
+    lines: List[dict]  # per line: medicine_name, matched_name, medicine_id, quantity, status, order_id, total_price, message, suggested_alternatives
+    total_price: float = 0.0
+    message: str
 
 class LogRequest(Model):
     request_id: str  # For correlation
@@ -214,16 +268,40 @@ class RequestACK(Model):
     message: str = "Request received and processing"
     timestamp: str
 
-# Store connected agents
-connected_agents = {}
-pending_requests = {}  # Track active requests by request_id
-user_request_mapping = {}  # Map request_id to user_sender for notifications
+# Active requests by request_id and by user, with timeouts
+# With a shared backend each worker only expires the requests it created
+pending_requests = PendingRequestRegistry(backend=None if isinstance(state, MemoryStateBackend) else state,
+                                          owner=os.getenv("HEALTH_SHARD_SELF", "local"))
+PENDING_SWEEP_INTERVAL = 10  # seconds between expiry sweeps
+STATE_PURGE_INTERVAL = 300  # seconds between sweeps of expired context and history entries
+# /api/chat callers that asked to wait for the final answer, keyed by request_id
+response_waiters = ResponseWaiters()
+MAX_CHAT_WAIT = 30  # seconds
+
+# Where a user talks to the agent: results go back as a ChatMessage, or to the REST result inbox
+ORIGIN_CHAT = "chat"
+ORIGIN_REST = "rest"
+# Set by the chat and /api/chat handlers; recorded on every pending request they start
+request_origin: contextvars.ContextVar = contextvars.ContextVar("request_origin", default=ORIGIN_REST)
+
+def remember_origin(user_id: str, origin: str):
+    """Record how user_id reaches the agent, for results not tied to a request (e.g. reminders)"""
+    request_origin.set(origin)
+    if state.get("user_origin", user_id) != origin:
+        state.set("user_origin", user_id, origin)
+
+def origin_of(user_id: str, request_info: dict = None) -> str:
+    """Origin recorded on the request, else the user's last known origin; REST if neither is known"""
+    if request_info and request_info.get("origin"):
+        return request_info["origin"]
+    return state.get("user_origin", user_id, ORIGIN_REST)
 
 async def store_to_icp(endpoint: str, data: dict) -> dict:
     """Store data to ICP canister backend"""
+    # requests is blocking, so calls to the canister and ASI1 run in a thread to keep the event loop free
     try:
         url = f"{BASE_URL}/{endpoint}"
-        response = requests.post(url, headers=HEADERS, json=data, timeout=30)
+        response = await asyncio.to_thread(requests.post, url, headers=HEADERS, json=data, timeout=30)
         response.raise_for_status()
         return response.json()
     except Exception as e:
@@ -234,9 +312,9 @@ async def get_from_icp(endpoint: str, params: dict = None) -> dict:
     try:
         url = f"{BASE_URL}/{endpoint}"
         if params:
-            response = requests.post(url, headers=HEADERS, json=params, timeout=30)
+            response = await asyncio.to_thread(requests.post, url, headers=HEADERS, json=params, timeout=30)
         else:
-            response = requests.get(url, headers=HEADERS, timeout=30)
+            response = await asyncio.to_thread(requests.get, url, headers=HEADERS, timeout=30)
         response.raise_for_status()
         return response.json()
     except Exception as e:
@@ -347,7 +425,8 @@ IMPORTANT: This is for informational purposes only. Always recommend consulting
         # Use longer timeout for image analysis
         timeout = 60 if analysis_type == "image_analysis" else 30
         
-        response = requests.post(
+        response = await asyncio.to_thread(
+            requests.post,
             f"{ASI1_BASE_URL}/chat/completions",
             headers=ASI1_HEADERS,
             json=payload,
@@ -434,7 +513,8 @@ Examples:
 
 Respond only with valid JSON, no additional text."""
 
-        response = requests.post(
+        response = await asyncio.to_thread(
+            requests.post,
             f"{ASI1_BASE_URL}/chat/completions",
             headers=ASI1_HEADERS,
             json={
@@ -539,7 +619,8 @@ Respond with exactly one of these:
 
 Respond with only the classification word, nothing else."""
 
-        response = requests.post(
+        response = await asyncio.to_thread(
+            requests.post,
             f"{ASI1_BASE_URL}/chat/completions",
             headers=ASI1_HEADERS,
             json={
@@ -586,7 +667,8 @@ Examples:
 
 Respond only with valid JSON, no additional text."""
 
-        response = requests.post(
+        response = await asyncio.to_thread(
+            requests.post,
             f"{ASI1_BASE_URL}/chat/completions",
             headers=ASI1_HEADERS,
             json={
@@ -672,7 +754,8 @@ Examples:
             "max_tokens": 20
         }
 
-        response = requests.post(
+        response = await asyncio.to_thread(
+            requests.post,
             f"{ASI1_BASE_URL}/chat/completions",
             headers=ASI1_HEADERS,
             json=payload,
@@ -705,18 +788,17 @@ Examples:
 
 def set_user_context(sender: str, context: dict):
     """Set conversation context for a user"""
-    if sender not in user_contexts:
-        user_contexts[sender] = {}
-    user_contexts[sender].update(context)
+    user_context = state.get("context", sender, {})
+    user_context.update(context)
+    state.set("context", sender, user_context, ttl=CONTEXT_TTL)
 
 def clear_user_context(sender: str):
     """Clear conversation context for a user"""
-    if sender in user_contexts:
-        del user_contexts[sender]
+    state.delete("context", sender)
 
 def get_user_context(sender: str) -> dict:
     """Get conversation context for a user"""
-    return user_contexts.get(sender, {})
+    return state.get("context", sender, {})
 
 async def handle_image_analysis(message: str, file_data: FileData, ctx: Context, sender: str = "default_user") -> str:
     """Handle image analysis requests by asking the user for their preferred analysis type."""
@@ -794,8 +876,10 @@ async def handle_symptom_logging(symptoms_text: str, ctx: Context, sender: str =
         ctx.logger.info("Analyzing symptoms with ASI1 LLM...")
         asi1_result = await analyze_with_asi1(symptoms_text, "current")
 
-        # Store locally as backup
-        user_symptoms.append(symptom_data)
+        # Keep a local backup only if the canister did not confirm the write
+        if not store_result.get("success"):
+            ctx.logger.warning(f"Symptoms for {sender} not confirmed by ICP, keeping local backup: {store_result.get('error') or store_result.get('message')}")
+            state.append("symptoms", sender, symptom_data, max_items=LOCAL_HISTORY_LIMIT, ttl=LOCAL_HISTORY_TTL)
 
         # Build detailed response message
         response_parts = [f"**Symptoms logged successfully!**"]
@@ -879,15 +963,47 @@ async def handle_medication_reminder(reminder_text: str, ctx: Context, sender: s
         # Store to ICP canister
         store_result = await store_to_icp("store-reminder", reminder_data)
 
-        # Store locally as backup
-        user_reminders.append(reminder_data)
+        # Keep a local backup only if the canister did not confirm the write
+        if not store_result.get("success"):
+            ctx.logger.warning(f"Reminder for {sender} not confirmed by ICP, keeping local backup: {store_result.get('error') or store_result.get('message')}")
+            state.append("reminders", sender, reminder_data, max_items=LOCAL_HISTORY_LIMIT, ttl=LOCAL_HISTORY_TTL)
 
-        return f"Reminder set: Take {reminder_info['medicine']} at {reminder_info['time']}. You'll be notified at the scheduled time."
+        fire_at = reminder_scheduler.schedule(reminder_data)
+        if fire_at is None:
+            ctx.logger.info(f"⏰ Reminder time not schedulable for {sender}: {reminder_info['time']!r}")
+            return (f"Reminder saved: Take {reminder_info['medicine']} {reminder_info['time']}. I couldn't work out a fixed time from that, "
+                    f"so I won't send a notification for it. Try something like 'at 8 am', 'twice daily' or 'every 8 hours'.")
+        return f"Reminder set: Take {reminder_info['medicine']} at {reminder_info['time']}. You'll be notified at the scheduled time (next: {next_fire_text(fire_at)})."
 
     except Exception as e:
         ctx.logger.error(f"Error setting medication reminder: {str(e)}")
         return "Sorry, I had trouble setting up your medication reminder. Please try again with a format like 'remind me to take paracetamol at 8PM'."
 
+# Fire-and-forget tasks; kept referenced so they are not garbage collected before they finish
+background_tasks = set()
+
+def run_in_background(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def record_emergency_alert(ctx: Context, emergency_data: dict, attempts: int = 3):
+    """Write an emergency alert to the canister, retrying, without holding up the user's response"""
+    for attempt in range(1, attempts + 1):
+        try:
+            # requests is blocking, so the call runs in a thread to keep the event loop free
+            response = await asyncio.to_thread(
+                requests.post, f"{BASE_URL}/emergency-alert", headers=HEADERS, json=emergency_data, timeout=30
+            )
+            response.raise_for_status()
+            ctx.logger.info(f"🚨 Emergency alert recorded for {emergency_data['user_id']}")
+            return
+        except Exception as e:
+            ctx.logger.error(f"🚨 Recording emergency alert for {emergency_data['user_id']} failed (attempt {attempt}/{attempts}): {str(e)}")
+            if attempt < attempts:
+                await asyncio.sleep(attempt)
+
 async def handle_emergency(ctx: Context, sender: str = "default_user") -> str:
     """Handle emergency situations"""
     global emergency_status
@@ -898,13 +1014,13 @@ async def handle_emergency(ctx: Context, sender: str = "default_user") -> str:
             "status": "active"
         }
 
-        # Store to ICP canister
-        store_result = await store_to_icp("emergency-alert", emergency_data)
+        # Store to ICP canister in the background; the user gets the instructions right away
+        run_in_background(record_emergency_alert(ctx, emergency_data))
 
         # Set local emergency flag
         emergency_status = True
 
-        return "EMERGENCY RECORDED. Please call emergency services (911/112) immediately if you need urgent medical assistance. This alert has been logged in your health record."
+        return "EMERGENCY RECORDED. Please call emergency services (911/112) immediately if you need urgent medical assistance. This alert is being logged in your health record."
 
     except Exception as e:
         ctx.logger.error(f"Error handling emergency: {str(e)}")
@@ -916,14 +1032,16 @@ async def analyze_historical_symptoms(ctx: Context, sender: str = "default_user"
         # Get symptom history from ICP
         icp_result = await get_from_icp("get-symptom-history", {"user_id": sender})
 
-        all_symptoms = []
+        confirmed = []
 
-        # Extract symptoms from ICP
+        # Extract symptoms from ICP; entries arrive with numeric field hashes
         if "error" not in icp_result and "symptoms" in icp_result:
-            all_symptoms.extend([entry["symptoms"] for entry in icp_result["symptoms"]])
+            confirmed = [normalize_entry(entry) for entry in icp_result["symptoms"]]
 
-        # Add local backup symptoms
-        all_symptoms.extend([entry["symptoms"] for entry in user_symptoms])
+        # Add this user's local backups the canister does not have
+        all_symptoms = [entry["symptoms"] for entry in confirmed if entry.get("symptoms")]
+        all_symptoms.extend(entry["symptoms"] for entry in unconfirmed_entries(
+            state, "symptoms", sender, confirmed, max_items=LOCAL_HISTORY_LIMIT, ttl=LOCAL_HISTORY_TTL))
 
         if not all_symptoms:
             return "No symptom history found. Start logging your symptoms by telling me how you feel!"
@@ -1090,7 +1208,8 @@ Examples:
             "response_format": {"type": "json_object"}
         }
 
-        response = requests.post(
+        response = await asyncio.to_thread(
+            requests.post,
             f"{ASI1_BASE_URL}/chat/completions",
             headers=ASI1_HEADERS,
             json=payload,
@@ -1178,7 +1297,8 @@ async def generate_natural_cancel_response(cancellation_info: dict, cancel_resul
             "max_tokens": 300
         }
 
-        response = requests.post(
+        response = await asyncio.to_thread(
+            requests.post,
             f"{ASI1_BASE_URL}/chat/completions",
             headers=ASI1_HEADERS,
             json=payload,
@@ -1308,7 +1428,8 @@ Keep it simple, accurate, and helpful. Only mention common, well-known uses."""
             "max_tokens": 50
         }
 
-        response = requests.post(
+        response = await asyncio.to_thread(
+            requests.post,
             f"{ASI1_BASE_URL}/chat/completions",
             headers=ASI1_HEADERS,
             json=payload,
@@ -1353,7 +1474,8 @@ Aspirin"""
             "max_tokens": 100
         }
 
-        response = requests.post(
+        response = await asyncio.to_thread(
+            requests.post,
             f"{ASI1_BASE_URL}/chat/completions",
             headers=ASI1_HEADERS,
             json=payload,
@@ -1402,7 +1524,8 @@ Only respond with the specialty name, nothing else."""
             "max_tokens": 50
         }
 
-        response = requests.post(
+        response = await asyncio.to_thread(
+            requests.post,
             f"{ASI1_BASE_URL}/chat/completions",
             headers=ASI1_HEADERS,
             json=payload,
@@ -1431,12 +1554,21 @@ Only respond with the specialty name, nothing else."""
         ctx.logger.error(f"LLM specialty extraction failed: {str(e)}")
         return "general practitioner"
 
+async def extract_specialty(message: str, ctx: Context) -> str:
+    """Specialty from the local synonym resolver, asking the LLM only when the resolver is unsure"""
+    match = resolve_specialty(message)
+    if match.confidence >= SPECIALTY_MIN_CONFIDENCE:
+        ctx.logger.info(f"Resolved specialty locally: {match.specialty} (confidence {match.confidence}, terms {', '.join(match.terms)})")
+        return match.specialty
+    ctx.logger.info(f"Local specialty resolver unsure ({match.specialty}, confidence {match.confidence}), asking LLM")
+    return normalize_specialty(await extract_specialty_with_llm(message, ctx))
+
 async def route_to_doctor_agent(message: str, ctx: Context, user_sender: str = None) -> str:
     """Route doctor booking request to DoctorAgent"""
     try:
-        # Use LLM to intelligently extract specialty
-        ctx.logger.info(f" Analyzing booking request with AI: '{message}'")
-        specialty = await extract_specialty_with_llm(message, ctx)
+        # Resolve the specialty locally, falling back to the LLM
+        ctx.logger.info(f" Analyzing booking request: '{message}'")
+        specialty = await extract_specialty(message, ctx)
 
         # Extract timing and urgency using LLM for better understanding
         timing_info = await extract_appointment_timing_with_llm(message, ctx)
@@ -1458,15 +1590,8 @@ async def route_to_doctor_agent(message: str, ctx: Context, user_sender: str = N
         )
 
         # Track pending request
-        pending_requests[request_id] = {
-            "type": "doctor",
-            "specialty": specialty,
-            "timestamp": datetime.now(),
-            "user_sender": user_sender,
-            "urgency": urgency
-        }
-        if user_sender:
-            user_request_mapping[request_id] = user_sender
+        pending_requests.add(request_id, "doctor", user_sender, origin=request_origin.get(), specialty=specialty, urgency=urgency)
+        response_waiters.track(request_id)
 
         # Send request to DoctorAgent
 
@@ -1526,12 +1651,12 @@ async def extract_medicine_info_with_llm(message: str, ctx: Context) -> dict:
         system_prompt = """You are a pharmacy assistant AI. Extract medicine information from user requests.
 
 Analyze the user's message and extract:
-1. Medicine name (generic or brand name)
+1. Every medicine requested (generic or brand name), each with its quantity if mentioned
 2. Request type (check availability, order/buy, general inquiry)
-3. Quantity if mentioned
-4. Any specific requirements (prescription, dosage, etc.)
+3. Any specific requirements (prescription, dosage, etc.)
 
-Respond in JSON format with: {"medicine_name": "", "request_type": "check|order|inquiry", "quantity": 1, "requirements": ""}
+Respond in JSON format with: {"medicines": [{"medicine_name": "", "quantity": 1}], "request_type": "check|order|inquiry", "requirements": ""}
+List one entry per medicine, in the order the user mentioned them.
 
 Common medicines: Paracetamol, Ibuprofen, Aspirin, Insulin, Amoxicillin, Omeprazole, Metformin, Vitamin D, etc.
 If medicine name is unclear, use the closest match or "medication"."""
@@ -1549,7 +1674,8 @@ If medicine name is unclear, use the closest match or "medication"."""
             "response_format": {"type": "json_object"}
         }
 
-        response = requests.post(
+        response = await asyncio.to_thread(
+            requests.post,
             f"{ASI1_BASE_URL}/chat/completions",
             headers=ASI1_HEADERS,
             json=payload,
@@ -1564,24 +1690,42 @@ If medicine name is unclear, use the closest match or "medication"."""
                 medicine_info = json.loads(content)
                 ctx.logger.info(f" LLM extracted medicine info: {medicine_info}")
 
-                # Validate and sanitize the response
+                # Validate and sanitize the response; a single-medicine answer is still accepted
+                entries = medicine_info.get("medicines")
+                if not isinstance(entries, list) or not entries:
+                    entries = [medicine_info]
+                medicines = []
+                for entry in entries:
+                    if isinstance(entry, dict) and entry.get("medicine_name"):
+                        medicines.append({
+                            "medicine_name": str(entry["medicine_name"]),
+                            "quantity": max(1, int(entry.get("quantity") or 1))
+                        })
+                if not medicines:
+                    medicines = [{"medicine_name": "medication", "quantity": 1}]
+
+                # medicine_name and quantity describe the first medicine, for single-item callers
                 validated_info = {
-                    "medicine_name": str(medicine_info.get("medicine_name", "medication")),
+                    "medicine_name": medicines[0]["medicine_name"],
                     "request_type": str(medicine_info.get("request_type", "check")),
-                    "quantity": int(medicine_info.get("quantity", 1)) if medicine_info.get("quantity") else 1,
-                    "requirements": str(medicine_info.get("requirements", ""))
+                    "quantity": medicines[0]["quantity"],
+                    "requirements": str(medicine_info.get("requirements", "")),
+                    "medicines": medicines
                 }
                 return validated_info
             except (json.JSONDecodeError, ValueError, TypeError) as e:
                 ctx.logger.warning(f"LLM returned invalid data, using fallback: {str(e)}")
-                return {"medicine_name": "medication", "request_type": "check", "quantity": 1, "requirements": ""}
+                return {"medicine_name": "medication", "request_type": "check", "quantity": 1, "requirements": "",
+                        "medicines": [{"medicine_name": "medication", "quantity": 1}]}
         else:
             ctx.logger.warning(f"ASI1 API error: {response.status_code}")
-            return {"medicine_name": "medication", "request_type": "check", "quantity": 1, "requirements": ""}
+            return {"medicine_name": "medication", "request_type": "check", "quantity": 1, "requirements": "",
+                    "medicines": [{"medicine_name": "medication", "quantity": 1}]}
 
     except Exception as e:
         ctx.logger.error(f"LLM medicine extraction failed: {str(e)}")
-        return {"medicine_name": "medication", "request_type": "check", "quantity": 1, "requirements": ""}
+        return {"medicine_name": "medication", "request_type": "check", "quantity": 1, "requirements": "",
+                "medicines": [{"medicine_name": "medication", "quantity": 1}]}
 
 async def route_to_pharmacy_agent(message: str, ctx: Context, user_sender: str = None) -> str:
     """Route medicine purchase to PharmacyAgent using unified request like doctor booking"""
@@ -1603,6 +1747,11 @@ async def route_to_pharmacy_agent(message: str, ctx: Context, user_sender: str =
         # Use LLM-extracted request type to determine if this is an order
         is_order_request = request_type == "order"
 
+        # Several medicines go to the pharmacy as one cart
+        medicines = medicine_info.get("medicines") or []
+        if len(medicines) > 1:
+            return await route_cart_to_pharmacy_agent(medicines, is_order_request, ctx, user_sender)
+
         ctx.logger.info(f"Medicine: {medicine_name}, Type: {request_type}, Quantity: {quantity}, Is Order: {is_order_request}")
 
         try:
@@ -1618,16 +1767,16 @@ async def route_to_pharmacy_agent(message: str, ctx: Context, user_sender: str =
             )
 
             # Track pending request
-            pending_requests[request_id] = {
-                "type": "pharmacy_purchase",
-                "medicine": medicine_name,
-                "timestamp": datetime.now(),
-                "user_sender": user_sender,
-                "is_order_request": is_order_request,
-                "quantity": quantity
-            }
-            if user_sender:
-                user_request_mapping[request_id] = user_sender
+            pending_requests.add(
+                request_id,
+                "pharmacy_purchase",
+                user_sender,
+                origin=request_origin.get(),
+                medicine=medicine_name,
+                is_order_request=is_order_request,
+                quantity=quantity
+            )
+            response_waiters.track(request_id)
 
             ctx.logger.info(f"Successfully created MedicinePurchaseRequest: {type(medicine_request)}")
 
@@ -1666,6 +1815,49 @@ async def route_to_pharmacy_agent(message: str, ctx: Context, user_sender: str =
         ctx.logger.error(f"Error routing to pharmacy agent: {str(e)}")
         return "Sorry, I couldn't process your medicine request right now. Please try again later."
 
+async def route_cart_to_pharmacy_agent(medicines: List[dict], is_order_request: bool, ctx: Context, user_sender: str = None) -> str:
+    """Send several medicines to PharmacyAgent as one cart request"""
+    try:
+        request_id = str(uuid4())[:8]
+        cart_request = MedicineCartRequest(
+            request_id=request_id,
+            lines=[CartLine(medicine_name=item["medicine_name"], quantity=item["quantity"]) for item in medicines],
+            user_id=user_sender,
+            auto_order=is_order_request  # Auto-order only if user wants to buy
+        )
+        ctx.logger.info(f"Medicine cart: {len(medicines)} items, Is Order: {is_order_request}")
+
+        if not PHARMACY_AGENT_ADDRESS:
+            ctx.logger.error("PHARMACY_AGENT_ADDRESS not configured")
+            return "Sorry, the pharmacy service is not properly configured. Please contact support."
+
+        # Track pending request
+        pending_requests.add(
+            request_id,
+            "pharmacy_cart",
+            user_sender,
+            origin=request_origin.get(),
+            medicines=[item["medicine_name"] for item in medicines],
+            is_order_request=is_order_request
+        )
+        response_waiters.track(request_id)
+
+        await ctx.send(PHARMACY_AGENT_ADDRESS, cart_request)
+        ctx.logger.info(f"Medicine cart request sent (ID: {request_id})")
+
+        response = f"**Medicine {'purchase' if is_order_request else 'availability check'} request submitted!**\n\n"
+        response += f"**Items:**\n"
+        for item in medicines:
+            response += f"• {item['medicine_name']} × {item['quantity']}\n"
+        response += f"• Action: {'Auto-purchase available items' if is_order_request else 'Check availability only'}\n"
+        response += f"\n**Request ID:** {request_id}"
+        response += f"\n**Status:** Processing with pharmacy agent..."
+        return response
+
+    except Exception as e:
+        ctx.logger.error(f"Error routing cart to pharmacy agent: {str(e)}")
+        return "Sorry, I couldn't process your medicine request right now. Please try again later."
+
 async def route_to_wellness_delete(message: str, ctx: Context, user_sender: str = None) -> str:
     """Route wellness delete request to WellnessAgent"""
     try:
@@ -1680,11 +1872,8 @@ async def route_to_wellness_delete(message: str, ctx: Context, user_sender: str
         )
 
         # Track pending request
-        pending_requests[request_id] = {
-            "type": "wellness_delete",
-            "timestamp": datetime.now().isoformat(),
-            "user_sender": user_sender
-        }
+        pending_requests.add(request_id, "wellness_delete", user_sender, origin=request_origin.get())
+        response_waiters.track(request_id)
 
         # Find and route to wellness agent
         wellness_agent_address = os.getenv("WELLNESS_AGENT_ADDRESS")
@@ -1720,15 +1909,15 @@ async def route_to_wellness_agent(message: str, ctx: Context, user_sender: str =
         )
 
         # Track pending request
-        pending_requests[request_id] = {
-            "type": "wellness",
-            "data_type": wellness_data.get("type", "general"),
-            "timestamp": datetime.now(),
-            "user_sender": user_sender,
-            "original_message": message
-        }
-        if user_sender:
-            user_request_mapping[request_id] = user_sender
+        pending_requests.add(
+            request_id,
+            "wellness",
+            user_sender,
+            origin=request_origin.get(),
+            data_type=wellness_data.get("type", "general"),
+            original_message=message
+        )
+        response_waiters.track(request_id)
 
         # Send request to WellnessAgent if available
         if WELLNESS_AGENT_ADDRESS:
@@ -1906,6 +2095,22 @@ def parse_wellness_message(message: str) -> dict:
     return wellness_data
 
 
+def describe_metric_patterns(metric: Dict, unit: str, decimals: int) -> str:
+    """Rolling averages, trend, weekday pattern and outliers of one metric, for the insights prompt"""
+    if not metric["count"]:
+        return "- Patterns: not enough data"
+    def fmt(value):
+        return f"{value:,.{decimals}f}{unit}" if value is not None else "n/a"
+    lines = [f"- Last 7 days: {fmt(metric['rolling_7'])} average, last 30 days: {fmt(metric['rolling_30'])}"]
+    if metric["trend_per_day"] is not None:
+        lines.append(f"- Trend: {metric['trend_per_day'] * 7:+,.{decimals}f}{unit} per week")
+    if metric["best_weekday"] and metric["best_weekday"] != metric["worst_weekday"]:
+        lines.append(f"- Best day: {metric['best_weekday']}, lowest day: {metric['worst_weekday']}")
+    if metric["anomalies"]:
+        lines.append(f"- Unusual days: {', '.join(metric['anomalies'][-3:])}")
+    return "\n        ".join(lines)
+
+
 async def generate_wellness_insights_with_llm(wellness_logs: List[Dict], ctx: Context) -> str:
     """Generate AI-powered wellness insights from user's wellness logs using ASI1 LLM"""
     try:
@@ -1917,129 +2122,47 @@ async def generate_wellness_insights_with_llm(wellness_logs: List[Dict], ctx: Co
         if ctx:
             ctx.logger.info(f"🔍 Raw wellness logs structure: {wellness_logs[:2]}")  # Show first 2 logs
         
-        # Helper function to normalize ICP wellness log data 
-        def normalize_icp_log(log):
-            """Convert ICP numeric-key format to standard field names"""
-            # Based on the actual data structure observed:
-            # "1_113_806_382": date, "1_152_427_284": water_intake, "1_214_307_575": mood, 
-            # "1_450_210_392": exercise, "1_869_947_023": user_id, "2_126_822_679": sleep, "2_215_541_671": steps
-            
-            normalized = {}
-            
-            # Handle standard field names first (in case format changes)
-            if any(key in ['user_id', 'date', 'sleep', 'steps', 'exercise', 'mood', 'water_intake'] for key in log.keys()):
-                for key, value in log.items():
-                    if key in ['user_id', 'date', 'sleep', 'steps', 'exercise', 'mood', 'water_intake']:
-                        normalized[key] = value
-                return normalized
-            
-            # Handle ICP numeric key format - map by exact key based on _WellnessLogKeys order
-            # _WellnessLogKeys = ["user_id", "date", "sleep", "steps", "exercise", "mood", "water_intake"]
-            key_mapping = {
-                "1_869_947_023": "user_id",        # field 0: user_id
-                "1_113_806_382": "date",           # field 1: date
-                "2_126_822_679": "sleep",          # field 2: sleep
-                "2_215_541_671": "steps",          # field 3: steps
-                "1_450_210_392": "exercise",       # field 4: exercise
-                "1_214_307_575": "mood",           # field 5: mood
-                "1_152_427_284": "water_intake"    # field 6: water_intake
-            }
-            
-            for key, value in log.items():
-                if key in key_mapping:
-                    field_name = key_mapping[key]
-                    if value is not None:  # Only set non-null values
-                        normalized[field_name] = value
-                        
-            return normalized
-        
-        # Extract key metrics from logs with proper ICP format handling
-        sleep_data = []
-        steps_data = []
-        water_data = []
-        moods = []
-        exercises = []
-        
-        for log in wellness_logs:
-            normalized_log = normalize_icp_log(log)
-            if ctx:
-                ctx.logger.info(f"🔍 Normalized log: {normalized_log}")
-            
-            # Extract sleep data
-            sleep_val = normalized_log.get('sleep', 0)
-            if isinstance(sleep_val, (int, float)) and sleep_val > 0:
-                sleep_data.append(sleep_val)
-                
-            # Extract steps data
-            steps_val = normalized_log.get('steps', 0)
-            if isinstance(steps_val, (int, float)) and steps_val > 0:
-                steps_data.append(steps_val)
-                
-            # Extract water data
-            water_val = normalized_log.get('water_intake', 0)
-            if isinstance(water_val, (int, float)) and water_val > 0:
-                water_data.append(water_val)
-                
-            # Extract mood data
-            mood_val = normalized_log.get('mood')
-            if mood_val and str(mood_val).strip() and str(mood_val) != 'None':
-                moods.append(str(mood_val))
-                
-            # Extract exercise data
-            exercise_val = normalized_log.get('exercise')
-            if exercise_val and str(exercise_val).strip() and str(exercise_val) not in ['None', 'Not logged']:
-                exercises.append(str(exercise_val))
-        
-        # Debug: Log extracted data
+        # One columnar pass over the logs (handles both named and numeric ICP keys)
+        analytics = WellnessAnalytics(wellness_logs).summary()
+        sleep = analytics["metrics"]["sleep"]
+        steps = analytics["metrics"]["steps"]
+        water = analytics["metrics"]["water_intake"]
+        calendar_days = analytics["calendar_days"]
+        moods = analytics["moods"]
+
         if ctx:
-            ctx.logger.info(f"🔍 Extracted data - Sleep: {sleep_data}, Steps: {steps_data}, Water: {water_data}, Moods: {moods}")
-        
-        # Calculate basic statistics
-        avg_sleep = sum(sleep_data) / len(sleep_data) if sleep_data else 0
-        total_steps = sum(steps_data)
-        avg_water = sum(water_data) / len(water_data) if water_data else 0
-        exercise_days = len(exercises)
-        
-        # Calculate actual days with any data
-        days_with_data = len(set([log.get('date', '') for log in wellness_logs if any([
-            log.get('sleep', 0) > 0,
-            log.get('steps', 0) > 0, 
-            log.get('water_intake', 0) > 0,
-            log.get('mood'),
-            log.get('exercise') and log.get('exercise') != 'Not logged'
-        ])]))
-        
-        # Get unique dates from normalized logs to count actual calendar days
-        normalized_logs = [normalize_icp_log(log) for log in wellness_logs]
-        unique_dates = set([log.get('date', '') for log in normalized_logs if log.get('date')])
-        actual_calendar_days = len(unique_dates)
-        
+            ctx.logger.info(f"🔍 Wellness analytics: {calendar_days} days, sleep {sleep['mean']:.1f}h, "
+                            f"steps {steps['total']:,.0f}, moods {moods}")
+
         # Prepare context for LLM
         wellness_summary = f"""
         Wellness Data Summary:
-        - Log entries analyzed: {len(wellness_logs)}
-        - Actual calendar days covered: {actual_calendar_days} 
-        - Days with meaningful data: {days_with_data}
+        - Log entries analyzed: {analytics['entries']}
+        - Actual calendar days covered: {calendar_days} 
+        - Days with meaningful data: {analytics['days_with_data']}
         
         Sleep:
-        - Average: {avg_sleep:.1f} hours per night
-        - Data points: {len(sleep_data)} days with sleep recorded
-        - Range: {min(sleep_data) if sleep_data else 0:.1f}h - {max(sleep_data) if sleep_data else 0:.1f}h
+        - Average: {sleep['mean']:.1f} hours per night
+        - Data points: {sleep['count']} days with sleep recorded
+        - Range: {sleep['min']:.1f}h - {sleep['max']:.1f}h (median {sleep['p50']:.1f}h)
+        {describe_metric_patterns(sleep, "h", 1)}
         
         Physical Activity:
-        - Total steps: {total_steps:,}
-        - Average daily steps: {total_steps/actual_calendar_days if actual_calendar_days > 0 else 0:,.0f}
-        - Exercise sessions: {exercise_days} out of {actual_calendar_days} days
-        - Activities: {', '.join(set(exercises[:5]))}
+        - Total steps: {steps['total']:,.0f}
+        - Average daily steps: {steps['total']/calendar_days if calendar_days > 0 else 0:,.0f}
+        - Exercise sessions: {analytics['exercise_days']} out of {calendar_days} days
+        - Activities: {', '.join(analytics['activities'])}
+        {describe_metric_patterns(steps, " steps", 0)}
         
         Hydration:
-        - Average water intake: {avg_water:.1f} glasses/cups per day
-        - Data points: {len(water_data)} days with water recorded
+        - Average water intake: {water['mean']:.1f} glasses/cups per day
+        - Data points: {water['count']} days with water recorded
+        {describe_metric_patterns(water, " glasses", 1)}
         
         Mood Patterns:
-        - Recorded moods: {', '.join(set(moods))}
-        - Most common: {max(set(moods), key=moods.count) if moods else 'No data'}
-        - Mood tracking: {len(moods)} out of {actual_calendar_days} days
+        - Recorded moods: {', '.join(f"{mood} ({count})" for mood, count in moods.items())}
+        - Most common: {analytics['top_mood'] or 'No data'}
+        - Mood tracking: {sum(moods.values())} out of {calendar_days} days
         """
         
         payload = {
@@ -2065,7 +2188,8 @@ async def generate_wellness_insights_with_llm(wellness_logs: List[Dict], ctx: Co
             "max_tokens": 800
         }
 
-        response = requests.post(
+        response = await asyncio.to_thread(
+            requests.post,
             f"{ASI1_BASE_URL}/chat/completions",
             headers=ASI1_HEADERS,
             json=payload,
@@ -2101,18 +2225,16 @@ To get personalized insights, start logging your daily activities:
 
 Once you have some data, I'll provide personalized recommendations to help you achieve your health goals!"""
 
-    # Extract basic statistics
-    sleep_data = [log.get('sleep', 0) for log in wellness_logs if log.get('sleep', 0) > 0]
-    steps_data = [log.get('steps', 0) for log in wellness_logs if log.get('steps', 0) > 0]
-    water_data = [log.get('water_intake', 0) for log in wellness_logs if log.get('water_intake', 0) > 0]
-    moods = [log.get('mood') for log in wellness_logs if log.get('mood')]
-    exercises = [log.get('exercise') for log in wellness_logs if log.get('exercise') and log.get('exercise') != 'Not logged']
+    analytics = WellnessAnalytics(wellness_logs).summary()
+    sleep = analytics["metrics"]["sleep"]
+    steps = analytics["metrics"]["steps"]
+    water = analytics["metrics"]["water_intake"]
     
     insights = f"**Your Wellness Summary ({len(wellness_logs)} days tracked):**\n\n"
     
     # Sleep analysis
-    if sleep_data:
-        avg_sleep = sum(sleep_data) / len(sleep_data)
+    if sleep["count"]:
+        avg_sleep = sleep["mean"]
         if avg_sleep >= 7:
             insights += f"✅ **Sleep**: Great job! Averaging {avg_sleep:.1f}h per night.\n"
         else:
@@ -2121,18 +2243,21 @@ Once you have some data, I'll provide personalized recommendations to help you a
         insights += "📊 **Sleep**: Start tracking your sleep patterns for better insights.\n"
     
     # Activity analysis
-    if steps_data:
-        avg_steps = sum(steps_data) / len(steps_data)
+    if steps["count"]:
+        avg_steps = steps["mean"]
         if avg_steps >= 8000:
             insights += f"🚶 **Activity**: Excellent! {avg_steps:,.0f} steps daily average.\n"
         else:
             insights += f"🚶 **Activity**: {avg_steps:,.0f} steps daily - aim for 8,000+.\n"
+        if steps["trend_per_day"] is not None and abs(steps["trend_per_day"]) * 7 >= 250:
+            direction = "up" if steps["trend_per_day"] > 0 else "down"
+            insights += f"📈 **Trend**: Steps are {direction} about {abs(steps['trend_per_day']) * 7:,.0f} per week.\n"
     else:
         insights += "🚶 **Activity**: Track your daily steps to monitor activity levels.\n"
         
     # Hydration analysis
-    if water_data:
-        avg_water = sum(water_data) / len(water_data)
+    if water["count"]:
+        avg_water = water["mean"]
         if avg_water >= 8:
             insights += f"💧 **Hydration**: Perfect! {avg_water:.1f} glasses daily.\n"
         else:
@@ -2141,18 +2266,14 @@ Once you have some data, I'll provide personalized recommendations to help you a
         insights += "💧 **Hydration**: Log your water intake for hydration tracking.\n"
         
     # Exercise analysis
-    if exercises:
-        insights += f"💪 **Exercise**: Active {len(exercises)} days - keep it up!\n"
+    if analytics["exercise_days"]:
+        insights += f"💪 **Exercise**: Active {analytics['exercise_days']} days - keep it up!\n"
     else:
         insights += "💪 **Exercise**: Add some physical activity for better health.\n"
         
     # Mood analysis
-    if moods:
-        mood_counts = {}
-        for mood in moods:
-            mood_counts[mood] = mood_counts.get(mood, 0) + 1
-        top_mood = max(mood_counts, key=mood_counts.get)
-        insights += f"😊 **Mood**: Most common: {top_mood}. Keep tracking for patterns!\n"
+    if analytics["top_mood"]:
+        insights += f"😊 **Mood**: Most common: {analytics['top_mood']}. Keep tracking for patterns!\n"
     else:
         insights += "😊 **Mood**: Track your daily mood to understand patterns.\n"
         
@@ -2173,7 +2294,7 @@ async def get_wellness_insights(user_id: str, days: int = 7, ctx: Context = None
             "days": days + 10  # Request extra days to ensure coverage
         }
         
-        response = requests.post(url, headers=HEADERS, json=payload, timeout=10)
+        response = await asyncio.to_thread(requests.post, url, headers=HEADERS, json=payload, timeout=10)
         
         if response.status_code == 200:
             if ctx:
@@ -2301,6 +2422,12 @@ def format_analysis_response(analysis: dict, format_type: str, sender: str) -> s
 async def process_health_query(query: str, ctx: Context, sender: str = "default_user", file: Optional[FileData] = None) -> str:
     """Process health-related queries and route appropriately"""
     try:
+        # Emergencies are answered before any context handling or LLM call
+        emergency_phrase = detect_emergency(query)
+        if emergency_phrase:
+            ctx.logger.warning(f"🚨 Emergency phrase '{emergency_phrase}' from {sender}")
+            return await handle_emergency(ctx, sender)
+
         # Debug logging for file detection
         ctx.logger.info(f"🔍 Processing query from {sender}: '{query}'")
         if file is not None:
@@ -2312,8 +2439,8 @@ async def process_health_query(query: str, ctx: Context, sender: str = "default_
         else:
             ctx.logger.info(f"❌ No file parameter received")
         # Check for context-based responses first
-        if sender and sender in user_contexts:
-            context = get_user_context(sender)
+        context = get_user_context(sender) if sender else {}
+        if context:
 
             # Handle image analysis confirmation
             if context.get("awaiting_analysis_confirmation"):
@@ -2354,7 +2481,7 @@ async def process_health_query(query: str, ctx: Context, sender: str = "default_
         if intent == "image_analysis":
             return await handle_image_analysis(query, file, ctx, sender)
         elif intent == "emergency":
-            return await handle_emergency(ctx)
+            return await handle_emergency(ctx, sender)
         elif intent == "confirm_doctor_booking":
             return await handle_doctor_booking_confirmation(sender, ctx)
         elif intent == "cancel_doctor_booking":
@@ -2419,10 +2546,11 @@ async def process_health_query(query: str, ctx: Context, sender: str = "default_
         return "I'm having trouble processing your request. Please try again or rephrase your question."
 
 # Create the HealthAgent with REST endpoints enabled
+# HEALTH_AGENT_PORT/NAME are set per worker when running behind router.py
 agent = Agent(
-    name='health-agent',
-    port=8000,
-    mailbox=True,
+    name=os.getenv("HEALTH_AGENT_NAME", 'health-agent'),
+    port=int(os.getenv("HEALTH_AGENT_PORT", "8000")),
+    mailbox=os.getenv("HEALTH_AGENT_MAILBOX", "true").lower() != "false",
 )
 
 # Add file analysis function
@@ -2469,7 +2597,8 @@ async def analyze_file_with_asi1(file_data: FileData, ctx: Context) -> dict:
                 "max_tokens": 500
             }
 
-        response = requests.post(
+        response = await asyncio.to_thread(
+            requests.post,
             f"{ASI1_BASE_URL}/chat/completions",
             headers=ASI1_HEADERS,
             json=payload,
@@ -2503,11 +2632,48 @@ async def analyze_file_with_asi1(file_data: FileData, ctx: Context) -> dict:
         }
 
 # Add REST endpoint for Flask API integration
+# Caps concurrent chat processing and runs each user's messages in order
+chat_admission = ChatAdmission()
+
 @agent.on_rest_post("/api/chat", ChatRequest, ChatResponse)
 async def handle_rest_chat(ctx: Context, req: ChatRequest) -> ChatResponse:
     """Handle chat messages from Flask API via REST endpoint"""
+    # Emergencies skip the admission queue and the LLM
+    emergency_phrase = detect_emergency(req.message)
+    if emergency_phrase:
+        ctx.logger.warning(f"🚨 Emergency phrase '{emergency_phrase}' from REST user {req.user_id}, answering ahead of the queue")
+        return ChatResponse(
+            response=await handle_emergency(ctx, req.user_id),
+            intent="emergency",
+            confidence=1.0,
+            timestamp=datetime.now(timezone.utc).isoformat(),
+            request_id=str(uuid4()),
+            sender=agent.address,
+            user_id=req.user_id,
+            communication_status="success"
+        )
+    try:
+        async with chat_admission.admit(req.user_id) as ticket:
+            return await process_rest_chat(ctx, req, ticket)
+    except AdmissionRejected as e:
+        ctx.logger.warning(f"🚦 Rejected chat from {req.user_id}: {e.reason} (retry after {e.retry_after}s, {chat_admission.stats()})")
+        return ChatResponse(
+            response=f"I'm handling a lot of requests right now. Please try again in {e.retry_after:.0f} seconds.",
+            intent="busy",
+            confidence=0.0,
+            timestamp=datetime.now(timezone.utc).isoformat(),
+            request_id=str(uuid4()),
+            sender=agent.address,
+            user_id=req.user_id,
+            communication_status="busy",
+            retry_after=e.retry_after
+        )
+
+async def process_rest_chat(ctx: Context, req: ChatRequest, ticket: AdmissionTicket = None) -> ChatResponse:
+    """Process one admitted /api/chat message; the ticket's global slot is given back before waiting on a sub-agent"""
     try:
         ctx.logger.info(f"📨 REST API request from user {req.user_id}: '{req.message}'")
+        remember_origin(req.user_id, ORIGIN_REST)
         
         # Enhanced file detection logging
         if req.file:
@@ -2519,13 +2685,43 @@ async def handle_rest_chat(ctx: Context, req: ChatRequest) -> ChatResponse:
         else:
             ctx.logger.info(f"❌ No file detected in request")
 
-        # Process the health-related query using existing logic
-        response_text = await process_health_query(req.message, ctx, req.user_id, req.file)
+        # Process the health-related query using existing logic, noting any sub-agent requests it starts.
+        # Waiters are only registered when the caller asked to wait for the final answer.
+        with response_waiters.collect(watch=bool(req.wait_seconds)) as request_ids:
+            response_text = await process_health_query(req.message, ctx, req.user_id, req.file)
 
-        # Classify intent for response metadata
-        intent = await classify_user_intent_with_llm(req.message, ctx)
-        if req.file:
-            intent = "image_analysis"
+        # Start waiting before classifying, so an answer that arrives meanwhile is handed to this call
+        wait_task = None
+        if req.wait_seconds and request_ids:
+            for request_id in request_ids[:-1]:
+                response_waiters.discard(request_id)
+            response_waiters.expect(request_ids[-1])
+            wait_task = asyncio.create_task(response_waiters.wait(request_ids[-1], min(req.wait_seconds, MAX_CHAT_WAIT)))
+
+        try:
+            # Classify intent for response metadata
+            intent = await classify_user_intent_with_llm(req.message, ctx)
+            if req.file:
+                intent = "image_analysis"
+
+            # Optionally hold the response until the sub-agent answers, instead of leaving it to /api/results.
+            # Only the user's mailbox is held while waiting, so their next message still queues behind this one.
+            result = None
+            if wait_task is not None:
+                if ticket is not None:
+                    ticket.release_slot()
+                result = await wait_task
+                if result:
+                    response_text = result["message"]
+                else:
+                    ctx.logger.info(f"⏳ No final answer for {req.user_id} within {req.wait_seconds}s, it will go to the result inbox")
+        finally:
+            if wait_task is not None and not wait_task.done():
+                # Classification failed; a result already handed to this call still goes to the inbox
+                wait_task.cancel()
+                leftover = response_waiters.take(request_ids[-1])
+                if leftover:
+                    result_inbox.publish(req.user_id, leftover)
 
         # Create structured response
         response = ChatResponse(
@@ -2536,7 +2732,8 @@ async def handle_rest_chat(ctx: Context, req: ChatRequest) -> ChatResponse:
             request_id=str(uuid4()),
             sender=agent.address,
             user_id=req.user_id,
-            communication_status="success"
+            communication_status="success",
+            result=result
         )
 
         ctx.logger.info(f" REST API response sent to user {req.user_id}")
@@ -2597,6 +2794,14 @@ async def handle_wellness_insights(ctx: Context, req: WellnessInsightsRequest) -
             message=f"Error: {str(e)}"
         )
 
+# Long-poll endpoint delivering booking/order/wellness outcomes to frontend users
+@agent.on_rest_post("/api/results", ResultsRequest, ResultsResponse)
+async def handle_rest_results(ctx: Context, req: ResultsRequest) -> ResultsResponse:
+    """Return results newer than req.after, waiting up to req.timeout seconds for one to arrive"""
+    results = await result_inbox.wait(req.user_id, req.after, min(max(req.timeout, 0.0), 55.0), req.epoch)
+    last_seq = results[-1]["seq"] if results else result_inbox.cursor(req.after, req.epoch)
+    return ResultsResponse(user_id=req.user_id, results=results, last_seq=last_seq, epoch=result_inbox.epoch)
+
 # Add health check endpoint for Flask API
 @agent.on_rest_get("/health", ChatResponse)
 async def handle_rest_health(ctx: Context) -> Dict[str, Any]:
@@ -2663,6 +2868,7 @@ async def handle_chat_message(ctx: Context, sender: str, msg: ChatMessage):
                 ctx.logger.info(f"Processing health query from {sender}: {item.text}")
 
                 # Process the health-related query with sender context
+                remember_origin(sender, ORIGIN_CHAT)
                 response_text = await process_health_query(item.text, ctx, sender)
 
                 ctx.logger.info(f"Health response: {response_text}")
@@ -2693,6 +2899,34 @@ async def handle_chat_acknowledgement(ctx: Context, sender: str, msg: ChatAcknow
     if msg.metadata:
         ctx.logger.info(f"Ack metadata: {msg.metadata}")
 
+# Results of asynchronous requests for REST API users, read through /api/results
+result_inbox = ResultInbox()
+
+async def deliver_result(ctx: Context, user_sender: str, origin: str, request_id: str, kind: str, status: str, text: str, data: dict = None):
+    """Send an asynchronous result to a chat user, or queue it in the result inbox for REST API users"""
+    if not user_sender:
+        return
+    if origin == ORIGIN_REST:
+        result = {
+            "request_id": request_id,
+            "kind": kind,
+            "status": status,
+            "message": text,
+            "data": data or {},
+        }
+        if response_waiters.resolve(request_id, result):
+            ctx.logger.info(f" Result for REST API user {user_sender} returned to the waiting /api/chat call: {kind} - {status}")
+            return
+        seq = result_inbox.publish(user_sender, result)
+        ctx.logger.info(f" Result for REST API user {user_sender} queued (seq {seq}): {kind} - {status}")
+    else:
+        chat_response = ChatMessage(
+            timestamp=datetime.now(timezone.utc),
+            msg_id=uuid4(),
+            content=[TextContent(type="text", text=text)]
+        )
+        await ctx.send(user_sender, chat_response)
+
 # Handler for unified medicine purchase responses (like doctor booking)
 @pharmacy_protocol.on_message(model=MedicinePurchaseResponse)
 async def handle_medicine_purchase_response(ctx: Context, sender: str, msg: MedicinePurchaseResponse):
@@ -2707,91 +2941,121 @@ async def handle_medicine_purchase_response(ctx: Context, sender: str, msg: Medi
             return
         
         # Get user sender from request mapping
-        user_sender = user_request_mapping.get(msg.request_id) or request_info.get("user_sender")
+        user_sender = request_info.get("user_sender")
         
         if msg.status == "success":
             # Order placed successfully
-            success_message = f"🎉 **Medicine Order Successfully Placed!**\n\n"
-            success_message += f"**Medicine:** {msg.medicine_name}\n"
-            success_message += f"**Order ID:** `{msg.order_id}`\n"
-            success_message += f"**Total Price:** ${msg.total_price:.2f}\n\n"
-            success_message += f"💡 **Keep this Order ID to track or cancel your order**\n\n"
-            success_message += f"💾 **Storage:** Order saved to ICP blockchain\n"
-            success_message += f"📍 **Pickup:** {msg.message}"
-            
-            if user_sender and not user_sender.startswith("frontend_"):
-                chat_response = ChatMessage(
-                    timestamp=datetime.now(timezone.utc),
-                    sender=user_sender,
-                    message=success_message,
-                    message_type="pharmacy_order_success",
-                    request_id=msg.request_id
-                )
-                await store_to_icp("store-chat", {"chat": chat_response.dict()})
+            result_message = f"🎉 **Medicine Order Successfully Placed!**\n\n"
+            result_message += f"**Medicine:** {msg.medicine_name}\n"
+            result_message += f"**Order ID:** `{msg.order_id}`\n"
+            result_message += f"**Total Price:** ${msg.total_price:.2f}\n\n"
+            result_message += f"💡 **Keep this Order ID to track or cancel your order**\n\n"
+            result_message += f"💾 **Storage:** Order saved to ICP blockchain\n"
+            result_message += f"📍 **Pickup:** {msg.message}"
         
         elif msg.status == "insufficient_stock":
             # Not enough stock
-            stock_message = f"⚠️ **Insufficient Stock**\n\n"
-            stock_message += f"**Medicine:** {msg.medicine_name}\n"
-            stock_message += f"**Issue:** {msg.message}\n\n"
-            stock_message += f"Please try again later or contact the pharmacy directly."
-            
-            if user_sender and not user_sender.startswith("frontend_"):
-                chat_response = ChatMessage(
-                    timestamp=datetime.now(timezone.utc),
-                    sender=user_sender,
-                    message=stock_message,
-                    message_type="pharmacy_stock_error",
-                    request_id=msg.request_id
-                )
-                await store_to_icp("store-chat", {"chat": chat_response.dict()})
+            result_message = f"⚠️ **Insufficient Stock**\n\n"
+            result_message += f"**Medicine:** {msg.medicine_name}\n"
+            result_message += f"**Issue:** {msg.message}\n\n"
+            if msg.suggested_alternatives:
+                result_message += f"🔄 **In stock now:**\n"
+                for alt in msg.suggested_alternatives:
+                    result_message += f"• {alt.get('name', 'Unknown')} - ${alt.get('price', 0):.2f} ({alt.get('stock', 0)} available)\n"
+                result_message += f"\nWould you like to order one of these alternatives instead?"
+            else:
+                result_message += f"Please try again later or contact the pharmacy directly."
         
         elif msg.status == "available":
             # Medicine available but not ordered (availability check only)
-            available_message = f"✅ **Medicine Available**\n\n"
-            available_message += f"**Medicine:** {msg.medicine_name}\n"
-            available_message += f"**Price:** ${msg.total_price:.2f}\n"
-            available_message += f"**Details:** {msg.message}\n\n"
-            available_message += f"💡 Say 'I want to order {msg.medicine_name}' to place an order"
-            
-            if user_sender and not user_sender.startswith("frontend_"):
-                chat_response = ChatMessage(
-                    timestamp=datetime.now(timezone.utc),
-                    sender=user_sender,
-                    message=available_message,
-                    message_type="pharmacy_available",
-                    request_id=msg.request_id
-                )
-                await store_to_icp("store-chat", {"chat": chat_response.dict()})
+            result_message = f"✅ **Medicine Available**\n\n"
+            result_message += f"**Medicine:** {msg.medicine_name}\n"
+            result_message += f"**Price:** ${msg.total_price:.2f}\n"
+            result_message += f"**Details:** {msg.message}\n\n"
+            result_message += f"💡 Say 'I want to order {msg.medicine_name}' to place an order"
         
         else:
             # Error case
-            error_message = f"❌ **Medicine Request Error**\n\n"
-            error_message += f"**Medicine:** {msg.medicine_name or 'Unknown'}\n"
-            error_message += f"**Error:** {msg.message}\n\n"
-            error_message += f"Please try again or contact support if the issue persists."
-            
-            if user_sender and not user_sender.startswith("frontend_"):
-                chat_response = ChatMessage(
-                    timestamp=datetime.now(timezone.utc),
-                    sender=user_sender,
-                    message=error_message,
-                    message_type="pharmacy_error",
-                    request_id=msg.request_id
-                )
-                await store_to_icp("store-chat", {"chat": chat_response.dict()})
+            result_message = f"❌ **Medicine Request Error**\n\n"
+            result_message += f"**Medicine:** {msg.medicine_name or 'Unknown'}\n"
+            result_message += f"**Error:** {msg.message}\n\n"
+            result_message += f"Please try again or contact support if the issue persists."
+
+        await deliver_result(ctx, user_sender, origin_of(user_sender, request_info), msg.request_id, "medicine_purchase", msg.status, result_message, {
+            "medicine_name": msg.medicine_name,
+            "order_id": msg.order_id,
+            "total_price": msg.total_price,
+            "suggested_alternatives": msg.suggested_alternatives,
+        })
         
         # Clean up pending request
-        if msg.request_id in pending_requests:
-            del pending_requests[msg.request_id]
-        if msg.request_id in user_request_mapping:
-            del user_request_mapping[msg.request_id]
+        pending_requests.pop(msg.request_id)
             
         ctx.logger.info(f"Medicine purchase response processed successfully")
 
     except Exception as e:
         ctx.logger.error(f"Error in medicine purchase response handler: {str(e)}")
 
+CART_LINE_ICONS = {
+    "confirmed": "✅",
+    "available": "✅",
+    "insufficient_stock": "⚠️",
+    "prescription_required": "📋",
+    "not_found": "❓",
+}
+
+# Handler for cart purchase responses
+@pharmacy_protocol.on_message(model=MedicineCartResponse)
+async def handle_medicine_cart_response(ctx: Context, sender: str, msg: MedicineCartResponse):
+    """Handle multi-medicine cart responses from PharmacyAgent"""
+    ctx.logger.info(f"Received medicine cart response: {msg.status} - {len(msg.lines)} lines")
+
+    try:
+        request_info = pending_requests.get(msg.request_id)
+        if not request_info:
+            ctx.logger.warning(f"No pending request found for cart response ID: {msg.request_id}")
+            return
+
+        user_sender = request_info.get("user_sender")
+        ordered = request_info.get("is_order_request")
+
+        if msg.status in ("success", "available"):
+            result_message = f"🎉 **Medicine Order Successfully Placed!**\n\n" if ordered else f"✅ **All Medicines Available**\n\n"
+        elif msg.status == "partial":
+            result_message = f"⚠️ **Part of Your Order Was Placed**\n\n" if ordered else f"⚠️ **Some Medicines Are Unavailable**\n\n"
+        else:
+            result_message = f"❌ **Medicine Request Error**\n\n"
+
+        for line in msg.lines:
+            name = line.get("matched_name") or line.get("medicine_name")
+            result_message += f"{CART_LINE_ICONS.get(line.get('status'), '❌')} **{name}** × {line.get('quantity', 1)}"
+            if line.get("status") == "confirmed":
+                result_message += f" - Order ID: `{line.get('order_id')}` (${line.get('total_price') or 0:.2f})\n"
+            else:
+                result_message += f" - {line.get('message')}\n"
+            for alt in line.get("suggested_alternatives") or []:
+                result_message += f"   🔄 {alt.get('name', 'Unknown')} - ${alt.get('price', 0):.2f} ({alt.get('stock', 0)} available)\n"
+
+        if msg.lines:
+            result_message += f"\n**Total:** ${msg.total_price:.2f}\n"
+        else:
+            result_message += f"**Error:** {msg.message}\n"
+        if ordered and any(line.get("status") == "confirmed" for line in msg.lines):
+            result_message += f"\n💡 **Keep these Order IDs to track or cancel your orders**\n"
+            result_message += f"💾 **Storage:** Orders saved to ICP blockchain"
+
+        await deliver_result(ctx, user_sender, origin_of(user_sender, request_info), msg.request_id, "medicine_cart", msg.status, result_message, {
+            "lines": msg.lines,
+            "total_price": msg.total_price,
+        })
+
+        pending_requests.pop(msg.request_id)
+
+        ctx.logger.info(f"Medicine cart response processed successfully")
+
+    except Exception as e:
+        ctx.logger.error(f"Error in medicine cart response handler: {str(e)}")
+
 # Handler for doctor booking responses
 @doctor_protocol.on_message(model=DoctorBookingResponse)
 async def handle_doctor_response(ctx: Context, sender: str, msg: DoctorBookingResponse):
@@ -2806,7 +3070,7 @@ async def handle_doctor_response(ctx: Context, sender: str, msg: DoctorBookingRe
         # Store the DoctorAgent address for future communications
         if DOCTOR_AGENT_ADDRESS != sender:
             DOCTOR_AGENT_ADDRESS = sender
-            connected_agents[sender] = "DoctorAgent"
+            state.set("agents", sender, "DoctorAgent")
 
         # Check if this is a pending request
         if msg.request_id not in pending_requests:
@@ -2825,32 +3089,27 @@ async def handle_doctor_response(ctx: Context, sender: str, msg: DoctorBookingRe
         )
         await ctx.send(sender, ack)
 
-        # Send result to user (only for direct chat users, not REST API users)
-        if user_sender and not user_sender.startswith("frontend_"):
-            if msg.status == "success":
-                success_message = f"🎉 **Appointment Successfully Booked!**\n\n" \
-                                 f"**Doctor:** {msg.doctor_name}\n" \
-                                 f"**Specialty:** {request_info['specialty']}\n" \
-                                 f"**Date & Time:** {msg.appointment_time}\n\n" \
-                                 f"📋 **Your Appointment ID:** `{msg.appointment_id}`\n" \
-                                 f"💡 **Keep this ID to cancel or modify your appointment**\n\n" \
-                                 f"💾 **Storage:** Appointment saved to ICP blockchain"
-            else:
-                success_message = f" Booking failed: {msg.message}"
-
-            chat_response = ChatMessage(
-                timestamp=datetime.now(timezone.utc),
-                msg_id=uuid4(),
-                content=[TextContent(type="text", text=success_message)]
-            )
-            await ctx.send(user_sender, chat_response)
+        # Send result to the user (chat message, or result inbox for REST API users)
+        if msg.status == "success":
+            success_message = f"🎉 **Appointment Successfully Booked!**\n\n" \
+                             f"**Doctor:** {msg.doctor_name}\n" \
+                             f"**Specialty:** {request_info['specialty']}\n" \
+                             f"**Date & Time:** {msg.appointment_time}\n\n" \
+                             f"📋 **Your Appointment ID:** `{msg.appointment_id}`\n" \
+                             f"💡 **Keep this ID to cancel or modify your appointment**\n\n" \
+                             f"💾 **Storage:** Appointment saved to ICP blockchain"
         else:
-            ctx.logger.info(f" Result for REST API user {user_sender}: {msg.status} - {msg.message}")
+            success_message = f" Booking failed: {msg.message}"
+
+        await deliver_result(ctx, user_sender, origin_of(user_sender, request_info), msg.request_id, "doctor_booking", msg.status, success_message, {
+            "doctor_name": msg.doctor_name,
+            "appointment_time": msg.appointment_time,
+            "appointment_id": msg.appointment_id,
+            "specialty": request_info.get("specialty"),
+        })
 
         # Clean up pending request
-        del pending_requests[msg.request_id]
-        if msg.request_id in user_request_mapping:
-            del user_request_mapping[msg.request_id]
+        pending_requests.pop(msg.request_id)
 
         ctx.logger.info(f" Doctor response processed successfully")
 
@@ -2872,7 +3131,7 @@ async def handle_pharmacy_check_response(ctx: Context, sender: str, msg: Medicin
         # Store the PharmacyAgent address for future communications
         if PHARMACY_AGENT_ADDRESS != sender:
             PHARMACY_AGENT_ADDRESS = sender
-            connected_agents[sender] = "PharmacyAgent"
+            state.set("agents", sender, "PharmacyAgent")
 
         # Check if this is a pending request
         if msg.request_id not in pending_requests:
@@ -2906,20 +3165,20 @@ async def handle_pharmacy_check_response(ctx: Context, sender: str, msg: Medicin
                     medicine_id=msg.medicine,  # Use medicine name as fallback ID
                     medicine_name=msg.medicine,
                     quantity=quantity,
-                    user_id=user_sender
+                    user_id=user_sender,
+                    request_id=order_request_id
                 )
                 
                 # Track the order request
-                pending_requests[order_request_id] = {
-                    "type": "pharmacy_order",
-                    "medicine": msg.medicine,
-                    "timestamp": datetime.now(),
-                    "user_sender": user_sender,
-                    "quantity": quantity,
-                    "original_request_id": msg.request_id
-                }
-                if user_sender:
-                    user_request_mapping[order_request_id] = user_sender
+                pending_requests.add(
+                    order_request_id,
+                    "pharmacy_order",
+                    user_sender,
+                    origin=request_info.get("origin"),
+                    medicine=msg.medicine,
+                    quantity=quantity,
+                    original_request_id=msg.request_id
+                )
                 
                 # Send order request to pharmacy agent
                 await ctx.send(sender, medicine_order)
@@ -2930,62 +3189,58 @@ async def handle_pharmacy_check_response(ctx: Context, sender: str, msg: Medicin
             except Exception as e:
                 ctx.logger.error(f"Error placing automatic order: {str(e)}")
                 # Fall back to manual order instructions
-                if user_sender and not user_sender.startswith("frontend_"):
-                    order_message = f" **{msg.medicine}** is available but automatic ordering failed!\n\n"
-                    order_message += f" **Error:** {str(e)}\n\n"
-                    order_message += f"Please try manual ordering: 'Order {quantity} units of {msg.medicine}'"
-                    
-                    chat_response = ChatMessage(
-                        timestamp=datetime.now(timezone.utc),
-                        msg_id=uuid4(),
-                        content=[TextContent(type="text", text=order_message)]
-                    )
-                    await ctx.send(user_sender, chat_response)
+                order_message = f" **{msg.medicine}** is available but automatic ordering failed!\n\n"
+                order_message += f" **Error:** {str(e)}\n\n"
+                order_message += f"Please try manual ordering: 'Order {quantity} units of {msg.medicine}'"
+                await deliver_result(ctx, user_sender, origin_of(user_sender, request_info), msg.request_id, "medicine_check", "order_failed", order_message)
         else:
-            # Send result to user (only for direct chat users, not REST API users)
-            if user_sender and not user_sender.startswith("frontend_"):
-                if msg.available:
-                    if is_order_request:
-                        # This should not happen since we handle orders above
-                        order_message = f" **{msg.medicine}** is available for purchase!\n\n"
-                        order_message += f" **Stock:** {msg.stock} units available\n"
-                        order_message += f" **Price:** ${msg.price:.2f} per unit\n"
-                        order_message += f" **Total:** ${msg.price * quantity:.2f} for {quantity} units\n"
-                        order_message += f" **Pharmacy:** {msg.pharmacy_name}\n\n"
-                        order_message += f"Processing your order..."
-                    else:
-                        # Just availability check
-                        order_message = f" **{msg.medicine}** is available at {msg.pharmacy_name}\n\n"
-                        order_message += f" **Stock:** {msg.stock} units in inventory\n"
-                        order_message += f" **Price:** ${msg.price:.2f} per unit\n\n"
-                        order_message += f"Would you like me to help you place an order for this medicine?"
+            # Send result to the user (chat message, or result inbox for REST API users)
+            if msg.available:
+                if is_order_request:
+                    # This should not happen since we handle orders above
+                    order_message = f" **{msg.medicine}** is available for purchase!\n\n"
+                    order_message += f" **Stock:** {msg.stock} units available\n"
+                    order_message += f" **Price:** ${msg.price:.2f} per unit\n"
+                    order_message += f" **Total:** ${msg.price * quantity:.2f} for {quantity} units\n"
+                    order_message += f" **Pharmacy:** {msg.pharmacy_name}\n\n"
+                    order_message += f"Processing your order..."
                 else:
-                    # Unavailable message
-                    order_message = f" **{msg.medicine}** is currently {msg.status}\n\n"
-                    order_message += f" **Pharmacy:** {msg.pharmacy_name}\n"
-                    order_message += f" **Details:** {msg.message}\n\n"
-
-                    # Add alternative suggestions
-                    alternatives = await get_medicine_alternatives(medicine_name, ctx)
-                    if alternatives:
-                        order_message += f" **AI Suggestions - Similar medicines you might consider:**\n"
-                        for alt in alternatives[:3]:
-                            order_message += f"• {alt}\n"
-                        order_message += f"\nWould you like me to check availability for any of these alternatives?"
-
-                chat_response = ChatMessage(
-                    timestamp=datetime.now(timezone.utc),
-                    msg_id=uuid4(),
-                    content=[TextContent(type="text", text=order_message)]
-                )
-                await ctx.send(user_sender, chat_response)
+                    # Just availability check
+                    order_message = f" **{msg.medicine}** is available at {msg.pharmacy_name}\n\n"
+                    order_message += f" **Stock:** {msg.stock} units in inventory\n"
+                    order_message += f" **Price:** ${msg.price:.2f} per unit\n\n"
+                    order_message += f"Would you like me to help you place an order for this medicine?"
             else:
-                ctx.logger.info(f" Pharmacy result for REST API user {user_sender}: {msg.status} - {msg.medicine}")
+                # Unavailable message
+                order_message = f" **{msg.medicine}** is currently {msg.status}\n\n"
+                order_message += f" **Pharmacy:** {msg.pharmacy_name}\n"
+                order_message += f" **Details:** {msg.message}\n\n"
+
+                if msg.alternatives:
+                    # Substitutes the pharmacy actually stocks; no LLM call needed
+                    order_message += f" **In stock now - similar medicines:**\n"
+                    for alt in msg.alternatives:
+                        order_message += f"• {alt.get('name', 'Unknown')} - ${alt.get('price', 0):.2f} ({alt.get('stock', 0)} available)\n"
+                    order_message += f"\nWould you like me to order one of these instead?"
+                    alternatives = []
+                else:
+                    alternatives = await get_medicine_alternatives(medicine_name, ctx)
+                if alternatives:
+                    order_message += f" **AI Suggestions - Similar medicines you might consider:**\n"
+                    for alt in alternatives[:3]:
+                        order_message += f"• {alt}\n"
+                    order_message += f"\nWould you like me to check availability for any of these alternatives?"
+
+            await deliver_result(ctx, user_sender, origin_of(user_sender, request_info), msg.request_id, "medicine_check", msg.status, order_message, {
+                "medicine": msg.medicine,
+                "available": msg.available,
+                "stock": msg.stock,
+                "price": msg.price,
+                "alternatives": msg.alternatives,
+            })
 
         # Clean up pending request
-        del pending_requests[msg.request_id]
-        if msg.request_id in user_request_mapping:
-            del user_request_mapping[msg.request_id]
+        pending_requests.pop(msg.request_id)
 
         ctx.logger.info(f" Pharmacy response processed successfully")
 
@@ -3000,19 +3255,13 @@ async def handle_pharmacy_order_response(ctx: Context, sender: str, msg: Medicin
     ctx.logger.info(f"Order ID: {msg.order_id}, Total: ${msg.price}")
     
     try:
-        # Find the corresponding request info (we don't have request_id in MedicineOrderResponse)
-        request_info = None
-        original_request_id = None
-        user_sender = None
-        
-        # Look for pending pharmacy order requests
-        for req_id, req_info in list(pending_requests.items()):
-            if (req_info.get("type") == "pharmacy_order" and 
-                req_info.get("medicine") == msg.medicine):
-                request_info = req_info
-                original_request_id = req_id
-                user_sender = req_info.get("user_sender")
-                break
+        # Correlate by request_id; responses from older pharmacy agents fall back to (medicine, user)
+        if msg.request_id and msg.request_id in pending_requests:
+            original_request_id = msg.request_id
+        else:
+            original_request_id = pending_requests.find_by_medicine("pharmacy_order", msg.medicine, msg.user_id)
+        request_info = pending_requests.get(original_request_id) if original_request_id else None
+        user_sender = request_info.get("user_sender") if request_info else None
         
         # Send ACK if we found the request
         if original_request_id:
@@ -3024,54 +3273,49 @@ async def handle_pharmacy_order_response(ctx: Context, sender: str, msg: Medicin
             )
             await ctx.send(sender, ack)
         
-        # Send result to user (only for direct chat users, not REST API users)
-        if user_sender and not user_sender.startswith("frontend_"):
-            if msg.status == "confirmed":
-                order_message = f"🎉 **Order Confirmed!**\n\n"
-                order_message += f"**Medicine:** {msg.medicine}\n"
-                order_message += f"**Quantity:** {msg.qty} units\n"
-                order_message += f"**Total Price:** ${msg.price:.2f}\n"
-                if msg.order_id:
-                    order_message += f"**Order ID:** {msg.order_id}\n"
-                order_message += f"\n📍 **Pickup Instructions:**\n"
-                order_message += f"{msg.message}\n\n"
-                order_message += f"💾 **Storage:** Order saved to ICP blockchain"
-            elif msg.status == "insufficient_stock":
-                order_message = f"❌ **Order Failed - Insufficient Stock**\n\n"
-                order_message += f"**Medicine:** {msg.medicine}\n"
-                order_message += f"**Requested:** {msg.qty} units\n"
-                order_message += f"**Details:** {msg.message}\n\n"
-                
-                if msg.suggested_alternatives:
-                    order_message += f"🔄 **Alternative Suggestions:**\n"
-                    for alt in msg.suggested_alternatives:
-                        order_message += f"• {alt.get('name', 'Unknown')} - ${alt.get('price', 0):.2f} ({alt.get('stock', 0)} available)\n"
-                    order_message += f"\nWould you like to order one of these alternatives instead?"
-            elif msg.status == "prescription_required":
-                order_message = f"📋 **Prescription Required**\n\n"
-                order_message += f"**Medicine:** {msg.medicine}\n"
-                order_message += f"**Details:** {msg.message}\n\n"
-                order_message += f"Please provide a valid prescription to order this medicine."
-            else:
-                order_message = f"❌ **Order Error**\n\n"
-                order_message += f"**Medicine:** {msg.medicine}\n"
-                order_message += f"**Status:** {msg.status}\n"
-                order_message += f"**Details:** {msg.message}"
-            
-            chat_response = ChatMessage(
-                timestamp=datetime.now(timezone.utc),
-                msg_id=uuid4(),
-                content=[TextContent(type="text", text=order_message)]
-            )
-            await ctx.send(user_sender, chat_response)
+        # Send result to the user (chat message, or result inbox for REST API users)
+        if msg.status == "confirmed":
+            order_message = f"🎉 **Order Confirmed!**\n\n"
+            order_message += f"**Medicine:** {msg.medicine}\n"
+            order_message += f"**Quantity:** {msg.qty} units\n"
+            order_message += f"**Total Price:** ${msg.price:.2f}\n"
+            if msg.order_id:
+                order_message += f"**Order ID:** {msg.order_id}\n"
+            order_message += f"\n📍 **Pickup Instructions:**\n"
+            order_message += f"{msg.message}\n\n"
+            order_message += f"💾 **Storage:** Order saved to ICP blockchain"
+        elif msg.status == "insufficient_stock":
+            order_message = f"❌ **Order Failed - Insufficient Stock**\n\n"
+            order_message += f"**Medicine:** {msg.medicine}\n"
+            order_message += f"**Requested:** {msg.qty} units\n"
+            order_message += f"**Details:** {msg.message}\n\n"
+
+            if msg.suggested_alternatives:
+                order_message += f"🔄 **Alternative Suggestions:**\n"
+                for alt in msg.suggested_alternatives:
+                    order_message += f"• {alt.get('name', 'Unknown')} - ${alt.get('price', 0):.2f} ({alt.get('stock', 0)} available)\n"
+                order_message += f"\nWould you like to order one of these alternatives instead?"
+        elif msg.status == "prescription_required":
+            order_message = f"📋 **Prescription Required**\n\n"
+            order_message += f"**Medicine:** {msg.medicine}\n"
+            order_message += f"**Details:** {msg.message}\n\n"
+            order_message += f"Please provide a valid prescription to order this medicine."
         else:
-            ctx.logger.info(f"Order result for REST API user {user_sender}: {msg.status} - {msg.medicine}")
+            order_message = f"❌ **Order Error**\n\n"
+            order_message += f"**Medicine:** {msg.medicine}\n"
+            order_message += f"**Status:** {msg.status}\n"
+            order_message += f"**Details:** {msg.message}"
+
+        await deliver_result(ctx, user_sender, origin_of(user_sender, request_info), original_request_id or msg.request_id, "medicine_order", msg.status, order_message, {
+            "medicine": msg.medicine,
+            "quantity": msg.qty,
+            "total_price": msg.price,
+            "order_id": msg.order_id,
+        })
         
         # Clean up pending request if found
-        if original_request_id and original_request_id in pending_requests:
-            del pending_requests[original_request_id]
-            if original_request_id in user_request_mapping:
-                del user_request_mapping[original_request_id]
+        if original_request_id:
+            pending_requests.pop(original_request_id)
         
         ctx.logger.info(f"Pharmacy order response processed successfully")
         
@@ -3092,7 +3336,7 @@ async def handle_wellness_response(ctx: Context, sender: str, msg: WellnessAdvic
         # Store the WellnessAgent address for future communications
         if WELLNESS_AGENT_ADDRESS != sender:
             WELLNESS_AGENT_ADDRESS = sender
-            connected_agents[sender] = "WellnessAgent"
+            state.set("agents", sender, "WellnessAgent")
 
         # Check if this is a pending request
         if msg.request_id not in pending_requests:
@@ -3113,45 +3357,39 @@ async def handle_wellness_response(ctx: Context, sender: str, msg: WellnessAdvic
         )
         await ctx.send(sender, ack)
 
-        # Send result to user (only for direct chat users, not REST API users)
-        if user_sender and not user_sender.startswith("frontend_"):
-            if request_type == "wellness_delete":
-                if msg.success:
-                    wellness_message = f"🗑️ **Wellness Data Deleted Successfully!**\n\n"
-                    if msg.summary:
-                        wellness_message += f" **Summary:** {msg.summary}\n\n"
-                    if msg.advice:
-                        for advice in msg.advice:
-                            wellness_message += f"{advice}\n"
-                else:
-                    wellness_message = f"❌ **Wellness Data Deletion Failed**\n\n"
-                    wellness_message += f" **Error:** {msg.message}"
-            else:  # Regular wellness logging
-                if msg.success:
-                    wellness_message = f" **Wellness Data Logged Successfully!**\n\n"
-                    if msg.summary:
-                        wellness_message += f" **Summary:** {msg.summary}\n\n"
-                    if msg.advice:
-                        wellness_message += f" **AI Wellness Advice:**\n"
-                        for advice in msg.advice:
-                            wellness_message += f"• {advice}\n"
-                else:
-                    wellness_message = f" **Wellness Logging Failed**\n\n"
-                    wellness_message += f" **Error:** {msg.message}"
+        # Send result to the user (chat message, or result inbox for REST API users)
+        if request_type == "wellness_delete":
+            if msg.success:
+                wellness_message = f"🗑️ **Wellness Data Deleted Successfully!**\n\n"
+                if msg.summary:
+                    wellness_message += f" **Summary:** {msg.summary}\n\n"
+                if msg.advice:
+                    for advice in msg.advice:
+                        wellness_message += f"{advice}\n"
+            else:
+                wellness_message = f"❌ **Wellness Data Deletion Failed**\n\n"
+                wellness_message += f" **Error:** {msg.message}"
+        else:  # Regular wellness logging
+            if msg.success:
+                wellness_message = f" **Wellness Data Logged Successfully!**\n\n"
+                if msg.summary:
+                    wellness_message += f" **Summary:** {msg.summary}\n\n"
+                if msg.advice:
+                    wellness_message += f" **AI Wellness Advice:**\n"
+                    for advice in msg.advice:
+                        wellness_message += f"• {advice}\n"
+            else:
+                wellness_message = f" **Wellness Logging Failed**\n\n"
+                wellness_message += f" **Error:** {msg.message}"
 
-            chat_response = ChatMessage(
-                timestamp=datetime.now(timezone.utc),
-                msg_id=uuid4(),
-                content=[TextContent(type="text", text=wellness_message)]
-            )
-            await ctx.send(user_sender, chat_response)
-        else:
-            ctx.logger.info(f" Wellness result for REST API user {user_sender}: {msg.success} - {msg.message}")
+        await deliver_result(ctx, user_sender, origin_of(user_sender, request_info), msg.request_id, "wellness", "success" if msg.success else "failed", wellness_message, {
+            "request_type": request_type,
+            "summary": msg.summary,
+            "advice": msg.advice,
+        })
 
         # Clean up pending request
-        del pending_requests[msg.request_id]
-        if msg.request_id in user_request_mapping:
-            del user_request_mapping[msg.request_id]
+        pending_requests.pop(msg.request_id)
 
         ctx.logger.info(f" Wellness response processed successfully")
 
@@ -3164,6 +3402,87 @@ async def handle_request_ack(ctx: Context, sender: str, msg: RequestACK):
     """Handle ACK responses from other agents"""
     ctx.logger.info(f" Received ACK from {msg.agent_type} agent: {msg.message} (Request: {msg.request_id})")
 
+PENDING_REQUEST_LABELS = {
+    "doctor": "appointment booking",
+    "pharmacy_purchase": "medicine request",
+    "pharmacy_cart": "medicine cart request",
+    "pharmacy_order": "medicine order",
+    "wellness": "wellness logging",
+    "wellness_delete": "wellness data deletion",
+}
+
+# Expire requests whose sub-agent never answered
+@agent.on_interval(period=PENDING_SWEEP_INTERVAL)
+async def expire_pending_requests(ctx: Context):
+    """Drop timed-out inter-agent requests and tell the user"""
+    for request_id, request_info in pending_requests.expire():
+        user_sender = request_info.get("user_sender")
+        label = PENDING_REQUEST_LABELS.get(request_info.get("type"), "request")
+        ctx.logger.warning(f"⏱️ Pending {label} {request_id} expired without a response")
+
+        timeout_message = f"⏱️ **Your {label} timed out**\n\n"
+        timeout_message += f"We didn't hear back from the service in time (Request ID: {request_id}).\n"
+        timeout_message += "Please try again in a moment."
+        await deliver_result(ctx, user_sender, origin_of(user_sender, request_info), request_id, request_info.get("type", "request"), "timeout", timeout_message)
+
+# Expired entries are otherwise only dropped when read, so idle users' context would stay forever
+@agent.on_interval(period=STATE_PURGE_INTERVAL)
+async def purge_expired_state(ctx: Context):
+    purged = state.purge_expired()
+    if purged:
+        ctx.logger.info(f"🧹 Purged {purged} expired state entries")
+
+# Medication reminders, synced from the canister at startup and every REMINDER_SYNC_INTERVAL, fired from the timer wheel
+reminder_scheduler = ReminderScheduler(backend=state)
+REMINDER_SYNC_INTERVAL = 60  # seconds between syncs of reminders changed in the canister
+REMINDER_PAGE_SIZE = 500
+
+# Set by router.py when it runs several workers; each worker only schedules its own users' reminders
+SHARD_WORKERS = [url for url in os.getenv("HEALTH_SHARD_WORKERS", "").split(",") if url]
+shard_ring = HashRing(SHARD_WORKERS) if len(SHARD_WORKERS) > 1 else None
+
+def owns_user(user_id: str) -> bool:
+    """Whether this worker serves user_id (the router sends it all of that user's requests)"""
+    return shard_ring is None or shard_ring.node_for(user_id or "anonymous") == os.getenv("HEALTH_SHARD_SELF")
+
+async def load_reminders(ctx: Context):
+    """Sync the scheduler with reminders stored or deleted in the canister since its last version, a page at a time"""
+    since = reminder_scheduler.version
+    reminders, removed, offset, version, full = [], [], 0, None, False
+    while offset is not None:
+        result = await get_from_icp("get-active-reminders", {"since": since, "offset": offset, "limit": REMINDER_PAGE_SIZE})
+        if "error" in result:
+            ctx.logger.warning(f"⏰ Could not load reminders from ICP: {result['error']}")
+            return
+        if version is None:
+            # Pages resume from a cursor, so writes between pages do not shift them; anything written
+            # after the first page is fetched again by the next sync, which starts from this version
+            version, full = result.get("version"), bool(result.get("full"))
+        reminders.extend(result.get("reminders", []))
+        removed.extend(result.get("removed", []))
+        offset = result.get("next_offset")
+    reminders = [reminder for reminder in reminders if owns_user(reminder.get("user_id"))]
+    scheduled = reminder_scheduler.sync(reminders, removed, full=full, version=version)
+    if full or reminders or removed:
+        ctx.logger.info(f"⏰ Scheduled {scheduled} of {len(reminders)} {'active' if full else 'new'} medication reminders, "
+                        f"{len(removed)} removed (version {version})")
+
+@agent.on_interval(period=REMINDER_SYNC_INTERVAL)
+async def sync_reminders(ctx: Context):
+    # The frontend stores and deletes reminders directly in the canister
+    await load_reminders(ctx)
+
+@agent.on_interval(period=REMINDER_TICK)
+async def fire_due_reminders(ctx: Context):
+    """Notify users whose medication reminders are due"""
+    for reminder in reminder_scheduler.due():
+        ctx.logger.info(f"⏰ Reminder due for {reminder.get('user_id')}: {reminder.get('medicine')} ({reminder.get('time')})")
+        reminder_message = f"⏰ **Medication reminder**\n\nIt's time to take **{reminder.get('medicine')}** ({reminder.get('time')})."
+        await deliver_result(ctx, reminder.get("user_id"), origin_of(reminder.get("user_id")), f"reminder_{uuid4().hex[:8]}", "medication_reminder", "due", reminder_message, {
+            "medicine": reminder.get("medicine"),
+            "time": reminder.get("time"),
+        })
+
 # Include all protocols in the agent
 agent.include(chat_proto)
 agent.include(doctor_protocol)
@@ -3185,17 +3504,19 @@ async def health_agent_startup(ctx: Context):
     global DOCTOR_AGENT_ADDRESS
 
     if DOCTOR_AGENT_ADDRESS:
-        connected_agents[DOCTOR_AGENT_ADDRESS] = "DoctorAgent"
+        state.set("agents", DOCTOR_AGENT_ADDRESS, "DoctorAgent")
         ctx.logger.info(f" DoctorAgent configured: {DOCTOR_AGENT_ADDRESS}")
     else:
         ctx.logger.info("  DoctorAgent address not configured - update DOCTOR_AGENT_ADDRESS in code")
 
     if PHARMACY_AGENT_ADDRESS:
-        connected_agents[PHARMACY_AGENT_ADDRESS] = "PharmacyAgent"
+        state.set("agents", PHARMACY_AGENT_ADDRESS, "PharmacyAgent")
         ctx.logger.info(f" PharmacyAgent configured: {PHARMACY_AGENT_ADDRESS}")
     else:
         ctx.logger.info("  PharmacyAgent address not configured - will be set when PharmacyAgent connects")
 
+    await load_reminders(ctx)
+
 if __name__ == "__main__":
     print("Starting HealthAgent...")
     print(f"Agent Address: {agent.address}")
@@ -0,0 +1,85 @@
+import asyncio
+from typing import Callable, List, Tuple
+
+import requests
+
+MAX_BATCH_SIZE = 50
+MAX_BATCH_DELAY = 0.02  # seconds a lone booking waits for others to share its canister call
+
+
+def slot_key(appointment: dict) -> Tuple[str, str, str]:
+    return appointment.get("doctor_id"), appointment.get("appointment_date"), appointment.get("appointment_time")
+
+
+def store_appointments_bulk(base_url: str, headers: dict, appointments: List[dict], timeout: float = 30) -> List[dict]:
+    """POST appointments to /bulk-store-appointments; one result per appointment, in order"""
+    response = requests.post(f"{base_url}/bulk-store-appointments", headers=headers,
+                             json={"appointments": appointments}, timeout=timeout)
+    response.raise_for_status()
+    results = response.json().get("results", [])
+    if len(results) != len(appointments):
+        raise ValueError(f"bulk store returned {len(results)} results for {len(appointments)} appointments")
+    return results
+
+
+class AppointmentBatcher:
+    """Group-commits appointment writes: concurrent bookings share one bulk canister call per batch"""
+
+    def __init__(self, write_batch: Callable[[List[dict]], List[dict]], max_batch_size: int = MAX_BATCH_SIZE,
+                 max_delay: float = MAX_BATCH_DELAY):
+        self.write_batch = write_batch  # blocking; run in a thread so bookings keep arriving meanwhile
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._full = asyncio.Event()
+        self._flusher = None
+        self.batches = 0
+        self.written = 0
+
+    async def submit(self, appointment: dict) -> dict:
+        """Queue one appointment; resolves to its result ({success, message, conflict, ...})"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((appointment, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._full.set()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._run())
+        return await future
+
+    async def _run(self):
+        # One batch in flight at a time; bookings arriving during a write form the next batch
+        while self._pending:
+            if len(self._pending) < self.max_batch_size:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[dict, asyncio.Future]]):
+        # Two bookings for the same slot in one batch: the later one loses without a canister round trip
+        seen = set()
+        to_write = []
+        for appointment, future in batch:
+            key = slot_key(appointment)
+            if key in seen:
+                future.set_result({"appointment_id": appointment.get("appointment_id"), "success": False,
+                                   "conflict": True, "message": "Slot already booked in this batch"})
+                continue
+            seen.add(key)
+            to_write.append((appointment, future))
+        if not to_write:
+            return
+
+        try:
+            results = await asyncio.to_thread(self.write_batch, [appointment for appointment, _ in to_write])
+        except Exception as e:
+            results = [{"success": False, "conflict": False, "message": f"Failed to store appointments: {str(e)}"}] * len(to_write)
+        self.batches += 1
+        self.written += len(to_write)
+        for (appointment, future), result in zip(to_write, results):
+            if not future.done():
+                future.set_result(result)
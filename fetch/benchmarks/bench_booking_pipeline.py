@@ -0,0 +1,165 @@
+"""Appointment booking throughput: one store-appointment call per booking vs. batched bulk writes.
+
+Books hundreds of simultaneous appointments through SlotScheduler against a local
+canister stand-in whose update calls are processed one at a time with a fixed
+latency, as the canister executes messages sequentially:
+
+    cd fetch && python benchmarks/bench_booking_pipeline.py --bookings 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+FETCH_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FETCH_DIR)
+
+from appointment_batcher import AppointmentBatcher, store_appointments_bulk  # noqa: E402
+from doctor_schedule import SlotScheduler  # noqa: E402
+
+HEADERS = {"Content-Type": "application/json"}
+
+
+class CanisterStandIn:
+    """store-appointment and bulk-store-appointments with sequential execution and a per-call latency"""
+
+    def __init__(self, port: int, update_latency: float, per_item_cost: float):
+        self.update_latency = update_latency
+        self.per_item_cost = per_item_cost
+        self.calls = 0
+        self.taken = set()
+        self.double_booked = 0
+        self._lock = threading.Lock()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path == "/bulk-store-appointments":
+                    payload = {"results": stand_in.store(body.get("appointments", []))}
+                    payload["success"] = all(result["success"] for result in payload["results"])
+                else:
+                    result = stand_in.store([body])[0]
+                    payload = {"success": result["success"], "appointment_id": body.get("appointment_id"), "message": result["message"]}
+                data = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def store(self, appointments):
+        with self._lock:
+            self.calls += 1
+            time.sleep(self.update_latency + self.per_item_cost * len(appointments))
+            results = []
+            for appointment in appointments:
+                key = (appointment["doctor_id"], appointment["appointment_date"], appointment["appointment_time"])
+                conflict = key in self.taken
+                self.double_booked += conflict
+                self.taken.add(key)
+                results.append({"appointment_id": appointment["appointment_id"], "success": not conflict,
+                                "conflict": conflict, "message": "conflict" if conflict else "ok"})
+            return results
+
+    def close(self):
+        self.server.shutdown()
+
+
+def make_doctors(count: int) -> list:
+    return [{
+        "doctor_id": f"gp_{index:03d}",
+        "name": f"Dr. Bench {index}",
+        "specialty": "General Practitioner",
+        "available_days": ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"],
+        "available_slots": ["09:00", "10:00", "11:00", "12:00", "14:00", "15:00", "16:00", "17:00"],
+    } for index in range(count)]
+
+
+def appointment_for(doctor: dict, slot, index: int) -> dict:
+    return {
+        "appointment_id": f"APT-BENCH-{index}",
+        "doctor_id": doctor["doctor_id"],
+        "doctor_name": doctor["name"],
+        "specialty": doctor["specialty"],
+        "patient_symptoms": "bench",
+        "appointment_date": slot[0],
+        "appointment_time": slot[1],
+        "status": "confirmed",
+        "urgency": "normal",
+        "created_at": datetime.now().isoformat(),
+        "user_id": f"bench_user_{index}",
+    }
+
+
+async def book_all(bookings: int, doctors: list, store) -> float:
+    """Run every booking concurrently; store(appointment) -> result. Returns elapsed seconds."""
+    scheduler = SlotScheduler()
+    now = datetime.now() + timedelta(days=1)
+
+    async def book(index: int):
+        doctor = doctors[index % len(doctors)]
+        slot = scheduler.reserve(doctor, "next available", "normal", now)
+        result = await store(appointment_for(doctor, slot, index))
+        if result.get("success"):
+            scheduler.confirm(doctor["doctor_id"], *slot)
+        else:
+            scheduler.release(doctor["doctor_id"], *slot)
+        return result.get("success", False)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(book(index) for index in range(bookings)))
+    elapsed = time.perf_counter() - started
+    assert all(results), f"{results.count(False)} bookings failed"
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bookings", type=int, default=500, help="simultaneous bookings")
+    parser.add_argument("--doctors", type=int, default=20)
+    parser.add_argument("--update-latency", type=float, default=0.02, help="seconds per canister update call")
+    parser.add_argument("--per-item-cost", type=float, default=0.0002, help="extra seconds per appointment in a call")
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+    doctors = make_doctors(args.doctors)
+
+    print(f"{'mode':>12} {'bookings/s':>11} {'seconds':>8} {'calls':>6} {'double-booked':>14}")
+    for mode in ("per-booking", "batched"):
+        stand_in = CanisterStandIn(18950, args.update_latency, args.per_item_cost)
+        base_url = "http://127.0.0.1:18950"
+        try:
+            if mode == "per-booking":
+                def store_one(appointment):
+                    response = requests.post(f"{base_url}/store-appointment", headers=HEADERS, json=appointment, timeout=120)
+                    return response.json()
+
+                async def store(appointment):
+                    return await asyncio.to_thread(store_one, appointment)
+            else:
+                batcher = AppointmentBatcher(lambda appointments: store_appointments_bulk(base_url, HEADERS, appointments, timeout=120),
+                                             max_batch_size=args.batch_size)
+                store = batcher.submit
+            elapsed = asyncio.run(book_all(args.bookings, doctors, store))
+            print(f"{mode:>12} {args.bookings / elapsed:>11.1f} {elapsed:>8.2f} {stand_in.calls:>6} {stand_in.double_booked:>14}")
+        finally:
+            stand_in.close()
+            stand_in.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
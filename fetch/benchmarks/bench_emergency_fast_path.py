@@ -0,0 +1,186 @@
+"""Response time of emergency messages, which must not wait on the LLM, the canister or the chat queue.
+
+Checks the emergency lexicon in-process, then runs agent.py against slow local
+stand-ins for the ASI1 API and the canister while other users keep the chat
+queue full, and fails if emergency replies are not under the budget:
+
+    cd fetch && python benchmarks/bench_emergency_fast_path.py
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from aiohttp import ClientSession, web
+
+FETCH_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FETCH_DIR)
+
+from emergency import ACUTE_STATES, FIRST_PERSON_ACUTE, STANDALONE_ACUTE, detect_emergency  # noqa: E402
+
+EMERGENCY_MESSAGES = [
+    "Emergency! I'm having chest pain!",
+    "I think I'm having a heart attack",
+    "I can't breathe",
+    "I am having a seizure, what do I do",
+    "I took too many pills, please help",
+    "call an ambulance, my face is drooping",
+]
+ORDINARY_MESSAGE = "I have had a mild headache for three days and some nausea after meals, what should I do?"
+# Mentions of acute states that are not happening to the user now, which must go to the LLM classifier
+NOT_EMERGENCIES = [
+    ORDINARY_MESSAGE,
+    "this is not an emergency",
+    "my father had a heart attack last year, should I get checked?",
+    "remind me to take my chest pain medication",
+    "what are the signs of a stroke?",
+    "I would never kill myself",
+]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def bench_lexicon(rounds: int) -> float:
+    """p99 detection time in ms over the emergency messages and an ordinary one"""
+    for state in ACUTE_STATES:
+        assert detect_emergency(f"help, I'm having {state} right now") is not None, state
+    for phrase in FIRST_PERSON_ACUTE:
+        message = f"help, i{phrase}" if phrase.startswith("'") else f"help, i {phrase}"
+        assert detect_emergency(message) is not None, phrase
+    for phrase in STANDALONE_ACUTE:
+        assert detect_emergency(f"please {phrase} now") is not None, phrase
+    for message in EMERGENCY_MESSAGES:
+        assert detect_emergency(message) is not None, message
+    for message in NOT_EMERGENCIES:
+        assert detect_emergency(message) is None, message
+
+    timings = []
+    for _ in range(rounds):
+        for message in EMERGENCY_MESSAGES + [ORDINARY_MESSAGE]:
+            started = time.perf_counter()
+            detect_emergency(message)
+            timings.append((time.perf_counter() - started) * 1000)
+    return percentile(timings, 0.99)
+
+
+async def start_stand_ins(port: int, llm_latency: float, canister_latency: float) -> "web.AppRunner":
+    """Slow ASI1 chat-completions and canister stand-ins"""
+    from aiohttp import web
+
+    async def chat_completions(request: "web.Request") -> "web.Response":
+        await asyncio.sleep(llm_latency)
+        return web.json_response({"choices": [{"message": {"role": "assistant", "content": "general"}}]})
+
+    async def canister(request: "web.Request") -> "web.Response":
+        await asyncio.sleep(canister_latency)
+        return web.json_response({"success": True, "message": "ok", "id": None})
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_route("*", "/{tail:.*}", canister)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+async def wait_until_online(session: "ClientSession", agent_url: str, timeout: float = 90):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(agent_url + "/health") as response:
+                if response.status == 200:
+                    return
+        except Exception:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"agent did not come online within {timeout}s")
+
+
+async def bench_agent(requests_count: int, background_users: int, llm_latency: float, canister_latency: float) -> list:
+    """Emergency reply latencies in ms through /api/chat while background_users keep the queue busy"""
+    # Only the end-to-end run needs aiohttp, so --lexicon-only works without it
+    from aiohttp import ClientSession, ClientTimeout
+    stand_in_port, agent_port = 18901, 18201
+    stand_ins = await start_stand_ins(stand_in_port, llm_latency, canister_latency)
+    env = dict(
+        os.environ,
+        ASI1_API_KEY="bench",
+        ASI1_BASE_URL=f"http://127.0.0.1:{stand_in_port}/v1",
+        BASE_URL=f"http://127.0.0.1:{stand_in_port}",
+        HEALTH_AGENT_MAILBOX="false",
+        HEALTH_AGENT_PORT=str(agent_port),
+        HEALTH_AGENT_NAME="health-agent-bench",
+    )
+    agent = subprocess.Popen([sys.executable, "agent.py"], cwd=FETCH_DIR, env=env,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    agent_url = f"http://127.0.0.1:{agent_port}"
+    latencies = []
+    try:
+        async with ClientSession(timeout=ClientTimeout(total=120)) as session:
+            await wait_until_online(session, agent_url)
+            stop = asyncio.Event()
+
+            async def background_user(index: int):
+                while not stop.is_set():
+                    try:
+                        async with session.post(agent_url + "/api/chat",
+                                                json={"message": ORDINARY_MESSAGE, "user_id": f"frontend_load_{index}"}) as response:
+                            await response.read()
+                    except Exception:
+                        await asyncio.sleep(0.1)
+
+            load = [asyncio.create_task(background_user(index)) for index in range(background_users)]
+            await asyncio.sleep(min(llm_latency, 2.0))  # let the queue fill
+            for index in range(requests_count):
+                message = EMERGENCY_MESSAGES[index % len(EMERGENCY_MESSAGES)]
+                started = time.perf_counter()
+                async with session.post(agent_url + "/api/chat",
+                                        json={"message": message, "user_id": f"frontend_emergency_{index}"}) as response:
+                    body = await response.json()
+                latencies.append((time.perf_counter() - started) * 1000)
+                assert body.get("intent") == "emergency", body
+            stop.set()
+            for task in load:
+                task.cancel()
+            await asyncio.gather(*load, return_exceptions=True)
+    finally:
+        agent.terminate()
+        agent.wait()
+        await stand_ins.cleanup()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=10.0, help="p95 emergency response time to assert")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--background-users", type=int, default=80, help="users keeping the chat queue full")
+    parser.add_argument("--llm-latency", type=float, default=5.0, help="stand-in ASI1 response time in seconds")
+    parser.add_argument("--canister-latency", type=float, default=2.0, help="stand-in canister response time in seconds")
+    parser.add_argument("--lexicon-only", action="store_true", help="skip the end-to-end run through agent.py")
+    args = parser.parse_args()
+
+    lexicon_p99 = bench_lexicon(2000)
+    print(f"lexicon    p99 {lexicon_p99:.3f} ms")
+    assert lexicon_p99 < args.budget_ms, f"emergency detection p99 {lexicon_p99:.3f} ms exceeds {args.budget_ms} ms"
+    if args.lexicon_only:
+        return
+
+    latencies = asyncio.run(bench_agent(args.requests, args.background_users, args.llm_latency, args.canister_latency))
+    p95 = percentile(latencies, 0.95)
+    print(f"/api/chat  p50 {statistics.median(latencies):.2f} ms  p95 {p95:.2f} ms  max {max(latencies):.2f} ms  "
+          f"({len(latencies)} emergency requests, {args.background_users} background users)")
+    assert p95 < args.budget_ms, f"emergency response p95 {p95:.2f} ms exceeds {args.budget_ms} ms"
+
+
+if __name__ == "__main__":
+    main()
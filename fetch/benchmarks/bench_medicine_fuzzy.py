@@ -0,0 +1,131 @@
+"""Typo-tolerant medicine lookup on a synthetic catalog.
+
+Builds a catalog of generated drug names, misspells names of random medicines with one
+or two edits (substitution, insertion, deletion, transposition) and reports lookup
+latency and how often the intended medicine is found, for the fuzzy index alone and for
+MedicineCatalog.search (exact matches first, fuzzy fallback):
+
+    cd fetch && python benchmarks/bench_medicine_fuzzy.py --medicines 50000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+FETCH_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FETCH_DIR)
+
+from medicine_catalog import MedicineCatalog  # noqa: E402
+from medicine_fuzzy import FuzzyNameIndex, max_distance  # noqa: E402
+
+ONSETS = ["b", "c", "d", "f", "g", "h", "k", "l", "m", "n", "p", "r", "s", "t", "v", "z", "br", "cl",
+          "dr", "fl", "gr", "pr", "st", "tr", "ph", "th", "ch", "x", "qu", "sp"]
+VOWELS = ["a", "e", "i", "o", "u", "y", "ae", "io", "ou"]
+CODAS = ["", "", "", "n", "r", "l", "x", "s", "m", "t"]
+# INN stems many real drug names end in
+STEMS = ["pril", "olol", "statin", "mycin", "cillin", "azole", "profen", "tidine", "sartan", "dipine",
+         "zepam", "oxetine", "formin", "lukast", "dronate", "vir", "mab", "tinib", "caine", "amol",
+         "afil", "gliptin", "parin", "setron", "triptan", "lukast", "conazole", "floxacin", "sone", "lone"]
+CATEGORIES = ["Pain Relief", "Antibiotic", "Vitamin", "Allergy", "Diabetes", "Heart", "Mental Health", "Digestive Health"]
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def make_name(rng: random.Random) -> str:
+    name = "".join(rng.choice(ONSETS) + rng.choice(VOWELS) + rng.choice(CODAS) for _ in range(rng.randint(2, 3)))
+    return name + rng.choice(STEMS) if rng.random() < 0.6 else name
+
+
+def make_catalog(count: int, rng: random.Random) -> list:
+    names = set()
+    while len(names) < count:
+        names.add(make_name(rng))
+    medicines = []
+    for index, name in enumerate(sorted(names)):
+        generic = make_name(rng)
+        medicines.append({
+            "medicine_id": f"med_{index:06d}",
+            "name": name.capitalize(),
+            "generic_name": generic,
+            "active_ingredient": f"{generic} {rng.choice([5, 10, 20, 50, 100, 250, 500])}mg",
+            "category": rng.choice(CATEGORIES),
+            "stock": rng.randint(0, 500),
+            "price": round(rng.uniform(1, 80), 2),
+        })
+    return medicines
+
+
+def misspell(word: str, edits: int, rng: random.Random) -> str:
+    for _ in range(edits):
+        position = rng.randrange(1, len(word) - 1)
+        kind = rng.choice(["substitute", "insert", "delete", "transpose"])
+        if kind == "substitute":
+            word = word[:position] + rng.choice(LETTERS) + word[position + 1:]
+        elif kind == "insert":
+            word = word[:position] + rng.choice(LETTERS) + word[position:]
+        elif kind == "delete":
+            word = word[:position] + word[position + 1:]
+        else:
+            word = word[:position - 1] + word[position] + word[position - 1] + word[position + 1:]
+    return word
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(label: str, search, queries: list) -> None:
+    timings, top1, found = [], 0, 0
+    for query, medicine_id in queries:
+        started = time.perf_counter()
+        results = search(query)
+        timings.append((time.perf_counter() - started) * 1000)
+        top1 += bool(results) and results[0] == medicine_id
+        found += medicine_id in results
+    print(f"{label:>26} {statistics.median(timings):>8.3f} {percentile(timings, 0.99):>8.3f} "
+          f"{100 * top1 / len(queries):>6.1f}% {100 * found / len(queries):>6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--medicines", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    medicines = make_catalog(args.medicines, rng)
+    started = time.perf_counter()
+    index = FuzzyNameIndex()
+    for medicine in medicines:
+        index.put(medicine)
+    print(f"fuzzy index over {len(index)} medicines built in {time.perf_counter() - started:.2f}s")
+    started = time.perf_counter()
+    catalog = MedicineCatalog()
+    catalog.apply({"medicines": medicines, "version": 1, "full": True})
+    print(f"catalog replica loaded in {time.perf_counter() - started:.2f}s\n")
+
+    sample = rng.sample(medicines, args.queries)
+    exact = [(medicine["name"].lower(), medicine["medicine_id"]) for medicine in sample]
+    one_edit = [(misspell(medicine["name"].lower(), 1, rng), medicine["medicine_id"]) for medicine in sample]
+    two_edits = [(misspell(medicine["name"].lower(), 2, rng), medicine["medicine_id"])
+                 for medicine in sample if max_distance(medicine["name"]) >= 2]
+
+    def fuzzy(query):
+        return [medicine_id for medicine_id, _, _ in index.search(query)]
+
+    def catalog_search(query):
+        return [medicine["medicine_id"] for medicine in catalog.search(query)]
+
+    print(f"{'lookup':>26} {'p50 ms':>8} {'p99 ms':>8} {'top-1':>7} {'found':>7}")
+    run("fuzzy index, 1 edit", fuzzy, one_edit)
+    run("fuzzy index, 2 edits", fuzzy, two_edits)
+    run("catalog.search, exact", catalog_search, exact)
+    run("catalog.search, 1 edit", catalog_search, one_edit)
+    run("catalog.search, 2 edits", catalog_search, two_edits)
+
+
+if __name__ == "__main__":
+    main()
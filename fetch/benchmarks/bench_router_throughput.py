@@ -0,0 +1,118 @@
+"""Chat throughput of the sharded HealthAgent deployment as the worker count grows.
+
+Runs router.py with 1, 2, 4, ... agent.py workers against local stand-ins for the
+ASI1 API and the canister, so no network or dfx is needed:
+
+    cd fetch && python benchmarks/bench_router_throughput.py --workers 1 2 4 8
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from aiohttp import ClientSession, ClientTimeout, web
+
+FETCH_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def start_stand_ins(port: int, llm_latency: float) -> web.AppRunner:
+    """ASI1 chat-completions and canister stand-ins with a fixed response latency"""
+
+    async def chat_completions(request: web.Request) -> web.Response:
+        await asyncio.sleep(llm_latency)
+        return web.json_response({"choices": [{"message": {"role": "assistant", "content": "general"}}]})
+
+    async def canister(request: web.Request) -> web.Response:
+        return web.json_response({"success": True, "message": "ok", "id": None})
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_route("*", "/{tail:.*}", canister)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+async def wait_until_online(session: ClientSession, router_url: str, workers: int, timeout: float = 90):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(router_url + "/health") as response:
+                status = await response.json()
+                if list(status.get("workers", {}).values()).count("online") == workers:
+                    return
+        except Exception:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"workers did not come online within {timeout}s")
+
+
+async def run_load(session: ClientSession, router_url: str, users: int, duration: float) -> list:
+    latencies = []
+    stop_at = time.monotonic() + duration
+
+    async def user_loop(index: int):
+        while time.monotonic() < stop_at:
+            started = time.monotonic()
+            async with session.post(router_url + "/api/chat", json={"message": "hello", "user_id": f"frontend_bench_{index}"}) as response:
+                await response.read()
+                if response.status == 200:
+                    latencies.append(time.monotonic() - started)
+
+    await asyncio.gather(*(user_loop(index) for index in range(users)))
+    return latencies
+
+
+async def bench(worker_counts, users: int, duration: float, llm_latency: float):
+    stand_in_port, router_port, base_port = 18900, 18000, 18100
+    stand_ins = await start_stand_ins(stand_in_port, llm_latency)
+    env = dict(
+        os.environ,
+        ASI1_API_KEY="bench",
+        ASI1_BASE_URL=f"http://127.0.0.1:{stand_in_port}/v1",
+        BASE_URL=f"http://127.0.0.1:{stand_in_port}",
+        HEALTH_AGENT_MAILBOX="false",
+    )
+    print(f"{'workers':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'requests':>9}")
+    try:
+        async with ClientSession(timeout=ClientTimeout(total=120)) as session:
+            for workers in worker_counts:
+                router = subprocess.Popen(
+                    [sys.executable, "router.py", "--workers", str(workers),
+                     "--port", str(router_port), "--base-port", str(base_port)],
+                    cwd=FETCH_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                )
+                try:
+                    router_url = f"http://127.0.0.1:{router_port}"
+                    await wait_until_online(session, router_url, workers)
+                    latencies = await run_load(session, router_url, users, duration)
+                finally:
+                    router.terminate()
+                    router.wait()
+                if not latencies:
+                    print(f"{workers:>7} {'-':>8} {'-':>8} {'-':>8} {0:>9}")
+                    continue
+                latencies.sort()
+                p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+                print(f"{workers:>7} {len(latencies) / duration:>8.1f} {statistics.median(latencies) * 1000:>8.1f} "
+                      f"{p95 * 1000:>8.1f} {len(latencies):>9}")
+    finally:
+        await stand_ins.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--users", type=int, default=64, help="concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds of load per worker count")
+    parser.add_argument("--llm-latency", type=float, default=0.02, help="stand-in ASI1 response time in seconds")
+    args = parser.parse_args()
+    asyncio.run(bench(args.workers, args.users, args.duration, args.llm_latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Wellness insight statistics over multi-year log histories.
+
+Generates daily logs (with gaps, numeric-key ICP rows and repeated moods) and times the
+per-log Python statistics the insight builders used to compute against WellnessAnalytics,
+which also derives rolling averages, percentiles, trends, weekday patterns and anomalies:
+
+    cd fetch && python benchmarks/bench_wellness_analytics.py --years 1 3 10
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import sys
+import time
+
+FETCH_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FETCH_DIR)
+
+from wellness_analytics import ICP_LOG_KEYS, WellnessAnalytics  # noqa: E402
+
+MOODS = ["Happy", "Calm", "Tired", "Stressed", "Energetic", "Sad", "Anxious", "Content"]
+EXERCISES = ["running", "walking", "yoga", "cycling", "swimming", "gym", "Not logged"]
+FIELD_KEYS = {field: key for key, field in ICP_LOG_KEYS.items()}
+
+
+def make_logs(days: int, rng: random.Random) -> list:
+    start = datetime.date(2026, 1, 1) - datetime.timedelta(days=days)
+    logs = []
+    for offset in range(days):
+        if rng.random() < 0.1:
+            continue  # a missed day
+        log = {
+            "user_id": "bench_user",
+            "date": (start + datetime.timedelta(days=offset)).isoformat(),
+            "sleep": round(rng.gauss(7, 1), 1) if rng.random() < 0.9 else None,
+            "steps": max(0, int(rng.gauss(8000, 2500))) if rng.random() < 0.85 else None,
+            "water_intake": round(rng.uniform(3, 10), 1) if rng.random() < 0.7 else None,
+            "mood": rng.choice(MOODS) if rng.random() < 0.8 else None,
+            "exercise": rng.choice(EXERCISES),
+        }
+        if rng.random() < 0.3:
+            log = {FIELD_KEYS[field]: value for field, value in log.items()}
+        logs.append(log)
+    return logs
+
+
+def legacy_statistics(logs: list) -> dict:
+    """The per-log list comprehensions the insight builders ran before WellnessAnalytics"""
+    normalized = []
+    for log in logs:
+        if "date" in log:
+            normalized.append(log)
+        else:
+            normalized.append({ICP_LOG_KEYS[key]: value for key, value in log.items() if key in ICP_LOG_KEYS})
+    sleep_data = [log.get("sleep") for log in normalized if (log.get("sleep") or 0) > 0]
+    steps_data = [log.get("steps") for log in normalized if (log.get("steps") or 0) > 0]
+    water_data = [log.get("water_intake") for log in normalized if (log.get("water_intake") or 0) > 0]
+    moods = [str(log.get("mood")) for log in normalized if log.get("mood")]
+    exercises = [log.get("exercise") for log in normalized if log.get("exercise") and log.get("exercise") != "Not logged"]
+    return {
+        "avg_sleep": sum(sleep_data) / len(sleep_data) if sleep_data else 0,
+        "sleep_range": (min(sleep_data), max(sleep_data)) if sleep_data else (0, 0),
+        "total_steps": sum(steps_data),
+        "avg_water": sum(water_data) / len(water_data) if water_data else 0,
+        "top_mood": max(set(moods), key=moods.count) if moods else None,
+        "exercise_days": len(exercises),
+        "calendar_days": len({log.get("date") for log in normalized if log.get("date")}),
+    }
+
+
+def timed(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 3, 10])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    print(f"{'history':>10} {'logs':>7} {'legacy ms':>10} {'build ms':>9} {'summary ms':>11}")
+    for years in args.years:
+        logs = make_logs(365 * years, rng)
+        legacy = timed(lambda: legacy_statistics(logs), args.repeat)
+        build = timed(lambda: WellnessAnalytics(logs), args.repeat)
+        full = timed(lambda: WellnessAnalytics(logs).summary(), args.repeat)
+
+        expected = legacy_statistics(logs)
+        summary = WellnessAnalytics(logs).summary()
+        assert abs(summary["metrics"]["sleep"]["mean"] - expected["avg_sleep"]) < 1e-9
+        assert summary["metrics"]["steps"]["total"] == expected["total_steps"]
+        assert summary["moods"][summary["top_mood"]] == summary["moods"].get(expected["top_mood"])
+        print(f"{years:>8}y {len(logs):>7} {legacy:>10.2f} {build:>9.2f} {full:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
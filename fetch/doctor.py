@@ -1,3 +1,4 @@
+import asyncio
 import requests
 import json
 import os
@@ -6,6 +7,10 @@ from uagents import Agent, Context, Protocol, Model
 from datetime import datetime, timezone
 from uuid import uuid4
 from typing import Optional
+from doctor_schedule import SlotScheduler
+from doctor_index import DoctorIndex
+from specialty_resolver import normalize_specialty
+from appointment_batcher import AppointmentBatcher, store_appointments_bulk
 
 # Load environment variables
 load_dotenv()
@@ -19,6 +24,10 @@ HEADERS = {
     "Content-Type": "application/json"
 }
 
+APPOINTMENT_REFRESH_INTERVAL = 300  # seconds between reloads of booked slots from the canister
+DOCTOR_INDEX_CHECK_INTERVAL = 30  # seconds between checks of the canister's doctor directory version
+BOOKING_ATTEMPTS = 3  # slots to try when the canister reports the chosen one was taken meanwhile
+
 # === Agent Setup ===
 agent = Agent(
     name="doctor_agent",
@@ -53,16 +62,26 @@ class DoctorBookingResponse(Model):
 
 class DoctorSearchRequest(Model):
     specialty: str
+    min_rating: Optional[float] = None
+    available_day: Optional[str] = None  # weekday name or YYYY-MM-DD
+    earliest_slot: Optional[str] = None  # YYYY-MM-DD[THH:MM]; only doctors free from then on
+    max_results: int = 20
+    continuation_token: Optional[str] = None  # next_token of the previous page
 
 class DoctorSearchResponse(Model):
     doctors: list
-    total_count: int
+    total_count: int  # all matches, not just this page
     status: str = "success"
+    next_token: Optional[str] = None  # set when there are more pages
+    message: Optional[str] = None  # why the search failed, when status is not "success"
 
-# Doctor database moved to ICP backend - no local storage needed
+# Doctor database lives in the ICP backend; DoctorAgent keeps a local index of it (doctor_index)
 
 def parse_doctor_from_icp(doctor_data: dict) -> dict:
     """Convert ICP numeric key format to readable doctor fields"""
+    # get-doctor-directory already returns named fields
+    if "doctor_id" in doctor_data:
+        return dict(doctor_data)
     # Map numeric keys to field names based on ICP response pattern
     parsed_doctor = {}
     for key, value in doctor_data.items():
@@ -101,7 +120,7 @@ async def get_from_icp(endpoint: str, params: dict = None) -> dict:
     """Retrieve data from ICP canister backend"""
     try:
         url = f"{BASE_URL}/{endpoint}"
-        if params:
+        if params is not None:
             response = requests.post(url, headers=HEADERS, json=params, timeout=10)
         else:
             response = requests.get(url, headers=HEADERS, timeout=10)
@@ -110,13 +129,36 @@ async def get_from_icp(endpoint: str, params: dict = None) -> dict:
     except Exception as e:
         return {"error": f"Failed to retrieve data: {str(e)}", "status": "failed"}
 
+# Parsed doctors by specialty, so bookings and searches don't read the canister each time
+doctor_index = DoctorIndex()
+
+async def refresh_doctor_index(ctx: Context = None, force: bool = False):
+    """Reload the doctor index if the canister's directory version changed or the index is too old"""
+    version_response = await get_from_icp("get-doctors-version", {})
+    version = None if "error" in version_response else version_response.get("version")
+    if not force and not doctor_index.needs_reload(version):
+        return
+    directory = await get_from_icp("get-doctor-directory", {})
+    if "error" in directory:
+        if ctx:
+            ctx.logger.warning(f"Could not load doctor directory: {directory['error']}")
+        return
+    doctor_index.load([parse_doctor_from_icp(doctor) for doctor in directory.get("doctors", [])], directory.get("version", version))
+    if ctx:
+        ctx.logger.info(f"Doctor index loaded: {len(doctor_index)} doctors (version {doctor_index.version})")
+
 async def search_doctors_by_specialty(specialty: str) -> list:
-    """Search for doctors by specialty using ICP backend"""
+    """Search for doctors by specialty using the local doctor index, falling back to the ICP backend"""
     try:
         # Normalize specialty names to match backend data
         specialty_normalized = normalize_specialty(specialty)
         print(f"[DEBUG] Original specialty: '{specialty}' -> Normalized: '{specialty_normalized}'")
-        
+
+        if not len(doctor_index):
+            await refresh_doctor_index(force=True)
+        if len(doctor_index):
+            return doctor_index.doctors_for(specialty_normalized)
+
         # Get doctors from ICP backend
         response = await get_from_icp("get-doctors-by-specialty", {"specialty": specialty_normalized})
         print(f"[DEBUG] ICP response: {response}")
@@ -136,74 +178,70 @@ async def search_doctors_by_specialty(specialty: str) -> list:
         print(f"[DEBUG] Exception in search: {str(e)}")
         return []
 
-def normalize_specialty(specialty: str) -> str:
-    """Normalize specialty names to match backend database"""
-    specialty_lower = specialty.lower().strip()
-    
-    # Map different ways of saying specialties to standardized names
-    if any(term in specialty_lower for term in ["cardiologist", "cardiology", "heart"]):
-        return "Cardiology"
-    elif any(term in specialty_lower for term in ["dermatologist", "dermatology", "skin"]):
-        return "Dermatology"
-    elif any(term in specialty_lower for term in ["neurologist", "neurology", "brain"]):
-        return "Neurology"
-    elif any(term in specialty_lower for term in ["orthopedic", "orthopedics", "bone"]):
-        return "Orthopedics"
-    elif any(term in specialty_lower for term in ["pediatrician", "pediatrics", "child"]):
-        return "Pediatrics"
-    elif any(term in specialty_lower for term in ["oncologist", "oncology", "cancer"]):
-        return "Oncology"
-    elif any(term in specialty_lower for term in ["psychiatrist", "psychiatry", "mental"]):
-        return "Psychiatry"
-    else:
-        return "General Practitioner"
+# Booked slots of every doctor; reservations are made here before the canister write
+slot_scheduler = SlotScheduler()
+
+async def refresh_booked_slots(ctx: Context):
+    """Reload booked appointment slots from the canister"""
+    response = await get_from_icp("get-all-appointments", {})
+    if isinstance(response, dict) and "error" in response:
+        ctx.logger.warning(f"Could not load appointments: {response['error']}")
+        return
+    appointments = response if isinstance(response, list) else response.get("appointments", [])
+    slot_scheduler.load_appointments(appointments)
+    ctx.logger.info(f"Loaded {len(appointments)} appointments into the slot index")
+
+# Appointment writes from concurrent bookings share bulk-store-appointments calls
+appointment_batcher = AppointmentBatcher(lambda appointments: store_appointments_bulk(BASE_URL, HEADERS, appointments))
 
 async def book_appointment(doctor_info: dict, preferred_time: str, urgency: str, symptoms: str, user_id: str) -> dict:
     """Book an appointment with a doctor"""
     try:
-        # Generate appointment details
-        appointment_id = f"APT-{datetime.now().strftime('%Y%m%d')}-{uuid4().hex[:6].upper()}"
-        
-        # Simple time scheduling logic
-        if preferred_time.lower() in ["today", "asap", "urgent"]:
-            appointment_date = datetime.now().strftime("%Y-%m-%d")
-            appointment_time = doctor_info["available_slots"][0] if doctor_info["available_slots"] else "09:00"
-        elif preferred_time.lower() == "tomorrow":
-            appointment_date = datetime.now().replace(day=datetime.now().day + 1).strftime("%Y-%m-%d")
-            appointment_time = doctor_info["available_slots"][0] if doctor_info["available_slots"] else "09:00"
-        else:
-            # Default to next available slot
-            appointment_date = datetime.now().replace(day=datetime.now().day + 1).strftime("%Y-%m-%d")
-            appointment_time = doctor_info["available_slots"][0] if doctor_info["available_slots"] else "09:00"
-        
-        appointment_data = {
-            "appointment_id": appointment_id,
-            "doctor_id": doctor_info["doctor_id"],
-            "doctor_name": doctor_info["name"],
-            "specialty": doctor_info["specialty"],
-            "patient_symptoms": symptoms,
-            "appointment_date": appointment_date,
-            "appointment_time": appointment_time,
-            "status": "confirmed",
-            "urgency": urgency,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "user_id": user_id
-        }
-        
-        # Store appointment in ICP canister
-        store_result = await store_to_icp("store-appointment", appointment_data)
-        
-        if "error" in store_result:
-            return {"success": False, "error": store_result["error"]}
-        
-        return {
-            "success": True,
-            "appointment_id": appointment_id,
-            "doctor_name": doctor_info["name"],
-            "appointment_time": f"{appointment_date} at {appointment_time}",
-            "message": "Appointment successfully booked"
-        }
-        
+        for attempt in range(BOOKING_ATTEMPTS):
+            # Reserve the earliest free slot matching urgency and preferred time
+            slot = slot_scheduler.reserve(doctor_info, preferred_time or "", urgency or "normal")
+            if slot is None:
+                return {"success": False, "error": f"{doctor_info.get('name', 'The doctor')} has no free slots in the next {slot_scheduler.horizon_days} days"}
+            appointment_date, appointment_time = slot
+
+            # Generate appointment details
+            appointment_id = f"APT-{appointment_date.replace('-', '')}-{uuid4().hex[:6].upper()}"
+
+            appointment_data = {
+                "appointment_id": appointment_id,
+                "doctor_id": doctor_info["doctor_id"],
+                "doctor_name": doctor_info["name"],
+                "specialty": doctor_info["specialty"],
+                "patient_symptoms": symptoms,
+                "appointment_date": appointment_date,
+                "appointment_time": appointment_time,
+                "status": "confirmed",
+                "urgency": urgency,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "user_id": user_id
+            }
+
+            # Store appointment in ICP canister, batched with other bookings in flight
+            store_result = await appointment_batcher.submit(appointment_data)
+
+            if store_result.get("success"):
+                slot_scheduler.confirm(doctor_info["doctor_id"], appointment_date, appointment_time)
+                return {
+                    "success": True,
+                    "appointment_id": appointment_id,
+                    "doctor_name": doctor_info["name"],
+                    "appointment_time": f"{appointment_date} at {appointment_time}",
+                    "message": "Appointment successfully booked"
+                }
+            if store_result.get("conflict"):
+                # Booked elsewhere since our last refresh: keep it marked taken and try the next slot
+                slot_scheduler.confirm(doctor_info["doctor_id"], appointment_date, appointment_time)
+                continue
+            slot_scheduler.release(doctor_info["doctor_id"], appointment_date, appointment_time)
+            return {"success": False, "error": store_result.get("message", "Failed to store appointment")}
+
+        return {"success": False, "error": f"Could not find a free slot with {doctor_info.get('name', 'the doctor')}, please try again"}
+
     except Exception as e:
         return {"success": False, "error": f"Failed to book appointment: {str(e)}"}
 
@@ -211,31 +249,37 @@ async def book_appointment(doctor_info: dict, preferred_time: str, urgency: str,
 doctor_protocol = Protocol(name="DoctorBookingProtocol", version="1.0")
 ack_protocol = Protocol(name="ACKProtocol", version="1.0")
 
+# Bookings in progress; kept referenced until they finish
+booking_tasks = set()
+
 @doctor_protocol.on_message(model=DoctorBookingRequest, replies=DoctorBookingResponse)
 async def handle_doctor_booking(ctx: Context, sender: str, msg: DoctorBookingRequest):
-    """Handle doctor appointment booking requests from HealthAgent"""
-    
-    import uuid
-    handler_id = str(uuid.uuid4())[:8]
-    ctx.logger.info(f"[{handler_id}] Received booking request for {msg.specialty}")
-    ctx.logger.info(f"[{handler_id}] Sender address: {sender}")
-    ctx.logger.info(f"[{handler_id}] User ID from message: '{msg.user_id}'")
-    ctx.logger.info(f"[{handler_id}] Request ID: {msg.request_id}")
-    
+    """Acknowledge a doctor booking request from HealthAgent and hand it to the booking pipeline"""
+    ctx.logger.info(f"Received booking request {msg.request_id} for {msg.specialty} from {sender} (user '{msg.user_id}')")
+
+    # Send immediate ACK
+    ack = RequestACK(
+        request_id=msg.request_id,
+        message=f"Doctor booking request received for {msg.specialty}",
+        timestamp=datetime.now(timezone.utc).isoformat()
+    )
+    await ctx.send(sender, ack)
+
+    # Messages are handled one at a time, so the booking continues in its own task;
+    # that lets many bookings wait on the same batched canister write
+    task = asyncio.create_task(process_doctor_booking(ctx, sender, msg))
+    booking_tasks.add(task)
+    task.add_done_callback(booking_tasks.discard)
+
+async def process_doctor_booking(ctx: Context, sender: str, msg: DoctorBookingRequest):
+    """Find a doctor and slot, store the appointment and answer HealthAgent"""
+    handler_id = msg.request_id
     try:
-        ctx.logger.info("Step 1: Starting doctor search...")
+        ctx.logger.info(f"[{handler_id}] Step 1: Starting doctor search...")
         # Search for doctors by specialty
         available_doctors = await search_doctors_by_specialty(msg.specialty)
-        ctx.logger.info(f"Step 1 complete: Found {len(available_doctors)} doctors")
-        
-        # Send immediate ACK
-        ack = RequestACK(
-            request_id=msg.request_id,
-            message=f"Doctor booking request received for {msg.specialty}",
-            timestamp=datetime.now(timezone.utc).isoformat()
-        )
-        await ctx.send(sender, ack)
-        
+        ctx.logger.info(f"[{handler_id}] Step 1 complete: Found {len(available_doctors)} doctors")
+
         if not available_doctors:
             ctx.logger.warning(f"No doctors found for specialty: {msg.specialty}")
             response = DoctorBookingResponse(
@@ -244,9 +288,14 @@ async def handle_doctor_booking(ctx: Context, sender: str, msg: DoctorBookingReq
                 message=f"No doctors found for specialty: {msg.specialty}"
             )
         else:
-            # Select first available doctor
-            selected_doctor = available_doctors[0]
-            ctx.logger.info(f"Step 2: Selected doctor: {selected_doctor.get('name', 'Unknown')}")
+            # Pick the best-scoring doctor: rating, experience, current bookings and next free slot
+            ranked = doctor_index.rank(available_doctors, slot_scheduler, msg.preferred_time, msg.urgency)
+            if ranked:
+                score, selected_doctor, next_slot = ranked[0]
+                ctx.logger.info(f"Step 2: Selected doctor: {selected_doctor.get('name', 'Unknown')} (score {score:.3f}, next slot {next_slot[0]} {next_slot[1]})")
+            else:
+                selected_doctor = available_doctors[0]
+                ctx.logger.info(f"Step 2: No doctor has a matching free slot, trying {selected_doctor.get('name', 'Unknown')}")
             
             ctx.logger.info("Step 3: Starting appointment booking...")
             # Book appointment
@@ -278,16 +327,11 @@ async def handle_doctor_booking(ctx: Context, sender: str, msg: DoctorBookingReq
                 )
                 ctx.logger.error(f"BOOKING FAILED: {booking_result['error']}")
         
-        ctx.logger.info("Step 4: Sending response back to HealthAgent...")
-        ctx.logger.info(f"Step 4: Sending to address: {sender}")
-        ctx.logger.info(f"Step 4: Response content: {response}")
-        ctx.logger.info(f"Step 4: Response type: {type(response)}")
-        ctx.logger.info(f"Step 4: Current time before send: {datetime.now()}")
-        
+        ctx.logger.info(f"[{handler_id}] Step 4: Sending {response.status} response to {sender}")
+
         try:
             await ctx.send(sender, response)
-            ctx.logger.info("Step 4 complete: Response sent successfully")
-            ctx.logger.info(f"Step 4: Current time after send: {datetime.now()}")
+            ctx.logger.info(f"[{handler_id}] Step 4 complete: Response sent successfully")
         except Exception as e:
             ctx.logger.error(f"Step 4 ERROR: Failed to send response: {str(e)}")
             ctx.logger.error(f"Step 4 ERROR: Exception type: {type(e)}")
@@ -309,23 +353,42 @@ async def handle_doctor_search(ctx: Context, sender: str, msg: DoctorSearchReque
     ctx.logger.info(f"Received search request from {sender}: {msg.specialty}")
     
     try:
-        available_doctors = await search_doctors_by_specialty(msg.specialty)
-        
+        if not len(doctor_index):
+            await refresh_doctor_index(ctx, force=True)
+
+        # Filtered and paged from the local index
+        page, total_count, next_token = doctor_index.search(
+            normalize_specialty(msg.specialty),
+            slot_scheduler,
+            min_rating=msg.min_rating,
+            available_day=msg.available_day,
+            earliest_slot=msg.earliest_slot,
+            max_results=msg.max_results,
+            continuation_token=msg.continuation_token
+        )
+
         response = DoctorSearchResponse(
-            doctors=available_doctors,
-            total_count=len(available_doctors),
-            status="success"
+            doctors=page,
+            total_count=total_count,
+            status="success",
+            next_token=next_token
         )
         
-        ctx.logger.info(f"Found {len(available_doctors)} doctors for {msg.specialty}")
+        ctx.logger.info(f"Found {total_count} doctors for {msg.specialty}, returning {len(page)}")
         await ctx.send(sender, response)
-        
+
+    except ValueError as e:
+        # Bad earliest_slot or continuation token
+        ctx.logger.warning(f"Invalid search request from {sender}: {str(e)}")
+        await ctx.send(sender, DoctorSearchResponse(doctors=[], total_count=0, status="invalid_request", message=str(e)))
+
     except Exception as e:
         ctx.logger.error(f"Error handling search request: {str(e)}")
         error_response = DoctorSearchResponse(
             doctors=[],
             total_count=0,
-            status="error"
+            status="error",
+            message=str(e)
         )
         await ctx.send(sender, error_response)
 
@@ -344,6 +407,18 @@ async def startup(ctx: Context):
     ctx.logger.info(f"Agent address: {agent.address}")
     ctx.logger.info(f"Connected to canister: {CANISTER_ID}")
     ctx.logger.info("Ready for HealthAgent connection")
+    await refresh_doctor_index(ctx, force=True)
+    await refresh_booked_slots(ctx)
+
+@agent.on_interval(period=DOCTOR_INDEX_CHECK_INTERVAL)
+async def periodic_doctor_index_check(ctx: Context):
+    # A version read is cheap; the directory is only reloaded after store_doctor/update_doctor
+    await refresh_doctor_index(ctx)
+
+@agent.on_interval(period=APPOINTMENT_REFRESH_INTERVAL)
+async def periodic_slot_refresh(ctx: Context):
+    # Picks up cancellations made directly through the canister
+    await refresh_booked_slots(ctx)
 
 if __name__ == "__main__":
     agent.run()
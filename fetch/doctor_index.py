@@ -0,0 +1,158 @@
+import base64
+import json
+import time
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from doctor_schedule import WEEKDAYS, SlotScheduler, TimePreference
+
+DOCTOR_INDEX_MAX_AGE = 600  # seconds before the directory is reloaded even if its version did not change
+
+# Selection weights; each term is scaled to 0..1 before weighting
+SCORE_WEIGHTS = {
+    "rating": 0.35,
+    "experience": 0.15,
+    "load": 0.25,  # share of the doctor's upcoming capacity already booked (penalty)
+    "wait": 0.25,  # days until the doctor's next matching free slot (penalty)
+}
+MAX_RATING = 5.0
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+EXPERIENCE_CAP = 30  # years; more experience than this scores the same
+
+
+class DoctorIndex:
+    """Parsed doctors grouped by specialty, reloaded when the canister's directory version changes"""
+
+    def __init__(self, max_age: float = DOCTOR_INDEX_MAX_AGE, clock=time.time):
+        self.max_age = max_age
+        self._clock = clock
+        self.version: Optional[int] = None
+        self.loaded_at = 0.0
+        self._by_specialty: Dict[str, List[dict]] = {}
+        self._by_id: Dict[str, dict] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def load(self, doctors: List[dict], version: Optional[int] = None):
+        by_specialty: Dict[str, List[dict]] = {}
+        by_id: Dict[str, dict] = {}
+        for doctor in doctors:
+            if not doctor.get("doctor_id"):
+                continue
+            by_id[doctor["doctor_id"]] = doctor
+            by_specialty.setdefault(str(doctor.get("specialty", "")).lower(), []).append(doctor)
+        self._by_specialty, self._by_id = by_specialty, by_id
+        self.version = version
+        self.loaded_at = self._clock()
+
+    def needs_reload(self, version: Optional[int]) -> bool:
+        return (not self._by_id or version is None or version != self.version
+                or self._clock() - self.loaded_at > self.max_age)
+
+    def invalidate(self):
+        self.loaded_at = 0.0
+
+    def get(self, doctor_id: str) -> Optional[dict]:
+        return self._by_id.get(doctor_id)
+
+    def doctors_for(self, specialty: str) -> List[dict]:
+        return list(self._by_specialty.get((specialty or "").lower(), []))
+
+    def rank(self, doctors: List[dict], scheduler: SlotScheduler, preferred_time: str = "", urgency: str = "normal",
+             now: datetime = None) -> List[Tuple[float, dict, Tuple[str, str]]]:
+        """(score, doctor, next free slot) best first; doctors with no matching free slot are left out"""
+        now = now or datetime.now()
+        preference = TimePreference(preferred_time, urgency, now.date())
+        today = now.date().isoformat()
+        ranked = []
+        for doctor in doctors:
+            slots = scheduler.free_slots(doctor, preference, now)
+            if not slots:
+                continue
+            slot = slots[0]
+            ranked.append((self.score(doctor, scheduler, slot, today, now.date()), doctor, slot))
+        ranked.sort(key=lambda entry: entry[0], reverse=True)
+        return ranked
+
+    def search(self, specialty: str, scheduler: SlotScheduler, min_rating: float = None, available_day: str = None,
+               earliest_slot: str = None, max_results: int = DEFAULT_PAGE_SIZE,
+               continuation_token: str = None) -> Tuple[List[dict], int, Optional[str]]:
+        """One page of matching doctors, best rated first, with the total match count and the next page's token"""
+        doctors = self.doctors_for(specialty)
+        if min_rating is not None:
+            doctors = [doctor for doctor in doctors if float(doctor.get("rating") or 0.0) >= min_rating]
+        if available_day:
+            weekday = available_day.strip().lower()
+            try:
+                weekday = WEEKDAYS[date.fromisoformat(weekday).weekday()]
+            except ValueError:
+                pass
+            doctors = [doctor for doctor in doctors
+                       if weekday in {day.lower() for day in doctor.get("available_days") or []}]
+
+        next_slots: Dict[str, Tuple[str, str]] = {}
+        if earliest_slot:
+            # Only doctors with a free slot from earliest_slot on, within the scheduler's horizon
+            start = parse_earliest_slot(earliest_slot)
+            preference = TimePreference("", "normal", start.date())
+            for doctor in doctors:
+                slots = scheduler.free_slots(doctor, preference, max(start, datetime.now()))
+                if slots:
+                    next_slots[doctor["doctor_id"]] = slots[0]
+            doctors = [doctor for doctor in doctors if doctor["doctor_id"] in next_slots]
+
+        # Keyset pagination: the token holds the sort key of the last doctor returned
+        def sort_key(doctor: dict) -> list:
+            return [-float(doctor.get("rating") or 0.0), doctor["doctor_id"]]
+
+        doctors.sort(key=sort_key)
+        total = len(doctors)
+        if continuation_token:
+            after = decode_token(continuation_token)
+            doctors = [doctor for doctor in doctors if sort_key(doctor) > after]
+
+        page_size = max(1, min(max_results or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+        page = []
+        for doctor in doctors[:page_size]:
+            entry = dict(doctor)
+            if doctor["doctor_id"] in next_slots:
+                entry["next_free_slot"] = " ".join(next_slots[doctor["doctor_id"]])
+            page.append(entry)
+        next_token = encode_token(sort_key(doctors[page_size - 1])) if len(doctors) > page_size else None
+        return page, total, next_token
+
+    @staticmethod
+    def score(doctor: dict, scheduler: SlotScheduler, slot: Tuple[str, str], today: str, today_date: date) -> float:
+        rating = min(float(doctor.get("rating") or 0.0), MAX_RATING) / MAX_RATING
+        experience = min(int(doctor.get("experience_years") or 0), EXPERIENCE_CAP) / EXPERIENCE_CAP
+        # Capacity over the search horizon: slots per day times the share of weekdays the doctor works
+        days_per_week = len(doctor.get("available_days") or []) or 7
+        capacity = max(1.0, len(doctor.get("available_slots") or [1]) * days_per_week * scheduler.horizon_days / 7)
+        load = min(scheduler.booked_count(doctor["doctor_id"], today) / capacity, 1.0)
+        wait = min((date.fromisoformat(slot[0]) - today_date).days / max(scheduler.horizon_days, 1), 1.0)
+        return (SCORE_WEIGHTS["rating"] * rating + SCORE_WEIGHTS["experience"] * experience
+                - SCORE_WEIGHTS["load"] * load - SCORE_WEIGHTS["wait"] * wait)
+
+
+def parse_earliest_slot(value: str) -> datetime:
+    """YYYY-MM-DD[THH:MM] as naive local time, like the scheduler's slots; an offset or Z is converted to local time"""
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace(" ", "T").replace("Z", "+00:00"))
+    except ValueError as e:
+        raise ValueError(f"Invalid earliest_slot '{value}': expected YYYY-MM-DD or YYYY-MM-DDTHH:MM") from e
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def encode_token(key: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii")
+
+
+def decode_token(token: str) -> list:
+    try:
+        return json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Invalid continuation token") from e
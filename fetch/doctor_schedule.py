@@ -0,0 +1,175 @@
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+SEARCH_HORIZON_DAYS = 30  # how far ahead to look for a free slot
+MIN_LEAD_MINUTES = 30  # a same-day slot must start at least this far in the future
+URGENT_LEVELS = {"emergency", "urgent", "high", "asap"}
+INACTIVE_STATUSES = {"cancelled", "canceled", "completed"}
+DEFAULT_SLOTS = ["09:00"]
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+# Parts of the day a patient may ask for, as [start, end) hours
+DAY_PARTS = {
+    "morning": (0, 12),
+    "afternoon": (12, 17),
+    "evening": (17, 24),
+}
+
+CLOCK_TIME = re.compile(r"\b(\d{1,2})(?::(\d{2}))?\s*(am|pm)\b|\b(\d{1,2}):(\d{2})\b", re.IGNORECASE)
+ISO_DATE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+
+Slot = Tuple[str, str]  # (YYYY-MM-DD, HH:MM)
+
+
+def slot_minutes(slot_time: str) -> int:
+    hour, _, minute = slot_time.partition(":")
+    return int(hour) * 60 + int(minute or 0)
+
+
+class TimePreference:
+    """What a patient's free-text preferred_time asks for: an earliest day, weekdays, a part of day or a clock time"""
+
+    def __init__(self, preferred_time: str, urgency: str = "normal", today: date = None):
+        text = (preferred_time or "").lower().strip()
+        today = today or date.today()
+        self.urgent = (urgency or "").lower() in URGENT_LEVELS or any(word in text for word in ("asap", "urgent", "soon as possible"))
+        self.earliest_day = today
+        self.weekdays: Set[int] = set()
+        self.day_part: Optional[Tuple[int, int]] = None
+        self.clock: Optional[int] = None  # minutes after midnight
+
+        iso = ISO_DATE.search(text)
+        if iso:
+            try:
+                self.earliest_day = max(today, date(int(iso.group(1)), int(iso.group(2)), int(iso.group(3))))
+            except ValueError:
+                pass
+        elif "tomorrow" in text:
+            self.earliest_day = today + timedelta(days=1)
+        elif "next week" in text:
+            self.earliest_day = today + timedelta(days=7 - today.weekday())
+
+        for index, weekday in enumerate(WEEKDAYS):
+            if weekday in text:
+                self.weekdays.add(index)
+        if "weekend" in text:
+            self.weekdays.update({5, 6})
+
+        for part, hours in DAY_PARTS.items():
+            if part in text:
+                self.day_part = hours
+        clock = CLOCK_TIME.search(text)
+        if clock:
+            if clock.group(3):
+                hour = int(clock.group(1)) % 12 + (12 if clock.group(3).lower() == "pm" else 0)
+                self.clock = hour * 60 + int(clock.group(2) or 0)
+            else:
+                self.clock = int(clock.group(4)) * 60 + int(clock.group(5))
+
+        if self.urgent:
+            # Urgent bookings take the earliest slot from now, whatever day or time was mentioned
+            self.earliest_day, self.weekdays, self.day_part, self.clock = today, set(), None, None
+
+    def day_allowed(self, day: date) -> bool:
+        return day >= self.earliest_day and (not self.weekdays or day.weekday() in self.weekdays)
+
+    def order_times(self, slot_times: List[str]) -> List[str]:
+        """Slot times to try on a day, best first"""
+        times = slot_times
+        if self.day_part:
+            start, end = self.day_part
+            in_part = [t for t in times if start * 60 <= slot_minutes(t) < end * 60]
+            times = in_part or times  # fall back to any time rather than no appointment
+        if self.clock is not None:
+            return sorted(times, key=lambda t: (abs(slot_minutes(t) - self.clock), slot_minutes(t)))
+        return sorted(times, key=slot_minutes)
+
+
+class SlotScheduler:
+    """Per-doctor slot calendars with an index of booked slots; find-and-reserve is atomic on the event loop"""
+
+    def __init__(self, horizon_days: int = SEARCH_HORIZON_DAYS, min_lead_minutes: int = MIN_LEAD_MINUTES):
+        self.horizon_days = horizon_days
+        self.min_lead = timedelta(minutes=min_lead_minutes)
+        self._booked: Dict[str, Dict[str, Set[str]]] = {}  # doctor_id -> date -> booked times
+        self._unconfirmed: Set[Tuple[str, str, str]] = set()  # reserved but not yet stored in the canister
+
+    def _times(self, doctor_id: str, day: str) -> Set[str]:
+        return self._booked.setdefault(doctor_id, {}).setdefault(day, set())
+
+    def load_appointments(self, appointments: Iterable[dict]):
+        """Rebuild the booked index from canister appointments, keeping reservations still being written"""
+        latest: Dict[str, dict] = {}
+        for appointment in appointments:
+            # update_appointment appends a new version, so the last entry per appointment_id wins
+            latest[appointment.get("appointment_id") or str(id(appointment))] = appointment
+        self._booked = {}
+        for appointment in latest.values():
+            if str(appointment.get("status", "")).lower() in INACTIVE_STATUSES:
+                continue
+            doctor_id, day, time_ = appointment.get("doctor_id"), appointment.get("appointment_date"), appointment.get("appointment_time")
+            if doctor_id and day and time_:
+                self._times(doctor_id, day).add(time_)
+        for doctor_id, day, time_ in self._unconfirmed:
+            self._times(doctor_id, day).add(time_)
+
+    def is_free(self, doctor_id: str, day: str, slot_time: str) -> bool:
+        return slot_time not in self._booked.get(doctor_id, {}).get(day, ())
+
+    def booked_count(self, doctor_id: str, from_day: str = None) -> int:
+        """Booked slots for a doctor, optionally only on or after from_day"""
+        return sum(len(times) for day, times in self._booked.get(doctor_id, {}).items() if from_day is None or day >= from_day)
+
+    def free_slots(self, doctor: dict, preference: TimePreference, now: datetime = None, limit: int = 1) -> List[Slot]:
+        """Earliest free slots for a doctor that fit the preference"""
+        now = now or datetime.now()
+        days = {name.lower() for name in doctor.get("available_days") or []}
+        slot_times = doctor.get("available_slots") or DEFAULT_SLOTS
+        booked = self._booked.get(doctor.get("doctor_id"), {})
+        found = []
+        for offset in range(self.horizon_days + 1):
+            day = now.date() + timedelta(days=offset)
+            if not preference.day_allowed(day) or (days and WEEKDAYS[day.weekday()] not in days):
+                continue
+            day_text = day.isoformat()
+            taken = booked.get(day_text, ())
+            for slot_time in preference.order_times(slot_times):
+                if slot_time in taken:
+                    continue
+                if offset == 0 and datetime.combine(day, datetime.min.time()) + timedelta(minutes=slot_minutes(slot_time)) < now + self.min_lead:
+                    continue
+                found.append((day_text, slot_time))
+                if len(found) >= limit:
+                    return found
+        return found
+
+    def next_free_slot(self, doctor: dict, preferred_time: str = "", urgency: str = "normal", now: datetime = None) -> Optional[Slot]:
+        now = now or datetime.now()
+        slots = self.free_slots(doctor, TimePreference(preferred_time, urgency, now.date()), now)
+        return slots[0] if slots else None
+
+    def reserve(self, doctor: dict, preferred_time: str = "", urgency: str = "normal", now: datetime = None) -> Optional[Slot]:
+        """Find the earliest matching free slot and mark it booked; no await in between, so concurrent bookings never collide"""
+        slot = self.next_free_slot(doctor, preferred_time, urgency, now)
+        if slot is not None:
+            self.hold(doctor["doctor_id"], *slot)
+        return slot
+
+    def hold(self, doctor_id: str, day: str, slot_time: str) -> bool:
+        """Mark a specific slot booked (unconfirmed); False if it is already taken"""
+        times = self._times(doctor_id, day)
+        if slot_time in times:
+            return False
+        times.add(slot_time)
+        self._unconfirmed.add((doctor_id, day, slot_time))
+        return True
+
+    def confirm(self, doctor_id: str, day: str, slot_time: str):
+        """The canister stored the appointment"""
+        self._unconfirmed.discard((doctor_id, day, slot_time))
+
+    def release(self, doctor_id: str, day: str, slot_time: str):
+        """Free a slot whose appointment failed to store or was cancelled"""
+        self._unconfirmed.discard((doctor_id, day, slot_time))
+        self._booked.get(doctor_id, {}).get(day, set()).discard(slot_time)
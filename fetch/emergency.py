@@ -0,0 +1,75 @@
+import re
+from typing import Optional
+
+# The fast path only takes first-person, present-tense acute phrases; anything else
+# (questions, history, medication, other people, "non-emergency") goes to the LLM classifier.
+# Spaces match any whitespace.
+_I_AM = r"(?:i\s+am|i'm|im|i\s+think\s+i'm|i\s+think\s+i\s+am)"
+_I_AM_HAVING = rf"(?:{_I_AM}\s+(?:having|experiencing)|i\s+have|i've\s+got|i\s+got)"
+
+ACUTE_STATES = [
+    "a heart attack", "a stroke", "a seizure", "a cardiac arrest",
+    "chest pain", "chest pains", "severe chest pain", "crushing chest pain", "chest pressure",
+    "trouble breathing", "difficulty breathing", "an anaphylactic reaction", "anaphylaxis",
+    "severe bleeding", "an emergency", "a medical emergency",
+]
+FIRST_PERSON_ACUTE = [
+    "can't breathe", "cant breathe", "cannot breathe", "can not breathe",
+    "am choking", "'m choking", "am bleeding heavily", "'m bleeding heavily",
+    "am bleeding and it won't stop", "'m bleeding and it won't stop",
+    "am suicidal", "'m suicidal", "am going to pass out", "'m going to pass out",
+    "am struggling to breathe", "'m struggling to breathe",
+    "just overdosed", "just took too many pills", "took too many pills",
+    "want to die", "want to kill myself", "am going to kill myself", "'m going to kill myself",
+]
+STANDALONE_ACUTE = [
+    "call 911", "call 112", "call an ambulance", "need an ambulance", "send an ambulance",
+    "my throat is closing", "my chest hurts", "my face is drooping",
+    "this is an emergency", "it's an emergency", "its an emergency",
+    "kill myself", "end my life",
+]
+
+# Context that makes a match ambiguous: the past, history, reminders, third parties asking
+_AMBIGUOUS = re.compile(
+    r"\b(?:yesterday|last\s+(?:night|week|month|year)|ago|used\s+to|in\s+the\s+past|history\s+of|"
+    r"remind|reminder|prevention|don't\s+think|do\s+not\s+think|not\s+sure)\b"
+)
+
+# A negation cue just before a match in the same clause ("I would never kill myself") leaves it to the LLM
+_NEGATION = re.compile(r"\b(?:never|not|no|don't|dont|won't|wont|wouldn't|didn't|no\s+longer)\b")
+NEGATION_WINDOW = 4  # words before the match that are checked for a cue
+
+_APOSTROPHES = str.maketrans({"’": "'", "‘": "'", "`": "'"})
+
+
+def _alternation(phrases) -> str:
+    # Longest first so the reported match is the most specific phrase
+    alternatives = sorted({phrase.lower() for phrase in phrases}, key=len, reverse=True)
+    return "|".join(r"\s+".join(re.escape(word) for word in phrase.split()) for phrase in alternatives)
+
+
+EMERGENCY_PATTERN = re.compile(
+    rf"(?<![\w-])(?:"
+    rf"{_I_AM_HAVING}\s+(?:{_alternation(ACUTE_STATES)})"
+    rf"|i\s*(?:{_alternation(FIRST_PERSON_ACUTE)})"
+    rf"|{_alternation(STANDALONE_ACUTE)}"
+    rf")(?!\w)"
+)
+
+
+def _negated(text: str, start: int) -> bool:
+    clause = re.split(r"[.!?,;]", text[:start])[-1]
+    return bool(_NEGATION.search(" ".join(clause.split()[-NEGATION_WINDOW:])))
+
+
+def detect_emergency(message: str) -> Optional[str]:
+    """The acute first-person emergency phrase in message, or None; pure regex, no I/O"""
+    if not message:
+        return None
+    text = message.lower().translate(_APOSTROPHES)
+    if _AMBIGUOUS.search(text):
+        return None
+    for match in EMERGENCY_PATTERN.finditer(text):
+        if not _negated(text, match.start()):
+            return match.group(0)
+    return None
@@ -0,0 +1,40 @@
+from typing import List
+
+# Field-name hashes the canister emits for symptom and reminder history entries
+ICP_HISTORY_KEYS = {
+    "3_088_518_058": "symptoms",
+    "2_781_795_542": "timestamp",
+    "1_869_947_023": "user_id",
+    "1_962_253_242": "medicine",
+    "1_291_635_725": "time",
+    "1_779_848_746": "created_at",
+    "373_703_110": "active",
+}
+
+
+def normalize_entry(entry: dict) -> dict:
+    """A symptom or reminder entry with field names, whether it arrived with names or numeric ICP keys"""
+    if not any(key in ICP_HISTORY_KEYS for key in entry):
+        return entry
+    return {ICP_HISTORY_KEYS.get(key, key): value for key, value in entry.items()}
+
+
+def entry_key(entry: dict) -> tuple:
+    # Symptom entries are identified by text and timestamp, reminders by medicine and creation time
+    entry = normalize_entry(entry)
+    return (entry.get("symptoms") or entry.get("medicine"), entry.get("timestamp") or entry.get("created_at"))
+
+
+def unconfirmed_entries(backend, namespace: str, user_id: str, confirmed: List[dict],
+                        max_items: int = None, ttl: float = None) -> List[dict]:
+    """Local backups for user_id that are missing from the canister's entries; drops the ones it now has"""
+    local = backend.get_list(namespace, user_id)
+    if not local:
+        return []
+    seen = {entry_key(entry) for entry in confirmed}
+    missing = [entry for entry in local if entry_key(entry) not in seen]
+    if len(missing) != len(local):
+        backend.delete(namespace, user_id)
+        for entry in missing:
+            backend.append(namespace, user_id, entry, max_items=max_items, ttl=ttl)
+    return missing
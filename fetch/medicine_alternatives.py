@@ -0,0 +1,86 @@
+import bisect
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+MAX_ALTERNATIVES = 3
+
+# Strongest substitute first: same active ingredient, same generic drug, then same category
+RELATIONS = ("active_ingredient", "generic_name", "category")
+
+_DOSE = re.compile(r"\b\d+(?:\.\d+)?\s*(?:mg|mcg|g|ml|iu|%)?\b")
+
+
+def relation_key(medicine: dict, relation: str) -> Optional[str]:
+    """Normalized attribute value that links substitutes; doses are ignored ("Paracetamol 500mg" ~ "paracetamol")"""
+    value = str(medicine.get(relation) or "").lower()
+    if relation != "category":
+        value = _DOSE.sub(" ", value)
+    value = " ".join(value.split())
+    return value or None
+
+
+def rank_key(medicine: dict) -> Tuple[float, int, str]:
+    # Cheapest first, then the best stocked
+    return float(medicine.get("price") or 0.0), -int(medicine.get("stock") or 0), medicine["medicine_id"]
+
+
+class AlternativesGraph:
+    """Medicines linked by shared active ingredient, generic name or category.
+
+    Each link group keeps its in-stock members sorted by price and stock, and a stock or
+    price change only moves that medicine within its own (at most three) groups, so
+    substitutes for an out-of-stock medicine are read off without scanning the catalog.
+    """
+
+    def __init__(self):
+        self._groups: Dict[Tuple[str, str], List[Tuple[float, int, str]]] = {}  # (relation, key) -> sorted in-stock ranks
+        self._members: Dict[str, Tuple[Tuple[float, int, str], List[Tuple[str, str]]]] = {}  # medicine_id -> (rank, groups)
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def put(self, medicine: dict):
+        """Add or update a medicine, including a stock or price change"""
+        self.remove(medicine["medicine_id"])
+        groups = [(relation, key) for relation in RELATIONS if (key := relation_key(medicine, relation))]
+        rank = rank_key(medicine)
+        if int(medicine.get("stock") or 0) > 0:
+            for group in groups:
+                bisect.insort(self._groups.setdefault(group, []), rank)
+        self._members[medicine["medicine_id"]] = (rank, groups)
+
+    def remove(self, medicine_id: str):
+        member = self._members.pop(medicine_id, None)
+        if member is None:
+            return
+        rank, groups = member
+        for group in groups:
+            ranks = self._groups.get(group)
+            if not ranks:
+                continue
+            index = bisect.bisect_left(ranks, rank)
+            if index < len(ranks) and ranks[index] == rank:
+                ranks.pop(index)
+            if not ranks:
+                del self._groups[group]
+
+    def clear(self):
+        self._groups.clear()
+        self._members.clear()
+
+    def alternatives(self, medicine_id: str, quantity: int = 1, limit: int = MAX_ALTERNATIVES) -> List[Tuple[str, str]]:
+        """(medicine_id, relation) of in-stock substitutes that cover quantity, strongest relation first"""
+        member = self._members.get(medicine_id)
+        if member is None:
+            return []
+        found: List[Tuple[str, str]] = []
+        seen: Set[str] = {medicine_id}
+        for relation, key in member[1]:
+            for _, negative_stock, candidate_id in self._groups.get((relation, key), ()):
+                if candidate_id in seen or -negative_stock < quantity:
+                    continue
+                seen.add(candidate_id)
+                found.append((candidate_id, relation))
+                if len(found) >= limit:
+                    return found
+        return found
@@ -0,0 +1,74 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+MEDICINE_CACHE_MAX_ENTRIES = 1024
+MEDICINE_CACHE_MAX_AGE = 300  # seconds; a backstop, the change feed normally evicts first
+
+
+class MedicineCache:
+    """Read-through cache of get-medicine-by-id results, each stamped with the medicine's version.
+
+    An entry is dropped when this agent orders the medicine, when the change feed reports
+    it changed or removed, or when the caller knows a newer version than the stamp.
+    """
+
+    def __init__(self, max_entries: int = MEDICINE_CACHE_MAX_ENTRIES, max_age: float = MEDICINE_CACHE_MAX_AGE,
+                 clock=time.time):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[dict, Optional[int], float]]" = OrderedDict()  # id -> (inventory, version, cached_at)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, medicine_id: str, min_version: Optional[int] = None) -> Optional[dict]:
+        """Cached inventory, or None (a miss) if absent, expired or older than min_version"""
+        entry = self._entries.get(medicine_id)
+        if entry is not None:
+            inventory, version, cached_at = entry
+            stale = min_version is not None and (version is None or version < min_version)
+            if not stale and self._clock() - cached_at <= self.max_age:
+                self._entries.move_to_end(medicine_id)
+                self.hits += 1
+                return inventory
+            del self._entries[medicine_id]
+        self.misses += 1
+        return None
+
+    def put(self, medicine_id: str, inventory: dict, version: Optional[int]):
+        self._entries[medicine_id] = (inventory, version, self._clock())
+        self._entries.move_to_end(medicine_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, medicine_id: str):
+        if self._entries.pop(medicine_id, None) is not None:
+            self.invalidations += 1
+
+    def apply(self, response: dict):
+        """Evict what a get-all-medicines or get-medicine-changes response reports as changed"""
+        if "error" in response:
+            return
+        if response.get("full"):
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            return
+        for medicine in response.get("medicines", []):
+            self.invalidate(medicine.get("medicine_id"))
+        for medicine_id in response.get("removed", []):
+            self.invalidate(medicine_id)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
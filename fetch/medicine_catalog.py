@@ -0,0 +1,177 @@
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from medicine_alternatives import MAX_ALTERNATIVES, AlternativesGraph
+from medicine_fuzzy import FuzzyNameIndex
+
+MEDICINE_CATALOG_MAX_AGE = 900  # seconds before a full reload even if deltas kept arriving
+
+
+def name_rank(medicine: dict, term: str) -> Optional[int]:
+    """Same ranking as the canister's search-medicines-by-name; lower is better, None is no match"""
+    name = str(medicine.get("name") or "").lower()
+    generic = str(medicine.get("generic_name") or "").lower()
+    if name == term:
+        return 0
+    if name.startswith(term):
+        return 1
+    if term in name:
+        return 2
+    if generic == term:
+        return 3
+    if generic.startswith(term):
+        return 4
+    if term in generic:
+        return 5
+    if name in term:
+        return 6
+    return None
+
+
+def searchable_names(medicine: dict) -> Tuple[str, str]:
+    return str(medicine.get("name") or "").lower(), str(medicine.get("generic_name") or "").lower()
+
+
+def substring_grams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class MedicineCatalog:
+    """In-memory replica of the canister's medicine catalog, kept current from its change feed"""
+
+    def __init__(self, max_age: float = MEDICINE_CATALOG_MAX_AGE, clock=time.time):
+        self.max_age = max_age
+        self._clock = clock
+        self.version: Optional[int] = None
+        self.loaded_at = 0.0
+        self._stale = False  # a medicine's version went backwards; only a full reload can be trusted
+        self._by_id: Dict[str, dict] = {}
+        self._dirty: Set[str] = set()  # ordered from here since the last refresh; stock is stale
+        self._versions: Dict[str, int] = {}  # medicine_id -> version of its last write, for conditional orders
+        self._fuzzy = FuzzyNameIndex()
+        self._alternatives = AlternativesGraph()
+        # Exact-match lookups so a search does not scan the whole catalog
+        self._grams: Dict[str, Set[str]] = {}  # trigram of a lowercase name or generic name -> medicine_ids
+        self._by_name: Dict[str, Set[str]] = {}  # lowercase name -> medicine_ids
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._dirty)
+
+    def needs_full_reload(self) -> bool:
+        return self.version is None or self._stale or self._clock() - self.loaded_at > self.max_age
+
+    def apply(self, response: dict) -> bool:
+        """Apply a get-all-medicines or get-medicine-changes response; False if it was unusable"""
+        if "error" in response or "version" not in response:
+            return False
+        medicines = [medicine for medicine in response.get("medicines", []) if medicine.get("medicine_id")]
+        if response.get("full"):
+            self._by_id = {}
+            self._versions = {}
+            self._fuzzy.clear()
+            self._alternatives.clear()
+            self._grams.clear()
+            self._by_name.clear()
+            self.loaded_at = self._clock()
+            self._stale = False
+        for medicine_id in response.get("removed", []):
+            self._remove(medicine_id)
+        for medicine in medicines:
+            self._remove(medicine["medicine_id"])
+            self._by_id[medicine["medicine_id"]] = medicine
+            self._index(medicine)
+        for entry in response.get("versions", []):
+            self._versions[entry["medicine_id"]] = int(entry["version"])
+        self.version = int(response["version"])
+        self._dirty.clear()
+        return True
+
+    def _index(self, medicine: dict):
+        medicine_id = medicine["medicine_id"]
+        name, generic = searchable_names(medicine)
+        self._by_name.setdefault(name, set()).add(medicine_id)
+        for gram in substring_grams(name) | substring_grams(generic):
+            self._grams.setdefault(gram, set()).add(medicine_id)
+        self._fuzzy.put(medicine)
+        self._alternatives.put(medicine)
+
+    def _remove(self, medicine_id: str):
+        self._versions.pop(medicine_id, None)
+        medicine = self._by_id.pop(medicine_id, None)
+        if medicine is None:
+            return
+        name, generic = searchable_names(medicine)
+        self._by_name.get(name, set()).discard(medicine_id)
+        for gram in substring_grams(name) | substring_grams(generic):
+            self._grams.get(gram, set()).discard(medicine_id)
+        self._fuzzy.remove(medicine_id)
+        self._alternatives.remove(medicine_id)
+
+    def _candidates(self, term: str) -> List[dict]:
+        """Medicines that can match term: names or generic names holding all its trigrams, or names inside it"""
+        if len(term) < 3:
+            return list(self._by_id.values())
+        posting_sets = sorted((self._grams.get(gram, set()) for gram in substring_grams(term)), key=len)
+        medicine_ids = set(posting_sets[0]).intersection(*posting_sets[1:])
+        for start in range(len(term)):
+            for end in range(start + 1, len(term) + 1):
+                medicine_ids.update(self._by_name.get(term[start:end], ()))
+        return [self._by_id[medicine_id] for medicine_id in medicine_ids]
+
+    def invalidate(self, medicine_id: str):
+        """Mark a medicine whose stock this agent just changed"""
+        self._dirty.add(medicine_id)
+
+    def get(self, medicine_id: str) -> Optional[dict]:
+        return self._by_id.get(medicine_id)
+
+    def version_of(self, medicine_id: str) -> Optional[int]:
+        """The medicine's version as of this replica; None if the replica does not have it"""
+        if medicine_id not in self._by_id:
+            return None
+        return self._versions.get(medicine_id, 0)
+
+    def adopt_version(self, medicine_id: str, version: Optional[int]) -> bool:
+        """Take the medicine's version from a conflict response; False if it went backwards, which forces a full reload"""
+        if version is None or medicine_id not in self._by_id:
+            return True
+        version = int(version)
+        went_back = version < self._versions.get(medicine_id, 0)
+        self._versions[medicine_id] = version
+        self._dirty.add(medicine_id)
+        self._stale = self._stale or went_back
+        return not went_back
+
+    def record_order(self, medicine_id: str, quantity: int, version: Optional[int]):
+        """Apply an order this agent just wrote, so the next order needs no refresh first"""
+        medicine = self._by_id.get(medicine_id)
+        if medicine is None or version is None:
+            self.invalidate(medicine_id)
+            return
+        self._by_id[medicine_id] = {**medicine, "stock": max(0, int(medicine.get("stock") or 0) - quantity)}
+        self._versions[medicine_id] = int(version)
+        self._alternatives.put(self._by_id[medicine_id])
+
+    def alternatives(self, medicine_id: str, quantity: int = 1, limit: int = MAX_ALTERNATIVES) -> List[dict]:
+        """In-stock substitutes for a medicine, each with the attribute it shares ("relation")"""
+        return [{**self._by_id[alternative_id], "relation": relation}
+                for alternative_id, relation in self._alternatives.alternatives(medicine_id, quantity, limit)]
+
+    def search(self, medicine_name: str) -> List[dict]:
+        """Medicines matching medicine_name, best matches first; misspellings fall back to fuzzy matches"""
+        term = (medicine_name or "").strip().lower()
+        if not term:
+            return []
+        ranked = []
+        for medicine in self._candidates(term):
+            rank = name_rank(medicine, term)
+            if rank is not None:
+                ranked.append((rank, str(medicine.get("name") or "").lower(), medicine["medicine_id"], medicine))
+        ranked.sort(key=lambda entry: entry[:3])
+        if ranked:
+            return [entry[3] for entry in ranked]
+        return [self._by_id[medicine_id] for medicine_id, _, _ in self._fuzzy.search(term)]
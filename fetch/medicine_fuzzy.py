@@ -0,0 +1,160 @@
+import re
+from typing import Dict, List, Set, Tuple
+
+FUZZY_FIELDS = ("name", "generic_name", "active_ingredient")
+MAX_CANDIDATES = 10
+PREFIX_LENGTH = 8  # only this many leading characters are expanded into deletions
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    return " ".join(_WORD.findall((text or "").lower()))
+
+
+def trigrams(term: str) -> Set[str]:
+    padded = f"${term}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_distance(term: str) -> int:
+    """Edits tolerated for a term of this length"""
+    if len(term) <= 3:
+        return 0
+    if len(term) <= 6:
+        return 1
+    return 2
+
+
+def damerau_levenshtein(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, or limit + 1 once it must exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def deletes(term: str, depth: int) -> Set[str]:
+    """Every string made by removing 1..depth characters from term"""
+    found = set()
+    frontier = {term}
+    for _ in range(depth):
+        frontier = {word[:i] + word[i + 1:] for word in frontier for i in range(len(word))} - found
+        found |= frontier
+    found.discard(term)
+    return found
+
+
+class FuzzyNameIndex:
+    """Symmetric-delete index over the words of medicine names, generic names and active ingredients.
+
+    Every indexed word is stored under its first PREFIX_LENGTH characters and each string
+    one deletion away from them; a query looks up its own prefix and its deletions (two
+    deep for long words). Two words within one edit (including a transposition) always
+    meet on a shared key, and many two-edit misspellings do too. Candidates are then
+    verified and ranked by Damerau-Levenshtein distance over the whole word.
+    """
+
+    def __init__(self):
+        self._deletes: Dict[str, object] = {}  # deletion -> word, or a set of words when several share it
+        self._words: Dict[str, Set[str]] = {}  # word -> medicine_ids
+        self._by_medicine: Dict[str, Set[str]] = {}  # medicine_id -> words
+
+    def __len__(self) -> int:
+        return len(self._by_medicine)
+
+    def _link(self, key: str, word: str):
+        current = self._deletes.get(key)
+        if current is None:
+            self._deletes[key] = word
+        elif isinstance(current, set):
+            current.add(word)
+        elif current != word:
+            self._deletes[key] = {current, word}
+
+    def _unlink(self, key: str, word: str):
+        current = self._deletes.get(key)
+        if isinstance(current, set):
+            current.discard(word)
+            if len(current) == 1:
+                self._deletes[key] = current.pop()
+        elif current == word:
+            del self._deletes[key]
+
+    def _keys(self, word: str) -> Set[str]:
+        prefix = word[:PREFIX_LENGTH]
+        return {prefix} | (deletes(prefix, 1) if max_distance(word) else set())
+
+    def put(self, medicine: dict):
+        medicine_id = medicine["medicine_id"]
+        self.remove(medicine_id)
+        words = set()
+        for field in FUZZY_FIELDS:
+            words.update(word for word in normalize(medicine.get(field)).split() if len(word) > 2 and not word.isdigit())
+        for word in words:
+            medicine_ids = self._words.get(word)
+            if medicine_ids is None:
+                medicine_ids = self._words[word] = set()
+                for key in self._keys(word):
+                    self._link(key, word)
+            medicine_ids.add(medicine_id)
+        self._by_medicine[medicine_id] = words
+
+    def remove(self, medicine_id: str):
+        for word in self._by_medicine.pop(medicine_id, ()):
+            medicine_ids = self._words[word]
+            medicine_ids.discard(medicine_id)
+            if medicine_ids:
+                continue
+            del self._words[word]
+            for key in self._keys(word):
+                self._unlink(key, word)
+
+    def clear(self):
+        self._deletes.clear()
+        self._words.clear()
+        self._by_medicine.clear()
+
+    def search(self, text: str, limit: int = MAX_CANDIDATES) -> List[Tuple[str, int, str]]:
+        """(medicine_id, edit distance, matched word) best first; each query word is matched separately"""
+        matches: Dict[str, Tuple[int, int, str]] = {}
+        for query in normalize(text).split():
+            if len(query) < 3 or query.isdigit():
+                continue
+            allowed = max_distance(query)
+            candidates = set()
+            prefix = query[:PREFIX_LENGTH]
+            for key in {prefix} | deletes(prefix, allowed):
+                found = self._deletes.get(key)
+                if found is None:
+                    continue
+                if isinstance(found, set):
+                    candidates |= found
+                else:
+                    candidates.add(found)
+
+            for word in candidates:
+                distance = damerau_levenshtein(query, word, allowed)
+                if distance > allowed:
+                    continue
+                # Closer spelling first, then the longer word
+                rank = (distance, -len(word), word)
+                for medicine_id in self._words[word]:
+                    if medicine_id not in matches or rank < matches[medicine_id]:
+                        matches[medicine_id] = rank
+        ranked = sorted(matches.items(), key=lambda item: (item[1], item[0]))
+        return [(medicine_id, rank[0], rank[2]) for medicine_id, rank in ranked[:limit]]
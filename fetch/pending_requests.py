@@ -0,0 +1,300 @@
+import asyncio
+import contextvars
+import heapq
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Seconds to wait for the sub-agent's response before giving up on a request
+REQUEST_TIMEOUTS = {
+    "doctor": 120,
+    "pharmacy_purchase": 90,
+    "pharmacy_cart": 90,
+    "pharmacy_check": 60,
+    "pharmacy_order": 90,
+    "wellness": 60,
+    "wellness_delete": 60,
+}
+DEFAULT_REQUEST_TIMEOUT = 120
+MAX_PENDING_REQUESTS = 5000
+# Backend records outlive their deadline by this much, so the owning worker can still
+# tell "nobody answered" (record present) from "another worker got the response" (gone)
+BACKEND_GRACE = 300
+
+
+class PendingRequestRegistry:
+    """In-flight requests to the sub-agents, indexed by request_id and by user, expiring by deadline"""
+
+    def __init__(self, timeouts: Dict[str, float] = None, default_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+                 max_size: int = MAX_PENDING_REQUESTS, clock=time.time, backend=None, namespace: str = "pending",
+                 owner: str = "local"):
+        self.timeouts = dict(REQUEST_TIMEOUTS if timeouts is None else timeouts)
+        self.default_timeout = default_timeout
+        self.max_size = max_size
+        self._clock = clock
+        self._requests: "OrderedDict[str, dict]" = OrderedDict()  # oldest first, for eviction
+        self._by_user: Dict[str, set] = {}
+        # (type, medicine, user) and (type, medicine, None) -> request_ids oldest first,
+        # for responses that carry no request_id
+        self._by_medicine: Dict[Tuple[str, str, Optional[str]], Dict[str, None]] = {}
+        self._deadlines: Dict[str, float] = {}
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._evicted: List[Tuple[str, dict]] = []
+        # Optional StateBackend: requests survive restarts and are visible to the other workers.
+        # Deadlines are wall-clock times so they stay meaningful across processes. Only the
+        # worker that created a request (its owner) expires it; the others just route its response.
+        self._backend = backend
+        self._namespace = namespace
+        self.owner = owner
+        self._foreign: set = set()  # request_ids loaded from another worker's records
+        if backend is not None:
+            for request_id, record in backend.items(namespace):
+                if record.get("owner", owner) == owner:
+                    self._track(request_id, self._decode(record["info"]), record["deadline"])
+
+    def add(self, request_id: str, request_type: str, user_sender: str = None, **details) -> dict:
+        """Track a new request; evicts the oldest one when the registry is full"""
+        if request_id in self._requests:
+            self.pop(request_id)
+
+        while len(self._requests) >= self.max_size:
+            oldest_id = next(iter(self._requests))
+            if oldest_id in self._foreign:
+                self._forget(oldest_id)  # another worker's request; it still tracks it
+            else:
+                self._evicted.append((oldest_id, self.pop(oldest_id)))
+
+        info = {
+            "type": request_type,
+            "timestamp": datetime.now(),
+            "user_sender": user_sender,
+            **details,
+        }
+        timeout = self.timeouts.get(request_type, self.default_timeout)
+        deadline = self._clock() + timeout
+        self._track(request_id, info, deadline)
+        if self._backend is not None:
+            record = {"info": self._encode(info), "deadline": deadline, "owner": self.owner}
+            self._backend.set(self._namespace, request_id, record, ttl=timeout + BACKEND_GRACE)
+        return info
+
+    def _track(self, request_id: str, info: dict, deadline: float, owned: bool = True):
+        self._requests[request_id] = info
+        self._deadlines[request_id] = deadline
+        heapq.heappush(self._expiry_heap, (deadline, request_id))
+        if not owned:
+            self._foreign.add(request_id)
+        user_sender = info.get("user_sender")
+        if user_sender:
+            self._by_user.setdefault(user_sender, set()).add(request_id)
+        for medicine_key in self._medicine_keys(info):
+            self._by_medicine.setdefault(medicine_key, {})[request_id] = None
+
+    def _load(self, request_id: str) -> Optional[dict]:
+        """Local lookup, falling back to requests another worker registered in the shared backend"""
+        info = self._requests.get(request_id)
+        if info is None and self._backend is not None:
+            record = self._backend.get(self._namespace, request_id)
+            if record is not None:
+                info = self._decode(record["info"])
+                self._track(request_id, info, record["deadline"], owned=record.get("owner", self.owner) == self.owner)
+        return info
+
+    def get(self, request_id: str, default=None) -> Optional[dict]:
+        info = self._load(request_id)
+        return default if info is None else info
+
+    def __contains__(self, request_id: str) -> bool:
+        return self._load(request_id) is not None
+
+    def __getitem__(self, request_id: str) -> dict:
+        info = self._load(request_id)
+        if info is None:
+            raise KeyError(request_id)
+        return info
+
+    def __len__(self) -> int:
+        return len(self._requests)
+
+    def pop(self, request_id: str, default=None) -> Optional[dict]:
+        """Stop tracking a request (response received, expired or evicted)"""
+        self._load(request_id)
+        info = self._forget(request_id)
+        if self._backend is not None:
+            self._backend.delete(self._namespace, request_id)
+        return default if info is None else info
+
+    def _forget(self, request_id: str) -> Optional[dict]:
+        """Drop a request from this worker's indexes only"""
+        info = self._requests.pop(request_id, None)
+        if info is None:
+            return None
+        # The heap entry is left behind and skipped when it surfaces
+        self._deadlines.pop(request_id, None)
+        self._foreign.discard(request_id)
+        user_sender = info.get("user_sender")
+        if user_sender:
+            user_requests = self._by_user.get(user_sender)
+            if user_requests is not None:
+                user_requests.discard(request_id)
+                if not user_requests:
+                    del self._by_user[user_sender]
+        for medicine_key in self._medicine_keys(info):
+            matching = self._by_medicine.get(medicine_key)
+            if matching is not None:
+                matching.pop(request_id, None)
+                if not matching:
+                    del self._by_medicine[medicine_key]
+        self._compact_heap()
+        return info
+
+    def user_for(self, request_id: str) -> Optional[str]:
+        info = self._load(request_id)
+        return info.get("user_sender") if info else None
+
+    def for_user(self, user_sender: str) -> List[Tuple[str, dict]]:
+        """Requests still waiting on a response for this user"""
+        return [(request_id, self._requests[request_id]) for request_id in self._by_user.get(user_sender, ())]
+
+    def find_by_medicine(self, request_type: str, medicine: str, user_sender: str = None) -> Optional[str]:
+        """Oldest request of this type for the medicine and user, for responses without a request_id"""
+        if not medicine:
+            return None
+        matching = self._by_medicine.get((request_type, medicine.strip().lower(), user_sender or None))
+        if not matching:
+            return None
+        if user_sender:
+            return next(iter(matching))
+        # No user on the message: only answer when a single request is waiting on this medicine
+        return next(iter(matching)) if len(matching) == 1 else None
+
+    def items(self) -> List[Tuple[str, dict]]:
+        return list(self._requests.items())
+
+    def expire(self, now: float = None) -> List[Tuple[str, dict]]:
+        """Remove and return every request past its deadline, plus any evicted since the last sweep"""
+        now = self._clock() if now is None else now
+        expired, self._evicted = self._evicted, []
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            deadline, request_id = heapq.heappop(self._expiry_heap)
+            if self._deadlines.get(request_id) != deadline:
+                continue  # already answered, or re-added with a new deadline
+            if request_id in self._foreign:
+                self._forget(request_id)  # its owner reports the timeout
+                continue
+            if self._backend is not None and self._backend.get(self._namespace, request_id) is None:
+                self._forget(request_id)  # another worker received the response
+                continue
+            expired.append((request_id, self.pop(request_id)))
+        return expired
+
+    @staticmethod
+    def _encode(info: dict) -> dict:
+        return {**info, "timestamp": info["timestamp"].isoformat()}
+
+    @staticmethod
+    def _decode(info: dict) -> dict:
+        return {**info, "timestamp": datetime.fromisoformat(info["timestamp"])}
+
+    @staticmethod
+    def _medicine_keys(info: dict) -> List[Tuple[str, str, Optional[str]]]:
+        medicine = info.get("medicine")
+        if not medicine:
+            return []
+        medicine = medicine.strip().lower()
+        keys = [(info["type"], medicine, None)]
+        if info.get("user_sender"):
+            keys.append((info["type"], medicine, info["user_sender"]))
+        return keys
+
+    def _compact_heap(self):
+        # Answered requests leave stale heap entries; rebuild once they dominate
+        if len(self._expiry_heap) > 2 * len(self._requests) + 64:
+            self._expiry_heap = [(deadline, request_id) for request_id, deadline in self._deadlines.items()]
+            heapq.heapify(self._expiry_heap)
+
+
+class _Waiter:
+    def __init__(self):
+        self.future: "asyncio.Future" = asyncio.get_running_loop().create_future()
+        self.awaited = False  # a caller is (about to be) blocked on the future
+
+
+class ResponseWaiters:
+    """Futures for callers that want to await a request's final result instead of receiving it later.
+
+    A result that arrives before anyone awaits it is kept on the future for a later wait(),
+    but resolve() reports it as not taken, so the caller still delivers it another way.
+    """
+
+    def __init__(self):
+        self._waiters: Dict[str, _Waiter] = {}
+        self._collected: contextvars.ContextVar = contextvars.ContextVar("collected_request_ids", default=None)
+
+    @contextmanager
+    def collect(self, watch: bool = True):
+        """Within this block, requests passed to track() are appended to the yielded list, and watched if watch is set"""
+        request_ids: List[str] = []
+        token = self._collected.set((request_ids, watch))
+        try:
+            yield request_ids
+        finally:
+            self._collected.reset(token)
+
+    def track(self, request_id: str):
+        """Note request_id if the current task is collecting (see collect)"""
+        collected = self._collected.get()
+        if collected is not None:
+            request_ids, watch = collected
+            if watch:
+                self.watch(request_id)
+            request_ids.append(request_id)
+
+    def watch(self, request_id: str) -> "asyncio.Future":
+        """Register interest in request_id; call before the request is sent so the result cannot be missed"""
+        waiter = self._waiters.get(request_id)
+        if waiter is None:
+            waiter = self._waiters[request_id] = _Waiter()
+        return waiter.future
+
+    def expect(self, request_id: str):
+        """Mark request_id as awaited from now on, so resolve() hands its result over; synchronous, unlike wait()"""
+        self.watch(request_id)
+        self._waiters[request_id].awaited = True
+
+    def resolve(self, request_id: str, result: dict) -> bool:
+        """Give result to request_id's waiter; True only if a caller is awaiting it and so takes over delivery"""
+        waiter = self._waiters.get(request_id)
+        if waiter is None or waiter.future.done():
+            return False
+        # The future keeps the result until wait() or discard() takes it
+        waiter.future.set_result(result)
+        return waiter.awaited
+
+    def take(self, request_id: str) -> Optional[dict]:
+        """Drop request_id's waiter, returning its result if one had already arrived"""
+        waiter = self._waiters.pop(request_id, None)
+        if waiter is None:
+            return None
+        if not waiter.future.done():
+            waiter.future.cancel()
+            return None
+        return None if waiter.future.cancelled() else waiter.future.result()
+
+    def discard(self, request_id: str):
+        waiter = self._waiters.pop(request_id, None)
+        if waiter is not None and not waiter.future.done():
+            waiter.future.cancel()
+
+    async def wait(self, request_id: str, timeout: float) -> Optional[dict]:
+        """Result of request_id, or None if it did not arrive within timeout; the waiter is dropped either way"""
+        self.expect(request_id)
+        future = self._waiters[request_id].future
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self.discard(request_id)
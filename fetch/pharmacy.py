@@ -5,9 +5,14 @@ from dotenv import load_dotenv
 from uagents import Agent, Context, Protocol, Model
 from datetime import datetime, timezone
 from uuid import uuid4
+from contextlib import AsyncExitStack
 from typing import List, Optional
 from pydantic import BaseModel
 
+from medicine_cache import MedicineCache
+from medicine_catalog import MedicineCatalog
+from stock_reservations import StockReservations
+
 # Load environment variables
 load_dotenv()
 
@@ -20,6 +25,10 @@ HEADERS = {
     "Content-Type": "application/json"
 }
 
+MEDICINE_CATALOG_REFRESH_INTERVAL = 30  # seconds between change-feed polls
+MEDICINE_CACHE_STATS_INTERVAL = 300  # seconds between cache hit-rate log lines
+ORDER_ATTEMPTS = 3  # conditional order writes before giving up on a medicine others keep changing
+
 # === Agent Setup ===
 agent = Agent(
     name="pharmacy_agent",
@@ -52,6 +61,7 @@ class MedicineCheckResponse(Model):
     pharmacy_name: str = "HealthPlus Pharmacy"
     status: str
     message: str
+    alternatives: Optional[List[dict]] = None  # in-stock substitutes when unavailable
 
 class MedicineOrderRequest(Model):
     medicine_id: str
@@ -59,6 +69,7 @@ class MedicineOrderRequest(Model):
     quantity: int
     user_id: str
     prescription_id: Optional[str] = None
+    request_id: Optional[str] = None
 
 class MedicineOrderResponse(Model):
     type: str = "MedicineOrderResponse"
@@ -70,6 +81,8 @@ class MedicineOrderResponse(Model):
     order_id: Optional[str] = None
     message: str
     suggested_alternatives: Optional[List[dict]] = None
+    request_id: Optional[str] = None  # echoed from MedicineOrderRequest
+    user_id: Optional[str] = None
 
 # === NEW: Unified Medicine Purchase Request (like DoctorBookingRequest) ===
 class MedicinePurchaseRequest(Model):
@@ -87,6 +100,26 @@ class MedicinePurchaseResponse(Model):
     order_id: Optional[str] = None
     total_price: Optional[float] = None
     message: str
+    suggested_alternatives: Optional[List[dict]] = None  # in-stock substitutes when out of stock
+
+# === Cart purchase: several medicines resolved and ordered in one message ===
+class CartLine(Model):
+    medicine_name: str
+    quantity: int = 1
+
+class MedicineCartRequest(Model):
+    request_id: str  # For correlation
+    lines: List[CartLine]
+    user_id: str
+    prescription_id: Optional[str] = None
+    auto_order: bool = True  # Place the available lines in one batched order
+
+class MedicineCartResponse(Model):
+    request_id: str  # Echo back for correlation
+    status: str  # "success", "available", "partial", "error"
+    lines: List[dict]  # per line: medicine_name, matched_name, medicine_id, quantity, status, order_id, total_price, message, suggested_alternatives
+    total_price: float = 0.0
+    message: str
 
 # === ICP Integration Functions ===
 def parse_medicine_data(medicine_data: dict) -> dict:
@@ -137,10 +170,46 @@ async def post_to_icp(endpoint: str, data: dict) -> dict:
     except Exception as e:
         return {"error": f"Failed to post data: {str(e)}", "status": "failed"}
 
+# === Local medicine catalog replica ===
+# Searches are answered from here; only orders (stock changes) go to the canister
+medicine_catalog = MedicineCatalog()
+# Stock held by orders in flight, so concurrent buyers cannot oversell the replica
+stock_reservations = StockReservations()
+# get-medicine-by-id results, evicted by our own orders and by the change feed
+medicine_cache = MedicineCache()
+
+async def refresh_medicine_catalog(ctx: Context) -> bool:
+    """Pull medicine changes since the replica's version, or the whole catalog on first load"""
+    if medicine_catalog.needs_full_reload():
+        icp_result = await post_to_icp("get-all-medicines", {})
+    else:
+        icp_result = await post_to_icp("get-medicine-changes", {"since": medicine_catalog.version})
+    if "error" in icp_result:
+        ctx.logger.warning(f"Could not refresh medicine catalog: {icp_result['error']}")
+        return False
+
+    icp_result["medicines"] = [parse_medicine_data(med) for med in icp_result.get("medicines", [])]
+    medicine_cache.apply(icp_result)
+    if not medicine_catalog.apply(icp_result):
+        ctx.logger.warning("Medicine catalog response had no version; keeping the current replica")
+        return False
+    if icp_result.get("full") or icp_result["medicines"] or icp_result.get("removed"):
+        ctx.logger.info(f"Medicine catalog at version {medicine_catalog.version}: {len(medicine_catalog)} medicines "
+                        f"({len(icp_result['medicines'])} updated, {len(icp_result.get('removed', []))} removed)")
+    return True
+
 # === Pharmacy Business Logic ===
 async def search_medicine_by_name(medicine_name: str, ctx: Context) -> dict:
-    """Search for medicines by name in ICP backend"""
+    """Search for medicines by name in the local catalog, falling back to the ICP backend"""
     try:
+        # Our own orders changed stock; catch up before answering
+        if medicine_catalog.version is None or medicine_catalog.dirty:
+            await refresh_medicine_catalog(ctx)
+        if medicine_catalog.version is not None:
+            medicines = medicine_catalog.search(medicine_name)
+            ctx.logger.info(f"Found {len(medicines)} medicines for '{medicine_name}' in local catalog")
+            return {"medicines": medicines, "total_count": len(medicines)}
+
         import time
         search_start = time.time()
         ctx.logger.info(f"[ICP] Starting ICP search for: {medicine_name}")
@@ -179,8 +248,12 @@ async def search_medicine_by_name(medicine_name: str, ctx: Context) -> dict:
         return {"error": f"Medicine search failed: {str(e)}", "medicines": []}
 
 async def get_medicine_inventory(medicine_id: str, ctx: Context) -> dict:
-    """Get detailed medicine inventory from ICP backend"""
+    """Get detailed medicine inventory, from the cache unless the catalog knows of a newer version"""
     try:
+        cached = medicine_cache.get(medicine_id, min_version=medicine_catalog.version_of(medicine_id))
+        if cached is not None:
+            return cached
+
         ctx.logger.info(f"Getting inventory for medicine ID: {medicine_id}")
         
         # Get medicine details from ICP backend
@@ -195,14 +268,16 @@ async def get_medicine_inventory(medicine_id: str, ctx: Context) -> dict:
         if "medicine" in icp_result and icp_result["medicine"]:
             icp_result["medicine"] = parse_medicine_data(icp_result["medicine"])
         
+        medicine_cache.put(medicine_id, icp_result, icp_result.get("version"))
         return icp_result
         
     except Exception as e:
         ctx.logger.error(f"Error getting inventory: {str(e)}")
         return {"error": f"Inventory check failed: {str(e)}"}
 
-async def place_medicine_order(medicine_id: str, quantity: int, user_id: str, prescription_id: Optional[str], ctx: Context) -> dict:
-    """Place a medicine order through ICP backend"""
+async def place_medicine_order(medicine_id: str, quantity: int, user_id: str, prescription_id: Optional[str], ctx: Context,
+                               expected_version: Optional[int] = None) -> dict:
+    """Place a medicine order through ICP backend; with expected_version it is only written if the medicine is unchanged"""
     try:
         ctx.logger.info(f"Placing order: Medicine {medicine_id}, Qty {quantity}, User {user_id}")
         
@@ -213,12 +288,29 @@ async def place_medicine_order(medicine_id: str, quantity: int, user_id: str, pr
             "user_id": user_id,
             "prescription_id": prescription_id
         }
+        if expected_version is not None:
+            order_params["expected_version"] = expected_version
         icp_result = await post_to_icp("place-medicine-order", order_params)
+        # Whatever happened, the cached stock may no longer be right
+        medicine_cache.invalidate(medicine_id)
         
         if "error" in icp_result:
             ctx.logger.error(f"ICP order error: {icp_result['error']}")
+            medicine_catalog.invalidate(medicine_id)
             return {"error": icp_result["error"]}
-        
+
+        if not icp_result.get("success"):
+            if icp_result.get("conflict"):
+                if not medicine_catalog.adopt_version(medicine_id, icp_result.get("version")):
+                    ctx.logger.warning(f"Canister version of {medicine_id} went backwards; reloading the full catalog")
+                return {"error": icp_result.get("message", "Version conflict"), "conflict": True,
+                        "version": icp_result.get("version")}
+            # Our copy of the stock was wrong; the next search refreshes it first
+            medicine_catalog.invalidate(medicine_id)
+            return {"error": icp_result.get("message", "Order failed"),
+                    "suggested_alternatives": icp_result.get("suggested_alternatives")}
+        
+        medicine_catalog.record_order(medicine_id, quantity, icp_result.get("version"))
         ctx.logger.info(f"Order result: {icp_result}")
         return icp_result
         
@@ -226,6 +318,134 @@ async def place_medicine_order(medicine_id: str, quantity: int, user_id: str, pr
         ctx.logger.error(f"Error placing order: {str(e)}")
         return {"error": f"Order placement failed: {str(e)}"}
 
+async def reserve_and_order(medicine: dict, quantity: int, user_id: str, prescription_id: Optional[str], ctx: Context) -> dict:
+    """Hold the stock locally, then write the order conditioned on the replica's version of the medicine"""
+    medicine_id = medicine.get("medicine_id")
+    if medicine_catalog.version_of(medicine_id) is None:
+        return await place_medicine_order(medicine_id, quantity, user_id, prescription_id, ctx)
+
+    stock = medicine_catalog.get(medicine_id).get("stock", 0)
+    hold_id = stock_reservations.reserve(medicine_id, stock, quantity)
+    if hold_id is None:
+        available = stock_reservations.available(medicine_id, stock)
+        ctx.logger.info(f"Not enough unreserved stock for {medicine_id}: {available} available, {quantity} requested")
+        return {"error": f"Insufficient stock. Available: {available} units"}
+
+    try:
+        # One write per medicine at a time, each with the version the previous one returned
+        async with stock_reservations.write_lock(medicine_id):
+            for attempt in range(ORDER_ATTEMPTS):
+                # Orders written while we waited already came off the replica's stock
+                current = medicine_catalog.get(medicine_id)
+                if current is None:
+                    return {"error": "Medicine not found"}
+                if int(current.get("stock") or 0) < quantity:
+                    return {"error": f"Insufficient stock. Available: {current.get('stock', 0)} units"}
+                order_result = await place_medicine_order(medicine_id, quantity, user_id, prescription_id, ctx,
+                                                          expected_version=medicine_catalog.version_of(medicine_id))
+                if not order_result.get("conflict"):
+                    return order_result
+
+                # Changed outside this agent (restock, admin edit, another client): catch up and recheck
+                ctx.logger.info(f"Version conflict ordering {medicine_id} (attempt {attempt + 1}); refreshing catalog")
+                await refresh_medicine_catalog(ctx)
+            return {"error": "Medicine is being updated, please try again"}
+    finally:
+        stock_reservations.release(hold_id)
+
+async def place_medicine_orders(lines: List[dict], user_id: str, prescription_id: Optional[str], ctx: Context) -> dict:
+    """Place several order lines ({medicine_id, quantity, expected_version}) in one ICP update call"""
+    try:
+        ctx.logger.info(f"Placing cart order: {len(lines)} lines, User {user_id}")
+        icp_result = await post_to_icp("place-medicine-orders", {
+            "user_id": user_id,
+            "prescription_id": prescription_id,
+            "lines": [{key: value for key, value in line.items() if value is not None} for line in lines]
+        })
+        for line in lines:
+            medicine_cache.invalidate(line["medicine_id"])
+
+        if "error" in icp_result:
+            ctx.logger.error(f"ICP cart order error: {icp_result['error']}")
+            for line in lines:
+                medicine_catalog.invalidate(line["medicine_id"])
+            return {"error": icp_result["error"]}
+
+        for line, result in zip(lines, icp_result.get("results", [])):
+            if result.get("success"):
+                medicine_catalog.record_order(line["medicine_id"], line["quantity"], result.get("version"))
+            elif result.get("conflict"):
+                if not medicine_catalog.adopt_version(line["medicine_id"], result.get("version")):
+                    ctx.logger.warning(f"Canister version of {line['medicine_id']} went backwards; reloading the full catalog")
+            else:
+                medicine_catalog.invalidate(line["medicine_id"])
+        ctx.logger.info(f"Cart order placed {icp_result.get('placed_count', 0)} of {len(lines)} lines")
+        return icp_result
+
+    except Exception as e:
+        ctx.logger.error(f"Error placing cart order: {str(e)}")
+        return {"error": f"Cart order placement failed: {str(e)}"}
+
+async def order_cart(lines: List[dict], user_id: str, prescription_id: Optional[str], ctx: Context):
+    """Write the reserved cart lines as one conditional batch, filling in each line's status, order_id and total_price"""
+    medicine_ids = sorted({line["medicine_id"] for line in lines})
+    async with AsyncExitStack() as stack:
+        # Same lock order as every other cart, so two carts cannot deadlock
+        for medicine_id in medicine_ids:
+            await stack.enter_async_context(stock_reservations.write_lock(medicine_id))
+
+        pending = list(lines)
+        for attempt in range(ORDER_ATTEMPTS):
+            batch, remaining, versioned = [], {}, set()
+            for line in pending:
+                medicine_id = line["medicine_id"]
+                current = medicine_catalog.get(medicine_id) or line["medicine"]
+                stock = remaining.setdefault(medicine_id, int(current.get("stock") or 0))
+                if stock < line["quantity"]:
+                    line.update(status="insufficient_stock", message=f"Insufficient stock. Available: {stock} units",
+                                suggested_alternatives=local_alternatives(medicine_id, line["quantity"]))
+                    continue
+                remaining[medicine_id] = stock - line["quantity"]
+                # Only the first line per medicine is conditional; later ones follow it in the same call
+                version = medicine_catalog.version_of(medicine_id) if medicine_id not in versioned else None
+                versioned.add(medicine_id)
+                batch.append(line)
+                line["_request"] = {"medicine_id": medicine_id, "quantity": line["quantity"], "expected_version": version}
+            if not batch:
+                return
+
+            order_result = await place_medicine_orders([line["_request"] for line in batch], user_id, prescription_id, ctx)
+            if "error" in order_result:
+                for line in batch:
+                    line.update(status="error", message=f"Order placement failed: {order_result['error']}")
+                return
+
+            pending = []
+            for line, result in zip(batch, order_result.get("results", [])):
+                message = result.get("message", "")
+                if result.get("success"):
+                    order_data = result.get("order") or {}
+                    line.update(status="confirmed", order_id=result.get("order_id") or order_data.get("order_id"),
+                                total_price=order_data.get("total_price", line["price"] * line["quantity"]), message=message)
+                elif result.get("conflict"):
+                    pending.append(line)
+                elif "prescription" in message.lower():
+                    line.update(status="prescription_required", message=message)
+                elif "insufficient" in message.lower():
+                    line.update(status="insufficient_stock", message=message,
+                                suggested_alternatives=local_alternatives(line["medicine_id"], line["quantity"]))
+                else:
+                    line.update(status="error", message=message or "Order failed")
+            if not pending:
+                return
+
+            # Changed outside this agent (restock, admin edit, another client): catch up and recheck
+            ctx.logger.info(f"Version conflict on {len(pending)} cart lines (attempt {attempt + 1}); refreshing catalog")
+            await refresh_medicine_catalog(ctx)
+
+        for line in pending:
+            line.update(status="error", message="Medicine is being updated, please try again")
+
 async def get_available_medicines(ctx: Context) -> dict:
     """Get all available medicines from ICP backend"""
     try:
@@ -263,10 +483,18 @@ def format_medicine_alternatives(alternatives: List[dict]) -> List[dict]:
             "price": parsed_alt.get("price", 0.0),
             "stock": parsed_alt.get("stock", 0),
             "category": parsed_alt.get("category", ""),
-            "description": parsed_alt.get("description", "")
+            "description": parsed_alt.get("description", ""),
+            "relation": parsed_alt.get("relation", "category")
         })
     return formatted_alternatives
 
+def local_alternatives(medicine_id: Optional[str], quantity: int = 1) -> Optional[List[dict]]:
+    """In-stock substitutes from the catalog replica's alternatives graph, None if there are none"""
+    if not medicine_id:
+        return None
+    alternatives = medicine_catalog.alternatives(medicine_id, quantity)
+    return format_medicine_alternatives(alternatives) if alternatives else None
+
 # === Protocol Definition ===
 pharmacy_protocol = Protocol(name="PharmacyProtocol", version="1.0")
 ack_protocol = Protocol(name="ACKProtocol", version="1.0")
@@ -322,7 +550,8 @@ async def handle_medicine_check(ctx: Context, sender: str, msg: MedicineCheckReq
                 medicine = search_result["medicines"][0]
                 ctx.logger.info(f"Medicine data: {medicine}")
                 
-                stock_level = medicine.get("stock", 0)
+                # Stock held by orders still being written is not for sale
+                stock_level = stock_reservations.available(medicine.get("medicine_id"), medicine.get("stock", 0))
                 ctx.logger.info(f"Stock level for {medicine.get('name', 'Unknown')}: {stock_level}")
                 
                 is_available = stock_level > 0
@@ -331,12 +560,13 @@ async def handle_medicine_check(ctx: Context, sender: str, msg: MedicineCheckReq
                     request_id=msg.request_id,
                     medicine=medicine.get("name", msg.medicine_name),
                     available=is_available,
-                    stock=medicine.get("stock", 0),
+                    stock=stock_level,
                     price=medicine.get("price", 0.0),
                     status="available" if is_available else "out_of_stock",
-                    message=f"Medicine found. Stock: {medicine.get('stock', 0)} units, Price: ${medicine.get('price', 0.0):.2f}"
+                    message=f"Medicine found. Stock: {stock_level} units, Price: ${medicine.get('price', 0.0):.2f}"
                     if is_available 
-                    else f"Medicine '{msg.medicine_name}' is currently out of stock"
+                    else f"Medicine '{msg.medicine_name}' is currently out of stock",
+                    alternatives=None if is_available else local_alternatives(medicine.get("medicine_id"), msg.quantity or 1)
                 )
         
         # Send immediate ACK
@@ -375,8 +605,16 @@ async def handle_medicine_order(ctx: Context, sender: str, msg: MedicineOrderReq
         # If medicine_id looks like a medicine name, search for the actual ID first
         actual_medicine_id = msg.medicine_id
         medicine_name = msg.medicine_name or msg.medicine_id
-        
-        if not msg.medicine_id.startswith("med_"):
+        medicine = medicine_catalog.get(msg.medicine_id)
+        if medicine is not None:
+            medicine_name = medicine.get("name", medicine_name)
+        
+        if medicine is None and msg.medicine_id.startswith("med_"):
+            inventory = await get_medicine_inventory(msg.medicine_id, ctx)
+            if inventory.get("medicine"):
+                medicine = inventory["medicine"]
+                medicine_name = medicine.get("name", medicine_name)
+        elif medicine is None:
             # medicine_id is likely a medicine name, search for the actual medicine
             ctx.logger.info(f"Searching for medicine ID using name: {msg.medicine_id}")
             search_result = await search_medicine_by_name(msg.medicine_id, ctx)
@@ -389,9 +627,9 @@ async def handle_medicine_order(ctx: Context, sender: str, msg: MedicineOrderReq
             else:
                 ctx.logger.warning(f"Could not find medicine ID for: {msg.medicine_id}")
         
-        # Place the order through ICP backend
-        order_result = await place_medicine_order(
-            actual_medicine_id, 
+        # Place the order through ICP backend, holding the stock while it is written
+        order_result = await reserve_and_order(
+            medicine or {"medicine_id": actual_medicine_id},
             msg.quantity, 
             msg.user_id, 
             msg.prescription_id, 
@@ -411,9 +649,11 @@ async def handle_medicine_order(ctx: Context, sender: str, msg: MedicineOrderReq
             else:
                 status = "error"
             
-            # Get suggested alternatives if available
+            # Substitutes from the alternatives graph, else whatever the canister suggested
             suggested_alternatives = None
-            if order_result.get("suggested_alternatives"):
+            if status == "insufficient_stock":
+                suggested_alternatives = local_alternatives(actual_medicine_id, msg.quantity)
+            if not suggested_alternatives and order_result.get("suggested_alternatives"):
                 suggested_alternatives = format_medicine_alternatives(order_result["suggested_alternatives"])
             
             response = MedicineOrderResponse(
@@ -423,7 +663,9 @@ async def handle_medicine_order(ctx: Context, sender: str, msg: MedicineOrderReq
                 price=0.0,
                 status=status,
                 message=error_message,
-                suggested_alternatives=suggested_alternatives
+                suggested_alternatives=suggested_alternatives,
+                request_id=msg.request_id,
+                user_id=msg.user_id
             )
         else:
             # Order was successful
@@ -435,7 +677,9 @@ async def handle_medicine_order(ctx: Context, sender: str, msg: MedicineOrderReq
                 price=order_data.get("total_price", 0.0),
                 status="confirmed",
                 order_id=order_data.get("order_id"),
-                message=f"Order confirmed! Total: ${order_data.get('total_price', 0.0):.2f}. Ready for pickup at HealthPlus Pharmacy."
+                message=f"Order confirmed! Total: ${order_data.get('total_price', 0.0):.2f}. Ready for pickup at HealthPlus Pharmacy.",
+                request_id=msg.request_id,
+                user_id=msg.user_id
             )
         
         ctx.logger.info(f"Sending medicine order response: {response.status}")
@@ -449,7 +693,9 @@ async def handle_medicine_order(ctx: Context, sender: str, msg: MedicineOrderReq
             qty=msg.quantity,
             price=0.0,
             status="error",
-            message=f"Internal error processing order: {str(e)}"
+            message=f"Internal error processing order: {str(e)}",
+            request_id=msg.request_id,
+            user_id=msg.user_id
         )
         await ctx.send(sender, error_response)
 
@@ -491,7 +737,7 @@ async def handle_medicine_purchase(ctx: Context, sender: str, msg: MedicinePurch
             medicine = search_result["medicines"][0]
             medicine_id = medicine.get("medicine_id")
             medicine_name = medicine.get("name", msg.medicine_name)
-            stock_level = medicine.get("stock", 0)
+            stock_level = stock_reservations.available(medicine_id, medicine.get("stock", 0))
             price = medicine.get("price", 0.0)
             
             ctx.logger.info(f"Step 1 complete: Found {medicine_name} (ID: {medicine_id}, Stock: {stock_level})")
@@ -502,13 +748,14 @@ async def handle_medicine_purchase(ctx: Context, sender: str, msg: MedicinePurch
                     request_id=msg.request_id,
                     status="insufficient_stock",
                     medicine_name=medicine_name,
-                    message=f"Insufficient stock. Available: {stock_level} units, Requested: {msg.quantity} units"
+                    message=f"Insufficient stock. Available: {stock_level} units, Requested: {msg.quantity} units",
+                    suggested_alternatives=local_alternatives(medicine_id, msg.quantity)
                 )
             elif msg.auto_order:
                 # Step 4: Place order automatically (like doctor booking)
                 ctx.logger.info(f"Step 2: Auto-placing order for {medicine_name}")
-                order_result = await place_medicine_order(
-                    medicine_id, 
+                order_result = await reserve_and_order(
+                    medicine, 
                     msg.quantity, 
                     msg.user_id, 
                     msg.prescription_id, 
@@ -516,11 +763,13 @@ async def handle_medicine_purchase(ctx: Context, sender: str, msg: MedicinePurch
                 )
                 
                 if "error" in order_result:
+                    out_of_stock = "insufficient" in order_result["error"].lower()
                     response = MedicinePurchaseResponse(
                         request_id=msg.request_id,
-                        status="error",
+                        status="insufficient_stock" if out_of_stock else "error",
                         medicine_name=medicine_name,
-                        message=f"Order placement failed: {order_result['error']}"
+                        message=f"Order placement failed: {order_result['error']}",
+                        suggested_alternatives=local_alternatives(medicine_id, msg.quantity) if out_of_stock else None
                     )
                 else:
                     # Order successful
@@ -560,6 +809,100 @@ async def handle_medicine_purchase(ctx: Context, sender: str, msg: MedicinePurch
         )
         await ctx.send(sender, error_response)
 
+@pharmacy_protocol.on_message(model=MedicineCartRequest, replies=MedicineCartResponse)
+async def handle_medicine_cart(ctx: Context, sender: str, msg: MedicineCartRequest):
+    """Handle multi-medicine purchases: resolve every line locally, then place them in one batched order"""
+
+    ctx.logger.info(f"Received medicine cart request from {sender}: {len(msg.lines)} lines")
+
+    try:
+        ack = RequestACK(
+            request_id=msg.request_id,
+            message=f"Medicine cart received: {len(msg.lines)} items",
+            timestamp=datetime.now(timezone.utc).isoformat()
+        )
+        await ctx.send(sender, ack)
+
+        # Step 1: Resolve every line against the catalog and hold its stock
+        lines, holds = [], []
+        for cart_line in msg.lines:
+            line = {"medicine_name": cart_line.medicine_name, "matched_name": None, "medicine_id": None,
+                    "quantity": cart_line.quantity, "status": "error", "order_id": None, "total_price": None,
+                    "message": "", "suggested_alternatives": None}
+            lines.append(line)
+            search_result = await search_medicine_by_name(cart_line.medicine_name, ctx)
+            if "error" in search_result:
+                line["message"] = f"Error searching for medicine: {search_result['error']}"
+                continue
+            if not search_result.get("medicines"):
+                line.update(status="not_found", message=f"Medicine '{cart_line.medicine_name}' not found in our inventory")
+                continue
+
+            medicine = search_result["medicines"][0]
+            medicine_id = medicine.get("medicine_id")
+            price = medicine.get("price", 0.0)
+            line.update(matched_name=medicine.get("name", cart_line.medicine_name), medicine_id=medicine_id,
+                        medicine=medicine, price=price)
+            if cart_line.quantity <= 0:
+                line["message"] = "Quantity must be at least 1"
+            elif medicine.get("requires_prescription") and not msg.prescription_id:
+                line.update(status="prescription_required", message="This medicine requires a prescription")
+            elif (hold_id := stock_reservations.reserve(medicine_id, medicine.get("stock", 0), cart_line.quantity)) is None:
+                available = stock_reservations.available(medicine_id, medicine.get("stock", 0))
+                line.update(status="insufficient_stock",
+                            message=f"Insufficient stock. Available: {available} units, Requested: {cart_line.quantity} units",
+                            suggested_alternatives=local_alternatives(medicine_id, cart_line.quantity))
+            else:
+                holds.append(hold_id)
+                line.update(status="available", total_price=price * cart_line.quantity,
+                            message=f"Available: ${price:.2f} each, ${price * cart_line.quantity:.2f} total")
+
+        # Step 2: Commit the available lines as one batched order
+        try:
+            orderable = [line for line in lines if line["status"] == "available"]
+            if msg.auto_order and orderable:
+                ctx.logger.info(f"Step 2: Placing {len(orderable)} of {len(lines)} cart lines in one order")
+                await order_cart(orderable, msg.user_id, msg.prescription_id, ctx)
+        finally:
+            for hold_id in holds:
+                stock_reservations.release(hold_id)
+
+        ok_status = "confirmed" if msg.auto_order else "available"
+        for line in lines:
+            line.pop("medicine", None)
+            line.pop("price", None)
+            line.pop("_request", None)
+            if line["status"] != ok_status:
+                line["total_price"] = None
+
+        ok_lines = [line for line in lines if line["status"] == ok_status]
+        total_price = sum(line["total_price"] or 0.0 for line in ok_lines)
+        if len(ok_lines) == len(lines):
+            status = "success" if msg.auto_order else "available"
+        else:
+            status = "partial" if ok_lines else "error"
+        verb = "ordered" if msg.auto_order else "available"
+        response = MedicineCartResponse(
+            request_id=msg.request_id,
+            status=status,
+            lines=lines,
+            total_price=total_price,
+            message=f"{len(ok_lines)} of {len(lines)} items {verb}. Total: ${total_price:.2f}"
+        )
+
+        ctx.logger.info(f"Step 3: Sending cart response: {response.status}")
+        await ctx.send(sender, response)
+
+    except Exception as e:
+        ctx.logger.error(f"Error in medicine cart handler: {str(e)}")
+        error_response = MedicineCartResponse(
+            request_id=msg.request_id,
+            status="error",
+            lines=[],
+            message=f"Internal error: {str(e)}"
+        )
+        await ctx.send(sender, error_response)
+
 # ACK handler
 @ack_protocol.on_message(model=RequestACK)
 async def handle_request_ack(ctx: Context, sender: str, msg: RequestACK):
@@ -578,14 +921,22 @@ async def pharmacy_agent_startup(ctx: Context):
     ctx.logger.info(f"Connected to medicine inventory canister: {CANISTER_ID}")
     ctx.logger.info(f"Ready for medicine check and order requests from HealthAgent")
     
-    # Test connection to ICP backend
+    # Load the catalog replica
     try:
-        available_medicines = await get_available_medicines(ctx)
-        medicine_count = available_medicines.get("total_count", 0)
-        ctx.logger.info(f"Successfully connected to medicine inventory: {medicine_count} medicines available")
+        if await refresh_medicine_catalog(ctx):
+            ctx.logger.info(f"Successfully connected to medicine inventory: {len(medicine_catalog)} medicines loaded")
     except Exception as e:
         ctx.logger.warning(f"Could not connect to medicine inventory: {str(e)}")
 
+@agent.on_interval(period=MEDICINE_CATALOG_REFRESH_INTERVAL)
+async def periodic_catalog_refresh(ctx: Context):
+    # Picks up restocks, price edits, cancellations and orders placed by other clients
+    await refresh_medicine_catalog(ctx)
+
+@agent.on_interval(period=MEDICINE_CACHE_STATS_INTERVAL)
+async def log_medicine_cache_stats(ctx: Context):
+    ctx.logger.info(f"Medicine cache: {medicine_cache.stats()}")
+
 if __name__ == "__main__":
     print("Starting PharmacyAgent...")
     print(f"Agent Address: {agent.address}")
@@ -0,0 +1,219 @@
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+REMINDER_TICK = 30  # seconds per wheel slot, and how often the agent advances the wheel
+WHEEL_SLOTS = 24 * 3600 // REMINDER_TICK  # one revolution per day, so daily reminders never wait out extra laps
+MISSED_REMINDER_GRACE = 15 * 60  # seconds; a reminder missed by less than this (e.g. during a restart) still fires
+DAY = 24 * 3600
+
+# Times the LLM extracts as phrases rather than clock times
+NAMED_TIMES = {
+    "breakfast": (8, 0),
+    "morning": (8, 0),
+    "noon": (12, 0),
+    "lunch": (13, 0),
+    "after eating": (13, 0),
+    "afternoon": (15, 0),
+    "evening": (18, 0),
+    "dinner": (19, 0),
+    "night": (21, 0),
+    "bed": (22, 0),
+    "sleep": (22, 0),
+}
+
+CLOCK_TIME = re.compile(r"\b(at\s+)?(\d{1,2})(?::(\d{2}))?\s*(am|pm|a\.m\.|p\.m\.)?(?![\d:])", re.IGNORECASE)
+EVERY_N_HOURS = re.compile(r"\bevery\s+(\d{1,2})\s*(?:hours?|hrs?|h)\b", re.IGNORECASE)
+TIMES_A_DAY = re.compile(r"\b(once|twice|thrice|\d{1,2}\s*(?:x|times))\s*(?:a\s+|per\s+|each\s+)?(?:day|daily)\b", re.IGNORECASE)
+WORD_COUNTS = {"once": 1, "twice": 2, "thrice": 3}
+FIRST_DOSE = (8, 0)  # first dose of "twice daily" and the like when no time is given
+
+
+def parse_reminder_schedule(text: str) -> Optional[Tuple[Optional[Tuple[int, int]], int]]:
+    """((hour, minute) or None, period in seconds) for a reminder time, or None if it cannot be scheduled"""
+    text = (text or "").strip().lower()
+    if not text or "as needed" in text:
+        return None
+
+    every = EVERY_N_HOURS.search(text)
+    if every and 0 < int(every.group(1)) <= 24:
+        return None, int(every.group(1)) * 3600
+
+    # "twice daily" spreads the doses evenly from the first one
+    period, first_dose = DAY, None
+    frequency = TIMES_A_DAY.search(text)
+    if frequency:
+        count = WORD_COUNTS.get(frequency.group(1)) or int(re.match(r"\d+", frequency.group(1)).group())
+        if not 0 < count <= 24:
+            return None
+        period, first_dose = DAY // count, FIRST_DOSE
+
+    for match in CLOCK_TIME.finditer(text):
+        at, hour, minute, meridiem = match.group(1), int(match.group(2)), int(match.group(3) or 0), match.group(4)
+        if meridiem:
+            if not 1 <= hour <= 12:
+                continue
+            hour = hour % 12 + (12 if meridiem.startswith("p") else 0)
+        elif match.group(3) is None and not at:
+            continue  # a bare number ("2 tablets") is not a time, but "at 8" is
+        if hour < 24 and minute < 60:
+            return (hour, minute), period
+
+    for phrase, clock in NAMED_TIMES.items():
+        if phrase in text:
+            return clock, period
+    if first_dose:
+        return first_dose, period
+    return None
+
+
+def reminder_key(reminder: dict) -> str:
+    return "|".join(str(reminder.get(field, "")) for field in ("user_id", "medicine", "time", "created_at"))
+
+
+class TimerWheel:
+    """Hashed timer wheel: O(1) add and cancel, and each advance only looks at the slots it passes"""
+
+    def __init__(self, tick: float = REMINDER_TICK, slots: int = WHEEL_SLOTS, start: float = None):
+        self.tick = tick
+        self.slots = slots
+        self._wheel: List[Dict[str, Tuple[float, Any]]] = [{} for _ in range(slots)]
+        self._slot_of: Dict[str, int] = {}
+        self._current = int((time.time() if start is None else start) // tick)  # tick number last advanced to
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._slot_of
+
+    def keys(self) -> List[str]:
+        return list(self._slot_of)
+
+    def add(self, key: str, fire_at: float, payload: Any = None):
+        self.cancel(key)
+        slot = max(int(fire_at // self.tick), self._current) % self.slots
+        self._wheel[slot][key] = (fire_at, payload)
+        self._slot_of[key] = slot
+
+    def cancel(self, key: str):
+        slot = self._slot_of.pop(key, None)
+        if slot is not None:
+            del self._wheel[slot][key]
+
+    def advance(self, now: float) -> List[Tuple[str, float, Any]]:
+        """Remove and return every timer due by now"""
+        target = int(now // self.tick)
+        # After a gap of a full revolution or more, one pass over every slot finds everything that is due
+        first = max(self._current, target - self.slots + 1)
+        due = []
+        for tick_number in range(first, target + 1):
+            bucket = self._wheel[tick_number % self.slots]
+            # Timers a lap or more ahead share the slot and stay put
+            fired = [key for key, (fire_at, _) in bucket.items() if fire_at <= now]
+            for key in fired:
+                fire_at, payload = bucket.pop(key)
+                del self._slot_of[key]
+                due.append((key, fire_at, payload))
+        # The current slot can still hold timers later in this tick, so it is revisited next time
+        self._current = target
+        return due
+
+
+class ReminderScheduler:
+    """Active medication reminders on a timer wheel, with the last delivered occurrence kept in a state backend"""
+
+    def __init__(self, backend=None, tick: float = REMINDER_TICK, clock=time.time,
+                 namespace: str = "reminder_delivery", grace: float = MISSED_REMINDER_GRACE):
+        self.backend = backend
+        self.namespace = namespace
+        self.grace = grace
+        self._clock = clock
+        self._wheel = TimerWheel(tick, start=clock())
+        self._keys_by_id: Dict[str, str] = {}  # canister reminder_id -> wheel key
+        self.version = 0  # canister reminders_version last synced; 0 asks for every active reminder
+
+    def __len__(self) -> int:
+        return len(self._wheel)
+
+    def _last_delivered(self, key: str) -> float:
+        if self.backend is None:
+            return 0.0
+        return float(self.backend.get(self.namespace, key, 0.0))
+
+    def _next_fire(self, reminder: dict, clock: Optional[Tuple[int, int]], period: int, now: float) -> float:
+        if clock is None:
+            # "every N hours" counts from when the reminder was set
+            try:
+                anchor = datetime.fromisoformat(reminder.get("created_at", "").replace("Z", "+00:00")).timestamp()
+            except ValueError:
+                anchor = now
+        else:
+            today = datetime.fromtimestamp(now).replace(hour=clock[0], minute=clock[1], second=0, microsecond=0)
+            anchor = today.timestamp()
+        # Most recent occurrence at or before now
+        latest = anchor + ((now - anchor) // period) * period
+        if now - latest <= self.grace and self._last_delivered(reminder_key(reminder)) < latest:
+            return latest
+        return latest + period
+
+    def schedule(self, reminder: dict) -> Optional[float]:
+        """Put an active reminder on the wheel; returns its next fire time, or None if its time is not schedulable"""
+        key = reminder_key(reminder)
+        if reminder.get("reminder_id"):
+            self._keys_by_id[reminder["reminder_id"]] = key
+        if not reminder.get("active", True):
+            self._wheel.cancel(key)
+            return None
+        parsed = parse_reminder_schedule(reminder.get("time", ""))
+        if parsed is None:
+            return None
+        clock, period = parsed
+        fire_at = self._next_fire(reminder, clock, period, self._clock())
+        self._wheel.add(key, fire_at, (reminder, period))
+        return fire_at
+
+    def cancel(self, reminder: dict):
+        self._wheel.cancel(reminder_key(reminder))
+
+    def load(self, reminders: List[dict]) -> int:
+        """Schedule a batch of reminders (e.g. from get-active-reminders); returns how many were scheduled"""
+        return sum(1 for reminder in reminders if self.schedule(reminder) is not None)
+
+    def sync(self, reminders: List[dict], removed: List[str] = (), full: bool = False, version: Optional[int] = None) -> int:
+        """Apply a get-active-reminders delta: cancel removed ids, or everything not listed when full; schedule the rest"""
+        for reminder_id in removed:
+            key = self._keys_by_id.pop(reminder_id, None)
+            if key is not None:
+                self._wheel.cancel(key)
+        if full:
+            listed = {reminder_key(reminder) for reminder in reminders}
+            for key in self._wheel.keys():
+                if key not in listed:
+                    self._wheel.cancel(key)
+            self._keys_by_id = {reminder_id: key for reminder_id, key in self._keys_by_id.items() if key in listed}
+        if version is not None:
+            self.version = version
+        return self.load(reminders)
+
+    def due(self) -> List[dict]:
+        """Reminders whose time has come; each is recorded as delivered and rescheduled for its next occurrence"""
+        now = self._clock()
+        reminders = []
+        for key, fire_at, (reminder, period) in self._wheel.advance(now):
+            if self.backend is not None:
+                self.backend.set(self.namespace, key, fire_at, ttl=period + self.grace)
+            next_fire = fire_at + period
+            if next_fire <= now:
+                next_fire += ((now - next_fire) // period + 1) * period
+            self._wheel.add(key, next_fire, (reminder, period))
+            reminders.append(reminder)
+        return reminders
+
+
+def next_fire_text(fire_at: float) -> str:
+    fire_time = datetime.fromtimestamp(fire_at)
+    day = "today" if fire_time.date() == datetime.now().date() else (
+        "tomorrow" if fire_time.date() == datetime.now().date() + timedelta(days=1) else fire_time.strftime("%Y-%m-%d"))
+    return f"{day} at {fire_time.strftime('%H:%M')}"
@@ -0,0 +1,96 @@
+import asyncio
+import itertools
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Deque, List, Optional
+
+MAX_RESULTS_PER_USER = 50
+MAX_INBOX_USERS = 10000
+RESULT_RETENTION = 3600  # seconds an undelivered result is kept
+
+
+class _UserInbox:
+    def __init__(self, max_results: int):
+        self.results: Deque[dict] = deque(maxlen=max_results)
+        self.changed = asyncio.Event()
+        self.touched = time.monotonic()
+
+
+class ResultInbox:
+    """Per-user queue of asynchronous results (bookings, orders, ...) for REST users, read by long-polling.
+
+    Sequence numbers restart with the process, so each inbox has a random epoch that clients
+    send back with their cursor. A cursor from another epoch, or past the newest sequence
+    number, is treated as 0 and the client gets every retained result again.
+    """
+
+    def __init__(self, max_results_per_user: int = MAX_RESULTS_PER_USER, max_users: int = MAX_INBOX_USERS,
+                 retention: float = RESULT_RETENTION):
+        self.max_results_per_user = max_results_per_user
+        self.max_users = max_users
+        self.retention = retention
+        self._inboxes: "OrderedDict[str, _UserInbox]" = OrderedDict()  # least recently used first
+        self._sequence = itertools.count(1)
+        self._last_seq = 0
+        self.epoch = uuid.uuid4().hex[:12]
+
+    def _inbox(self, user_id: str) -> _UserInbox:
+        inbox = self._inboxes.get(user_id)
+        if inbox is None:
+            while len(self._inboxes) >= self.max_users:
+                self._inboxes.popitem(last=False)
+            inbox = self._inboxes[user_id] = _UserInbox(self.max_results_per_user)
+        self._inboxes.move_to_end(user_id)
+        inbox.touched = time.monotonic()
+        return inbox
+
+    def publish(self, user_id: str, result: dict) -> int:
+        """Queue a result for user_id and wake any waiting long-poll; returns its sequence number"""
+        inbox = self._inbox(user_id)
+        seq = self._last_seq = next(self._sequence)
+        inbox.results.append({
+            **result,
+            "seq": seq,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "_published": time.monotonic(),
+        })
+        inbox.changed.set()
+        return seq
+
+    def cursor(self, after: int = 0, epoch: Optional[str] = None) -> int:
+        """The client's last seen sequence number, or 0 if it belongs to another epoch or is ahead of this one"""
+        if (epoch is not None and epoch != self.epoch) or after > self._last_seq:
+            return 0
+        return max(after, 0)
+
+    def since(self, user_id: str, after: int = 0) -> List[dict]:
+        """Results newer than sequence number after"""
+        inbox = self._inboxes.get(user_id)
+        if inbox is None:
+            return []
+        cutoff = time.monotonic() - self.retention
+        while inbox.results and inbox.results[0]["_published"] < cutoff:
+            inbox.results.popleft()
+        return [
+            {key: value for key, value in result.items() if key != "_published"}
+            for result in inbox.results
+            if result["seq"] > after
+        ]
+
+    async def wait(self, user_id: str, after: int = 0, timeout: float = 25.0, epoch: Optional[str] = None) -> List[dict]:
+        """Long-poll: return results newer than after as soon as there are any, or [] on timeout"""
+        after = self.cursor(after, epoch)
+        deadline = time.monotonic() + timeout
+        while True:
+            results = self.since(user_id, after)
+            remaining = deadline - time.monotonic()
+            if results or remaining <= 0:
+                return results
+            inbox = self._inbox(user_id)
+            inbox.changed.clear()
+            try:
+                await asyncio.wait_for(inbox.changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,175 @@
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+from aiohttp import ClientSession, ClientTimeout, web
+
+# Front router for a sharded HealthAgent deployment: every user_id is pinned to
+# one worker on a consistent-hash ring, so a user's conversation context stays on
+# that worker and adding or removing a worker only remaps ~1/N of the users.
+#
+#   python router.py --workers 4      # spawns agent.py on ports 8100-8103, serves on 8000
+
+ROUTER_PORT = int(os.getenv("ROUTER_PORT", "8000"))
+WORKER_BASE_PORT = int(os.getenv("HEALTH_WORKER_BASE_PORT", "8100"))
+VIRTUAL_NODES = 160  # ring points per worker; more points = more even split
+FORWARD_TIMEOUT = 120  # seconds; chat requests wait on the LLM
+
+# Hop-by-hop headers that must not be copied between the client and the worker
+HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "content-length", "host", "content-encoding"}
+
+
+def ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent-hash ring mapping keys to workers"""
+
+    def __init__(self, nodes: List[str] = None, virtual_nodes: int = VIRTUAL_NODES):
+        self.virtual_nodes = virtual_nodes
+        self._points: List[int] = []
+        self._owners: Dict[int, str] = {}
+        for node in nodes or []:
+            self.add_node(node)
+
+    def add_node(self, node: str):
+        for replica in range(self.virtual_nodes):
+            point = ring_hash(f"{node}#{replica}")
+            if point in self._owners:
+                continue
+            self._owners[point] = node
+            bisect.insort(self._points, point)
+
+    def remove_node(self, node: str):
+        self._points = [point for point in self._points if self._owners[point] != node]
+        self._owners = {point: owner for point, owner in self._owners.items() if owner != node}
+
+    def nodes(self) -> List[str]:
+        return sorted(set(self._owners.values()))
+
+    def node_for(self, key: str) -> Optional[str]:
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, ring_hash(key)) % len(self._points)
+        return self._owners[self._points[index]]
+
+
+class ShardRouter:
+    """Forwards HealthAgent REST traffic to the worker that owns the request's user_id"""
+
+    def __init__(self, worker_urls: List[str]):
+        self.ring = HashRing(worker_urls)
+        self._session: Optional[ClientSession] = None
+
+    async def start(self, app: web.Application):
+        self._session = ClientSession(timeout=ClientTimeout(total=FORWARD_TIMEOUT))
+
+    async def stop(self, app: web.Application):
+        await self._session.close()
+
+    def worker_for(self, user_id: str) -> str:
+        return self.ring.node_for(user_id or "anonymous")
+
+    async def forward(self, request: web.Request) -> web.Response:
+        body = await request.read()
+        user_id = request.query.get("user_id")
+        if body and not user_id:
+            try:
+                payload = json.loads(body)
+                if isinstance(payload, dict):
+                    user_id = payload.get("user_id")
+            except ValueError:
+                pass
+
+        worker_url = self.worker_for(user_id)
+        headers = {name: value for name, value in request.headers.items() if name.lower() not in HOP_HEADERS}
+        try:
+            async with self._session.request(
+                request.method, worker_url + request.path_qs, data=body or None, headers=headers
+            ) as upstream:
+                content = await upstream.read()
+                response_headers = {
+                    name: value for name, value in upstream.headers.items() if name.lower() not in HOP_HEADERS
+                }
+                return web.Response(status=upstream.status, body=content, headers=response_headers)
+        except Exception as e:
+            return web.json_response({"error": f"Worker {worker_url} unavailable: {str(e)}"}, status=502)
+
+    async def health(self, request: web.Request) -> web.Response:
+        """Router health plus the status of every worker"""
+        workers = {}
+        for worker_url in self.ring.nodes():
+            try:
+                async with self._session.get(worker_url + "/health", timeout=ClientTimeout(total=5)) as upstream:
+                    workers[worker_url] = "online" if upstream.status == 200 else f"http {upstream.status}"
+            except Exception:
+                workers[worker_url] = "offline"
+        online = sum(1 for status in workers.values() if status == "online")
+        return web.json_response({
+            "response": f"HealthAgent router: {online}/{len(workers)} workers online",
+            "intent": "health_check",
+            "communication_status": "online" if online else "offline",
+            "workers": workers,
+        })
+
+
+def build_app(worker_urls: List[str]) -> web.Application:
+    router = ShardRouter(worker_urls)
+    app = web.Application(client_max_size=20 * 1024 * 1024)  # chat requests may carry base64 images
+    app.on_startup.append(router.start)
+    app.on_cleanup.append(router.stop)
+    app.router.add_get("/health", router.health)
+    app.router.add_route("*", "/{tail:.*}", router.forward)
+    return app
+
+
+def spawn_workers(count: int, base_port: int, extra_env: Dict[str, str] = None) -> List[subprocess.Popen]:
+    """Start count agent.py processes on consecutive ports"""
+    agent_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agent.py")
+    processes = []
+    worker_urls = [f"http://127.0.0.1:{base_port + index}" for index in range(count)]
+    for index in range(count):
+        env = dict(os.environ, **(extra_env or {}))
+        env["HEALTH_AGENT_PORT"] = str(base_port + index)
+        env["HEALTH_AGENT_NAME"] = f"health-agent-{index}"
+        # Lets each worker pick its own users' background work, e.g. reminders (see owns_user in agent.py)
+        env["HEALTH_SHARD_WORKERS"] = ",".join(worker_urls)
+        env["HEALTH_SHARD_SELF"] = worker_urls[index]
+        processes.append(subprocess.Popen([sys.executable, agent_path], env=env, cwd=os.path.dirname(agent_path)))
+    return processes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consistent-hash router over HealthAgent workers")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("HEALTH_AGENT_WORKERS", "2")),
+                        help="number of agent.py workers to spawn")
+    parser.add_argument("--base-port", type=int, default=WORKER_BASE_PORT)
+    parser.add_argument("--port", type=int, default=ROUTER_PORT)
+    parser.add_argument("--worker-url", action="append", default=[],
+                        help="route to an already running worker instead of spawning (repeatable)")
+    args = parser.parse_args()
+
+    processes = []
+    worker_urls = list(args.worker_url)
+    if not worker_urls:
+        processes = spawn_workers(args.workers, args.base_port)
+        worker_urls = [f"http://127.0.0.1:{args.base_port + index}" for index in range(args.workers)]
+
+    print(f"HealthAgent router on port {args.port} -> {', '.join(worker_urls)}")
+    try:
+        web.run_app(build_app(worker_urls), port=args.port, print=None)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Specialty names exactly as the canister stores them
+SPECIALTIES = [
+    "Cardiology", "Dermatology", "Neurology", "Orthopedics",
+    "Pediatrics", "Oncology", "Psychiatry", "General Practitioner",
+]
+DEFAULT_SPECIALTY = "General Practitioner"
+MIN_CONFIDENCE = 0.6  # below this, callers should ask the LLM
+DECISIVE_WEIGHT = 1.0  # a specialty's own name, or symptoms adding up to as much
+UNDECIDED_SCALE = 0.5  # evidence short of DECISIVE_WEIGHT counts at most this much, so it stays under MIN_CONFIDENCE
+
+# phrase -> weight per specialty. Names of the specialty or specialist are decisive (1.0);
+# symptoms and body parts are evidence that adds up.
+SYNONYMS: Dict[str, Dict[str, float]] = {
+    "Cardiology": {
+        "cardiology": 1.0, "cardiologist": 1.0, "cardiac": 0.9, "heart doctor": 1.0, "heart specialist": 1.0,
+        "heart": 0.7, "chest pain": 0.7, "chest tightness": 0.7, "palpitation": 0.8, "arrhythmia": 0.9,
+        "irregular heartbeat": 0.9, "blood pressure": 0.6, "hypertension": 0.7, "cholesterol": 0.6,
+        "circulation": 0.5, "shortness of breath": 0.4,
+    },
+    "Dermatology": {
+        "dermatology": 1.0, "dermatologist": 1.0, "skin doctor": 1.0, "skin specialist": 1.0,
+        "skin": 0.7, "rash": 0.7, "acne": 0.8, "eczema": 0.9, "psoriasis": 0.9, "mole": 0.7, "itching": 0.5,
+        "itchy": 0.5, "hives": 0.7, "hair loss": 0.7, "nail": 0.5, "wart": 0.7, "sunburn": 0.6,
+    },
+    "Neurology": {
+        "neurology": 1.0, "neurologist": 1.0, "nerve doctor": 1.0, "brain doctor": 1.0,
+        "brain": 0.6, "nerve": 0.6, "headache": 0.5, "migraine": 0.8, "seizure": 0.8, "epilepsy": 0.9,
+        "numbness": 0.6, "tingling": 0.6, "memory loss": 0.7, "dizziness": 0.4, "vertigo": 0.6,
+        "tremor": 0.7, "parkinson": 0.9, "multiple sclerosis": 0.9,
+    },
+    "Orthopedics": {
+        "orthopedics": 1.0, "orthopaedics": 1.0, "orthopedic": 1.0, "orthopaedic": 1.0, "orthopedist": 1.0,
+        "bone doctor": 1.0, "bone": 0.6, "joint": 0.6, "fracture": 0.8, "broken bone": 0.9, "sprain": 0.7,
+        "back pain": 0.6, "knee": 0.6, "shoulder": 0.5, "hip": 0.5, "ankle": 0.5, "arthritis": 0.7,
+        "sports injury": 0.8, "ligament": 0.7, "muscle": 0.4, "spine": 0.6,
+    },
+    "Pediatrics": {
+        "pediatrics": 1.0, "paediatrics": 1.0, "pediatrician": 1.0, "paediatrician": 1.0,
+        "child doctor": 1.0, "children's doctor": 1.0, "child": 0.7, "children": 0.7, "kid": 0.7,
+        "baby": 0.8, "infant": 0.8, "toddler": 0.8, "newborn": 0.8, "my son": 0.6, "my daughter": 0.6,
+        "vaccination": 0.4,
+    },
+    "Oncology": {
+        "oncology": 1.0, "oncologist": 1.0, "cancer doctor": 1.0, "cancer": 0.9, "tumor": 0.8, "tumour": 0.8,
+        "chemotherapy": 0.9, "chemo": 0.9, "radiation therapy": 0.8, "lump": 0.5, "biopsy": 0.6,
+        "leukemia": 0.9, "lymphoma": 0.9,
+    },
+    "Psychiatry": {
+        "psychiatry": 1.0, "psychiatrist": 1.0, "therapist": 0.8, "therapy": 0.5, "mental health": 0.9,
+        "mental": 0.6, "depression": 0.8, "depressed": 0.8, "anxiety": 0.8, "anxious": 0.6, "panic attack": 0.8,
+        "stress": 0.4, "insomnia": 0.5, "bipolar": 0.9, "adhd": 0.8, "ptsd": 0.9, "ocd": 0.8,
+    },
+    "General Practitioner": {
+        "general practitioner": 1.0, "gp": 1.0, "family doctor": 1.0, "primary care": 1.0,
+        "family medicine": 1.0, "general physician": 1.0, "checkup": 0.8, "check up": 0.8, "check-up": 0.8,
+        "physical exam": 0.8, "fever": 0.5, "cold": 0.4, "flu": 0.5, "cough": 0.4, "sore throat": 0.5,
+        "general health": 0.7,
+    },
+}
+
+_TOKEN = re.compile(r"[a-z0-9']+(?:-[a-z0-9']+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall((text or "").lower().replace("’", "'"))
+
+
+class SpecialtyMatch(NamedTuple):
+    specialty: Optional[str]
+    confidence: float
+    terms: Tuple[str, ...]  # phrases that matched, for logging
+
+
+class SpecialtyResolver:
+    """Synonym and symptom phrases compiled into a word trie; one left-to-right pass scores every specialty"""
+
+    def __init__(self, synonyms: Dict[str, Dict[str, float]] = None):
+        self._root: dict = {}
+        for specialty, phrases in (synonyms or SYNONYMS).items():
+            for phrase, weight in phrases.items():
+                self._add(tokenize(phrase), phrase, specialty, weight)
+
+    def _add(self, tokens: List[str], phrase: str, specialty: str, weight: float):
+        if not tokens:
+            return
+        variants = [tokens]
+        last = tokens[-1]
+        # Plural forms of the last word ("palpitations", "moles", "kids")
+        if not last.endswith("s"):
+            variants.append(tokens[:-1] + [last + "s"])
+        elif len(last) > 3:
+            variants.append(tokens[:-1] + [last + "es"])
+        for variant in variants:
+            node = self._root
+            for token in variant:
+                node = node.setdefault(token, {})
+            hits = node.setdefault(None, [])
+            # "orthopedics" is both a phrase and the plural of "orthopedic"; count it once
+            if not any(hit[1] == specialty and hit[2] >= weight for hit in hits):
+                hits.append((phrase, specialty, weight))
+
+    def matches(self, text: str) -> List[Tuple[str, str, float]]:
+        """(phrase, specialty, weight) for each leftmost-longest phrase match in text"""
+        tokens = tokenize(text)
+        found = []
+        index = 0
+        while index < len(tokens):
+            node, end, hits = self._root, index, None
+            for position in range(index, len(tokens)):
+                node = node.get(tokens[position])
+                if node is None:
+                    break
+                if None in node:
+                    end, hits = position + 1, node[None]
+            if hits:
+                found.extend(hits)
+                index = end
+            else:
+                index += 1
+        return found
+
+    def resolve(self, text: str) -> SpecialtyMatch:
+        """Best specialty for text with a 0..1 confidence; specialty is None when nothing matched"""
+        scores: Dict[str, float] = {}
+        seen = set()
+        terms = []
+        for phrase, specialty, weight in self.matches(text):
+            if (phrase, specialty) in seen:
+                continue  # repeating a word is not more evidence
+            seen.add((phrase, specialty))
+            scores[specialty] = scores.get(specialty, 0.0) + weight
+            terms.append(phrase)
+        if not scores:
+            return SpecialtyMatch(None, 0.0, ())
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        best, top = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        # Strong evidence that clearly beats the next specialty; a lone symptom or body part ("heart", "knee") is not strong
+        strength = 1.0 if round(top, 6) >= DECISIVE_WEIGHT else top * UNDECIDED_SCALE
+        confidence = strength * (top - runner_up) / top
+        return SpecialtyMatch(best, round(confidence, 3), tuple(terms))
+
+
+_default_resolver = SpecialtyResolver()
+
+
+def resolve_specialty(text: str) -> SpecialtyMatch:
+    return _default_resolver.resolve(text)
+
+
+def normalize_specialty(text: str) -> str:
+    """Canonical specialty for text, General Practitioner when nothing matches"""
+    return resolve_specialty(text).specialty or DEFAULT_SPECIALTY
@@ -0,0 +1,258 @@
+import abc
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Selected with STATE_BACKEND=memory|sqlite|redis
+DEFAULT_STATE_BACKEND = "memory"
+DEFAULT_SQLITE_PATH = "health_state.db"
+DEFAULT_REDIS_URL = "redis://localhost:6379/0"
+
+
+class StateBackend(abc.ABC):
+    """Namespaced key-value store for HealthAgent state; values must be JSON-serializable"""
+
+    @abc.abstractmethod
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        """Value at key, or default if it is missing or expired"""
+
+    @abc.abstractmethod
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        """Store value at key, expiring after ttl seconds if given"""
+
+    @abc.abstractmethod
+    def delete(self, namespace: str, key: str):
+        """Remove key, whether it holds a value or an appended list"""
+
+    @abc.abstractmethod
+    def items(self, namespace: str) -> List[Tuple[str, Any]]:
+        """Every live (key, value) pair in namespace"""
+
+    @abc.abstractmethod
+    def append(self, namespace: str, key: str, value: Any, max_items: Optional[int] = None, ttl: Optional[float] = None):
+        """Append to the list stored at key, keeping at most the newest max_items; ttl restarts the list's expiry
+
+        The list is an ordinary value: get() and items() return it, and set() or delete() replace it.
+        """
+
+    def get_list(self, namespace: str, key: str) -> List[Any]:
+        """The list appended at key, or [] if there is none"""
+        return list(self.get(namespace, key, []))
+
+    @abc.abstractmethod
+    def purge_expired(self) -> int:
+        """Drop every expired entry in every namespace; returns how many were dropped"""
+
+
+class MemoryStateBackend(StateBackend):
+    """Process-local state; the default, and what the agent used before backends existed"""
+
+    def __init__(self):
+        self._data: Dict[str, Dict[str, Tuple[Any, Optional[float]]]] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, namespace: str, key: str) -> Optional[Tuple[Any, Optional[float]]]:
+        entry = self._data.get(namespace, {}).get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.time():
+            del self._data[namespace][key]
+            return None
+        return entry
+
+    def get(self, namespace, key, default=None):
+        with self._lock:
+            entry = self._live(namespace, key)
+            return default if entry is None else entry[0]
+
+    def set(self, namespace, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data.setdefault(namespace, {})[key] = (value, expires_at)
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._data.get(namespace, {}).pop(key, None)
+
+    def items(self, namespace):
+        with self._lock:
+            keys = list(self._data.get(namespace, {}))
+            return [(key, entry[0]) for key in keys if (entry := self._live(namespace, key)) is not None]
+
+    def append(self, namespace, key, value, max_items=None, ttl=None):
+        with self._lock:
+            entry = self._live(namespace, key)
+            values = list(entry[0]) if entry else []
+            values.append(value)
+            if max_items is not None:
+                values = values[-max_items:]
+            expires_at = time.time() + ttl if ttl else (entry[1] if entry else None)
+            self._data.setdefault(namespace, {})[key] = (values, expires_at)
+
+    def purge_expired(self):
+        now = time.time()
+        purged = 0
+        with self._lock:
+            for entries in self._data.values():
+                expired = [key for key, (_, expires_at) in entries.items() if expires_at is not None and expires_at <= now]
+                for key in expired:
+                    del entries[key]
+                purged += len(expired)
+        return purged
+
+
+class SQLiteStateBackend(StateBackend):
+    """State in a local SQLite file in WAL mode, shared by every agent process on the machine"""
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS agent_state ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+
+    def get(self, namespace, key, default=None):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM agent_state WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, key, time.time()),
+            ).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def set(self, namespace, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO agent_state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), expires_at),
+            )
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM agent_state WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def items(self, namespace):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM agent_state WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+                (namespace, now),
+            )
+            rows = self._conn.execute(
+                "SELECT key, value FROM agent_state WHERE namespace = ?", (namespace,)
+            ).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def append(self, namespace, key, value, max_items=None, ttl=None):
+        with self._lock:
+            # IMMEDIATE takes the write lock up front so concurrent appends from other processes serialize
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM agent_state WHERE namespace = ? AND key = ?",
+                    (namespace, key),
+                ).fetchone()
+                live = row is not None and (row[1] is None or row[1] > time.time())
+                values = json.loads(row[0]) if live else []
+                values.append(value)
+                if max_items is not None:
+                    values = values[-max_items:]
+                expires_at = time.time() + ttl if ttl else (row[1] if live else None)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO agent_state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (namespace, key, json.dumps(values), expires_at),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def purge_expired(self):
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM agent_state WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+            )
+        return cursor.rowcount
+
+
+class RedisStateBackend(StateBackend):
+    """State in a Redis-compatible server (Redis, Valkey, KeyDB, ...)"""
+
+    def __init__(self, url: str = DEFAULT_REDIS_URL, prefix: str = "healthagent"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("STATE_BACKEND=redis needs the 'redis' package: pip install redis") from e
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}:{namespace}:{key}"
+
+    @staticmethod
+    def _ttl_ms(ttl: float) -> int:
+        # Millisecond expiry, rounded up so sub-second TTLs neither vanish at once nor never expire
+        return max(1, math.ceil(ttl * 1000))
+
+    def get(self, namespace, key, default=None):
+        value = self._redis.get(self._key(namespace, key))
+        return default if value is None else json.loads(value)
+
+    def set(self, namespace, key, value, ttl=None):
+        self._redis.set(self._key(namespace, key), json.dumps(value), px=self._ttl_ms(ttl) if ttl else None)
+
+    def delete(self, namespace, key):
+        self._redis.delete(self._key(namespace, key))
+
+    def items(self, namespace):
+        prefix = self._key(namespace, "")
+        result = []
+        for redis_key in self._redis.scan_iter(match=prefix + "*"):
+            value = self._redis.get(redis_key)
+            if value is not None:
+                result.append((redis_key[len(prefix):], json.loads(value)))
+        return result
+
+    def append(self, namespace, key, value, max_items=None, ttl=None):
+        # The list is a JSON value at the key itself, as in the other backends, so get() and items() see it;
+        # WATCH retries the read-modify-write if another process appends in between
+        redis_key = self._key(namespace, key)
+
+        def update(pipe):
+            current = pipe.get(redis_key)
+            values = json.loads(current) if current is not None else []
+            values.append(value)
+            if max_items is not None:
+                values = values[-max_items:]
+            pipe.multi()
+            if ttl:
+                pipe.set(redis_key, json.dumps(values), px=self._ttl_ms(ttl))
+            else:
+                pipe.set(redis_key, json.dumps(values), keepttl=current is not None)
+
+        self._redis.transaction(update, redis_key)
+
+    def purge_expired(self):
+        return 0  # Redis expires keys itself
+
+
+def create_state_backend(kind: str = None) -> StateBackend:
+    """Build the backend selected by STATE_BACKEND (memory, sqlite or redis)"""
+    kind = (kind or os.getenv("STATE_BACKEND", DEFAULT_STATE_BACKEND)).strip().lower()
+    if kind == "memory":
+        return MemoryStateBackend()
+    if kind == "sqlite":
+        return SQLiteStateBackend(os.getenv("STATE_SQLITE_PATH", DEFAULT_SQLITE_PATH))
+    if kind == "redis":
+        return RedisStateBackend(os.getenv("STATE_REDIS_URL", DEFAULT_REDIS_URL))
+    raise ValueError(f"Unknown STATE_BACKEND '{kind}' (expected memory, sqlite or redis)")
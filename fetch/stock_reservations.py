@@ -0,0 +1,62 @@
+import asyncio
+import time
+from typing import Dict, Optional, Tuple
+from uuid import uuid4
+
+RESERVATION_TTL = 30  # seconds a hold survives if its order never completes
+
+
+class StockReservations:
+    """Short-lived in-memory holds on catalog stock while orders are written.
+
+    Concurrent buyers are checked against stock minus everyone else's holds, so a medicine
+    that is already spoken for fails locally instead of costing a canister update call.
+    Writes for one medicine go out one at a time, each carrying the version the previous
+    one returned.
+    """
+
+    def __init__(self, ttl: float = RESERVATION_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._holds: Dict[str, Tuple[str, int, float]] = {}  # hold_id -> (medicine_id, quantity, expires_at)
+        self._held: Dict[str, int] = {}  # medicine_id -> quantity held
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _expire(self):
+        now = self._clock()
+        for hold_id in [hold_id for hold_id, (_, _, expires_at) in self._holds.items() if expires_at <= now]:
+            self.release(hold_id)
+
+    def held(self, medicine_id: str) -> int:
+        self._expire()
+        return self._held.get(medicine_id, 0)
+
+    def available(self, medicine_id: str, stock: int) -> int:
+        return max(0, int(stock or 0) - self.held(medicine_id))
+
+    def reserve(self, medicine_id: str, stock: int, quantity: int) -> Optional[str]:
+        """Hold quantity units; None when stock minus existing holds cannot cover it"""
+        if quantity <= 0 or self.available(medicine_id, stock) < quantity:
+            return None
+        hold_id = str(uuid4())
+        self._holds[hold_id] = (medicine_id, quantity, self._clock() + self.ttl)
+        self._held[medicine_id] = self._held.get(medicine_id, 0) + quantity
+        return hold_id
+
+    def release(self, hold_id: str):
+        """Drop a hold, whether its order was written or abandoned"""
+        hold = self._holds.pop(hold_id, None)
+        if hold is None:
+            return
+        medicine_id, quantity, _ = hold
+        remaining = self._held.get(medicine_id, 0) - quantity
+        if remaining > 0:
+            self._held[medicine_id] = remaining
+        else:
+            self._held.pop(medicine_id, None)
+
+    def write_lock(self, medicine_id: str) -> asyncio.Lock:
+        lock = self._locks.get(medicine_id)
+        if lock is None:
+            lock = self._locks[medicine_id] = asyncio.Lock()
+        return lock
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+
+from admission import ChatAdmission
+
+
+def test_released_slot_admits_other_users_while_the_user_waits():
+    async def scenario():
+        admission = ChatAdmission(max_concurrent=1, max_queued=4)
+        waiting = asyncio.Event()
+        finish_wait = asyncio.Event()
+        order = []
+
+        async def long_wait_chat():
+            async with admission.admit("u1") as ticket:
+                ticket.release_slot()  # about to wait on a sub-agent
+                waiting.set()
+                await finish_wait.wait()
+                order.append("u1 done")
+
+        async def other_user_chat():
+            await waiting.wait()
+            async with admission.admit("u2"):
+                order.append("u2 served")
+
+        async def same_user_chat():
+            await waiting.wait()
+            async with admission.admit("u1"):
+                order.append("u1 second")
+
+        tasks = [asyncio.create_task(coroutine) for coroutine in (long_wait_chat(), other_user_chat(), same_user_chat())]
+        await asyncio.sleep(0.01)
+        # The other user got the only slot; the user's own next message still waits its turn
+        assert order == ["u2 served"]
+        assert admission.stats()["running"] == 0
+        finish_wait.set()
+        await asyncio.gather(*tasks)
+        assert order == ["u2 served", "u1 done", "u1 second"]
+        stats = admission.stats()
+        assert (stats["running"], stats["queued"], stats["users"]) == (0, 0, 0)
+
+    asyncio.run(scenario())
+
+
+def test_other_user_finishes_while_a_backend_call_is_pending():
+    async def scenario():
+        admission = ChatAdmission(max_concurrent=2, max_queued=4)
+        backend_answers = threading.Event()
+        order = []
+
+        async def slow_backend_chat():
+            async with admission.admit("u1"):
+                # A blocking requests call to the canister, run in a thread as agent.py does
+                answered = await asyncio.to_thread(backend_answers.wait, 5)
+                order.append(("u1 done", answered))
+
+        async def other_user_chat():
+            await asyncio.sleep(0.01)
+            async with admission.admit("u2"):
+                order.append("u2 served")
+            backend_answers.set()
+
+        await asyncio.gather(slow_backend_chat(), other_user_chat())
+        assert order == ["u2 served", ("u1 done", True)]
+
+    asyncio.run(scenario())
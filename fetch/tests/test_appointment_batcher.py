@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+from appointment_batcher import AppointmentBatcher
+
+
+def appointment(appointment_id, slot_time, doctor_id="doc_1"):
+    return {"appointment_id": appointment_id, "doctor_id": doctor_id,
+            "appointment_date": "2026-03-10", "appointment_time": slot_time}
+
+
+def stored(appointments):
+    return [{"appointment_id": a["appointment_id"], "success": True, "conflict": False} for a in appointments]
+
+
+def test_concurrent_bookings_share_one_write():
+    calls = []
+
+    def write_batch(appointments):
+        calls.append([a["appointment_id"] for a in appointments])
+        return stored(appointments)
+
+    async def scenario():
+        batcher = AppointmentBatcher(write_batch, max_delay=0.05)
+        return await asyncio.gather(*(batcher.submit(appointment(f"apt_{i}", f"{9 + i}:00")) for i in range(5)))
+
+    results = asyncio.run(scenario())
+    assert calls == [["apt_0", "apt_1", "apt_2", "apt_3", "apt_4"]]
+    assert [result["appointment_id"] for result in results] == ["apt_0", "apt_1", "apt_2", "apt_3", "apt_4"]
+
+
+def test_same_slot_in_one_batch_loses_without_a_write():
+    calls = []
+
+    def write_batch(appointments):
+        calls.append(len(appointments))
+        return stored(appointments)
+
+    async def scenario():
+        batcher = AppointmentBatcher(write_batch, max_delay=0.05)
+        return await asyncio.gather(batcher.submit(appointment("apt_1", "09:00")),
+                                    batcher.submit(appointment("apt_2", "09:00")),
+                                    batcher.submit(appointment("apt_3", "09:00", doctor_id="doc_2")))
+
+    first, second, other_doctor = asyncio.run(scenario())
+    assert first["success"] and other_doctor["success"]
+    assert not second["success"] and second["conflict"]
+    assert calls == [2]
+
+
+def test_full_batches_do_not_wait_and_bookings_during_a_write_form_the_next_one():
+    calls = []
+
+    def write_batch(appointments):
+        calls.append(len(appointments))
+        time.sleep(0.05)
+        return stored(appointments)
+
+    async def scenario():
+        batcher = AppointmentBatcher(write_batch, max_batch_size=2, max_delay=5)
+        started = time.monotonic()
+        results = await asyncio.gather(*(batcher.submit(appointment(f"apt_{i}", f"{9 + i}:00")) for i in range(4)))
+        return results, time.monotonic() - started, batcher.batches
+
+    results, elapsed, batches = asyncio.run(scenario())
+    assert calls == [2, 2] and batches == 2
+    assert all(result["success"] for result in results)
+    assert elapsed < 1  # never waited out max_delay
+
+
+def test_failed_write_fails_every_booking_in_the_batch():
+    def write_batch(appointments):
+        raise ConnectionError("canister unreachable")
+
+    async def scenario():
+        batcher = AppointmentBatcher(write_batch)
+        return await asyncio.gather(batcher.submit(appointment("apt_1", "09:00")),
+                                    batcher.submit(appointment("apt_2", "10:00")))
+
+    results = asyncio.run(scenario())
+    assert all(not result["success"] and not result["conflict"] for result in results)
+    assert "canister unreachable" in results[0]["message"]
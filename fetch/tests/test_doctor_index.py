@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from doctor_index import DoctorIndex, parse_earliest_slot
+from doctor_schedule import SlotScheduler
+
+DOCTOR = {
+    "doctor_id": "doc_1", "name": "Dr. Heart", "specialty": "cardiology", "rating": 4.8, "experience_years": 12,
+    "available_days": ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"],
+    "available_slots": ["09:00", "11:00", "14:00", "16:00"],
+}
+
+
+def test_timezone_aware_slot_becomes_naive_local_time():
+    utc = datetime(2026, 3, 10, 9, 0, tzinfo=timezone.utc)
+    assert parse_earliest_slot("2026-03-10T09:00Z") == utc.astimezone().replace(tzinfo=None)
+    assert parse_earliest_slot("2026-03-10T09:00+00:00").tzinfo is None
+    assert parse_earliest_slot("2026-03-10 09:00") == datetime(2026, 3, 10, 9, 0)
+
+
+def test_malformed_slot_raises_a_clear_error():
+    with pytest.raises(ValueError, match="Invalid earliest_slot 'next tuesday'"):
+        parse_earliest_slot("next tuesday")
+
+
+def test_search_accepts_timezone_aware_earliest_slot():
+    index = DoctorIndex()
+    index.load([DOCTOR], 1)
+    tomorrow = (datetime.now(timezone.utc) + timedelta(days=1)).replace(microsecond=0).isoformat()
+
+    page, total, _ = index.search("cardiology", SlotScheduler(), earliest_slot=tomorrow)
+    assert total == 1
+    assert page[0]["next_free_slot"]
+
+
+def cardiologist(doctor_id, rating, experience_years=10, available_days=None):
+    return dict(DOCTOR, doctor_id=doctor_id, rating=rating, experience_years=experience_years,
+                available_days=available_days or DOCTOR["available_days"])
+
+
+def test_rank_prefers_free_capacity_and_skips_fully_booked_doctors():
+    now = datetime(2026, 3, 9, 8, 0)  # a Monday
+    scheduler = SlotScheduler(horizon_days=2)
+    busy, free, full = cardiologist("doc_busy", 4.9), cardiologist("doc_free", 4.7), cardiologist("doc_full", 5.0)
+    scheduler.load_appointments([
+        {"appointment_id": f"{doctor_id}_{day}_{time_}", "doctor_id": doctor_id, "appointment_date": day,
+         "appointment_time": time_, "status": "confirmed"}
+        for doctor_id, days in (("doc_busy", ["2026-03-09", "2026-03-10"]), ("doc_full", ["2026-03-09", "2026-03-10", "2026-03-11"]))
+        for day in days for time_ in DOCTOR["available_slots"][:3 if doctor_id == "doc_busy" else 4]
+    ])
+
+    ranked = DoctorIndex().rank([busy, free, full], scheduler, now=now)
+    assert [doctor["doctor_id"] for _, doctor, _ in ranked] == ["doc_free", "doc_busy"]
+    assert ranked[0][2] == ("2026-03-09", "09:00")
+    assert ranked[1][2] == ("2026-03-09", "16:00")
+
+
+def test_index_groups_by_specialty_and_reloads_on_version_or_age():
+    clock = [1000.0]
+    index = DoctorIndex(max_age=60, clock=lambda: clock[0])
+    index.load([cardiologist("doc_1", 4.8), dict(DOCTOR, doctor_id="doc_2", specialty="Dermatology"), {"name": "no id"}], 3)
+
+    assert len(index) == 2
+    assert [doctor["doctor_id"] for doctor in index.doctors_for("Cardiology")] == ["doc_1"]
+    assert not index.needs_reload(3)
+    assert index.needs_reload(4) and index.needs_reload(None)
+    clock[0] += 61
+    assert index.needs_reload(3)
+
+
+def test_search_filters_and_pages_by_rating_with_continuation_tokens():
+    index = DoctorIndex()
+    index.load([cardiologist(f"doc_{i}", rating) for i, rating in enumerate([4.1, 4.9, 4.5, 3.2, 4.9])]
+               + [cardiologist("doc_weekend", 4.8, available_days=["Saturday"])], 1)
+    scheduler = SlotScheduler()
+
+    page, total, token = index.search("cardiology", scheduler, min_rating=4.0, max_results=2)
+    assert total == 5
+    assert [doctor["doctor_id"] for doctor in page] == ["doc_1", "doc_4"]
+    page, _, token = index.search("cardiology", scheduler, min_rating=4.0, max_results=2, continuation_token=token)
+    assert [doctor["doctor_id"] for doctor in page] == ["doc_weekend", "doc_2"]
+    page, _, token = index.search("cardiology", scheduler, min_rating=4.0, max_results=2, continuation_token=token)
+    assert [doctor["doctor_id"] for doctor in page] == ["doc_0"] and token is None
+
+    page, total, _ = index.search("cardiology", scheduler, available_day="2026-03-14")  # a Saturday
+    assert total == 6
+    page, total, _ = index.search("cardiology", scheduler, available_day="Monday")
+    assert "doc_weekend" not in [doctor["doctor_id"] for doctor in page] and total == 5
+
+
+def test_search_rejects_a_tampered_continuation_token():
+    index = DoctorIndex()
+    index.load([DOCTOR], 1)
+    with pytest.raises(ValueError, match="Invalid continuation token"):
+        index.search("cardiology", SlotScheduler(), continuation_token="not-a-token")
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from doctor_schedule import SlotScheduler
+
+DOCTOR = {"doctor_id": "doc_1", "available_days": ["Monday", "Tuesday"], "available_slots": ["09:00", "14:00", "17:30"]}
+MONDAY_MORNING = datetime(2026, 3, 9, 8, 0)
+
+
+def test_concurrent_reservations_get_distinct_slots():
+    scheduler = SlotScheduler()
+    slots = [scheduler.reserve(DOCTOR, now=MONDAY_MORNING) for _ in range(4)]
+    assert slots == [("2026-03-09", "09:00"), ("2026-03-09", "14:00"), ("2026-03-09", "17:30"), ("2026-03-10", "09:00")]
+
+
+def test_preferences_pick_day_part_and_weekday():
+    scheduler = SlotScheduler()
+    assert scheduler.next_free_slot(DOCTOR, "tuesday afternoon", now=MONDAY_MORNING) == ("2026-03-10", "14:00")
+    assert scheduler.next_free_slot(DOCTOR, "around 5pm tomorrow", now=MONDAY_MORNING) == ("2026-03-10", "17:30")
+    # Urgent bookings ignore the requested day and take the earliest slot
+    assert scheduler.next_free_slot(DOCTOR, "next week", urgency="urgent", now=MONDAY_MORNING) == ("2026-03-09", "09:00")
+
+
+def test_same_day_slots_need_the_minimum_lead_time():
+    scheduler = SlotScheduler(min_lead_minutes=30)
+    assert scheduler.next_free_slot(DOCTOR, now=datetime(2026, 3, 9, 8, 45)) == ("2026-03-09", "14:00")
+
+
+def test_reload_keeps_unconfirmed_holds_and_drops_cancelled_appointments():
+    scheduler = SlotScheduler()
+    assert scheduler.hold("doc_1", "2026-03-09", "09:00")
+    assert not scheduler.hold("doc_1", "2026-03-09", "09:00")
+    scheduler.load_appointments([
+        {"appointment_id": "apt_1", "doctor_id": "doc_1", "appointment_date": "2026-03-09", "appointment_time": "14:00", "status": "confirmed"},
+        {"appointment_id": "apt_1", "doctor_id": "doc_1", "appointment_date": "2026-03-09", "appointment_time": "14:00", "status": "cancelled"},
+    ])
+    assert not scheduler.is_free("doc_1", "2026-03-09", "09:00")
+    assert scheduler.is_free("doc_1", "2026-03-09", "14:00")
+
+    scheduler.release("doc_1", "2026-03-09", "09:00")
+    assert scheduler.is_free("doc_1", "2026-03-09", "09:00")
@@ -0,0 +1,40 @@
+import pytest
+
+from emergency import detect_emergency
+
+
+@pytest.mark.parametrize("message", [
+    "I need a non-emergency appointment",
+    "update my emergency contact",
+    "order my seizure medication",
+    "I had a stroke last year, book a neurologist",
+    "remind me to take my stroke prevention pill at 8pm",
+    "what is the overdose limit for paracetamol",
+    "my dad passed out yesterday, log symptoms",
+    "this is not an emergency, but my knee hurts",
+    "what are the signs of a heart attack?",
+    "I don't think I'm having a heart attack, just heartburn",
+    "I would never kill myself",
+    "I don't want to end my life, I just feel low",
+    "I'm not going to kill myself but I need to talk to someone",
+    "I no longer want to kill myself",
+])
+def test_ordinary_messages_are_not_emergencies(message):
+    assert detect_emergency(message) is None
+
+
+@pytest.mark.parametrize("message", [
+    "I can't breathe",
+    "i think i'm having a heart attack",
+    "I’m having severe chest pain right now",
+    "I have chest pain and my left arm is numb",
+    "call an ambulance please",
+    "my throat is closing",
+    "I want to kill myself",
+    "I just took too many pills",
+    "help, this is an emergency",
+    "No, I can't breathe",
+    "I'm not okay. I want to kill myself",
+])
+def test_acute_first_person_messages_are_emergencies(message):
+    assert detect_emergency(message)
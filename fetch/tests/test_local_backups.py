@@ -0,0 +1,34 @@
+from local_backups import normalize_entry, unconfirmed_entries
+from state_backend import MemoryStateBackend
+
+# get-symptom-history and get-reminders entries as the canister serializes them
+CANISTER_SYMPTOM = {"3_088_518_058": "headache and fever", "2_781_795_542": "2026-03-10T08:00:00Z", "1_869_947_023": "u1"}
+CANISTER_REMINDER = {"1_962_253_242": "aspirin", "1_291_635_725": "8pm", "1_779_848_746": "2026-03-10T08:00:00Z",
+                     "1_869_947_023": "u1", "373_703_110": True}
+
+
+def test_normalize_maps_hash_keys():
+    assert normalize_entry(CANISTER_SYMPTOM) == {"symptoms": "headache and fever", "timestamp": "2026-03-10T08:00:00Z", "user_id": "u1"}
+    assert normalize_entry(CANISTER_REMINDER)["medicine"] == "aspirin"
+    named = {"symptoms": "cough", "timestamp": "t"}
+    assert normalize_entry(named) is named
+
+
+def test_backups_confirmed_by_canister_shaped_history_are_dropped():
+    backend = MemoryStateBackend()
+    confirmed_locally = {"symptoms": "headache and fever", "timestamp": "2026-03-10T08:00:00Z", "user_id": "u1"}
+    still_missing = {"symptoms": "cough", "timestamp": "2026-03-11T08:00:00Z", "user_id": "u1"}
+    backend.append("symptoms", "u1", confirmed_locally)
+    backend.append("symptoms", "u1", still_missing)
+
+    assert unconfirmed_entries(backend, "symptoms", "u1", [CANISTER_SYMPTOM]) == [still_missing]
+    assert backend.get_list("symptoms", "u1") == [still_missing]
+
+
+def test_reminder_backups_match_canister_shaped_reminders():
+    backend = MemoryStateBackend()
+    backend.append("reminders", "u1", {"medicine": "aspirin", "time": "8pm", "created_at": "2026-03-10T08:00:00Z",
+                                       "user_id": "u1", "active": True})
+
+    assert unconfirmed_entries(backend, "reminders", "u1", [CANISTER_REMINDER]) == []
+    assert backend.get_list("reminders", "u1") == []
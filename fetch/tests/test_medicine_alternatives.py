@@ -0,0 +1,46 @@
+from medicine_alternatives import AlternativesGraph, relation_key
+
+
+def medicine(medicine_id, stock, price, active_ingredient="", generic_name="", category=""):
+    return {"medicine_id": medicine_id, "stock": stock, "price": price, "active_ingredient": active_ingredient,
+            "generic_name": generic_name, "category": category}
+
+
+def graph():
+    alternatives = AlternativesGraph()
+    for entry in [
+        medicine("panadol", 0, 3.0, "Paracetamol 500mg", "paracetamol", "analgesic"),
+        medicine("calpol", 40, 4.0, "paracetamol", "paracetamol", "analgesic"),
+        medicine("tylenol", 10, 2.5, "Paracetamol 650 mg", "acetaminophen", "analgesic"),
+        medicine("generic_para", 2, 1.0, "paracetamol", "paracetamol", "analgesic"),
+        medicine("ibuprofen", 50, 1.5, "ibuprofen", "ibuprofen", "analgesic"),
+        medicine("cetirizine", 30, 1.0, "cetirizine", "cetirizine", "antihistamine"),
+    ]:
+        alternatives.put(entry)
+    return alternatives
+
+
+def test_strongest_relation_first_then_cheapest():
+    assert graph().alternatives("panadol") == [
+        ("generic_para", "active_ingredient"), ("tylenol", "active_ingredient"), ("calpol", "active_ingredient"),
+    ]
+    assert graph().alternatives("panadol", limit=5)[3:] == [("ibuprofen", "category")]
+
+
+def test_substitutes_must_cover_the_quantity():
+    assert graph().alternatives("panadol", quantity=20) == [("calpol", "active_ingredient"), ("ibuprofen", "category")]
+
+
+def test_stock_changes_move_a_medicine_in_or_out_of_its_groups():
+    alternatives = graph()
+    alternatives.put(medicine("generic_para", 0, 1.0, "paracetamol", "paracetamol", "analgesic"))
+    alternatives.remove("tylenol")
+    assert alternatives.alternatives("panadol", limit=2) == [("calpol", "active_ingredient"), ("ibuprofen", "category")]
+    assert alternatives.alternatives("unknown") == []
+    assert len(alternatives) == 5
+
+
+def test_relation_keys_ignore_doses_except_for_categories():
+    assert relation_key({"active_ingredient": "Paracetamol 500 mg"}, "active_ingredient") == "paracetamol"
+    assert relation_key({"category": "Vitamin D 1000"}, "category") == "vitamin d 1000"
+    assert relation_key({}, "generic_name") is None
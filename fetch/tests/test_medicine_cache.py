@@ -0,0 +1,45 @@
+from medicine_cache import MedicineCache
+
+INVENTORY = {"medicine": {"medicine_id": "med_1", "stock": 10}, "version": 4}
+
+
+def test_entries_are_served_until_a_newer_version_is_known():
+    cache = MedicineCache()
+    assert cache.get("med_1") is None
+    cache.put("med_1", INVENTORY, 4)
+
+    assert cache.get("med_1", min_version=4) is INVENTORY
+    assert cache.get("med_1", min_version=5) is None  # the catalog saw a later write
+    assert cache.get("med_1") is None  # and the stale entry is gone
+    cache.put("med_1", INVENTORY, None)
+    assert cache.get("med_1", min_version=1) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 4
+
+
+def test_change_feed_and_own_orders_evict():
+    cache = MedicineCache()
+    for medicine_id in ("med_1", "med_2", "med_3"):
+        cache.put(medicine_id, INVENTORY, 4)
+
+    cache.apply({"medicines": [{"medicine_id": "med_1"}], "removed": ["med_2"], "version": 9})
+    cache.invalidate("med_3")
+    assert len(cache) == 0 and cache.stats()["invalidations"] == 3
+
+    cache.put("med_1", INVENTORY, 4)
+    cache.apply({"error": "canister unavailable"})
+    assert len(cache) == 1
+    cache.apply({"medicines": [], "full": True, "version": 10})
+    assert len(cache) == 0
+
+
+def test_least_recently_used_and_expired_entries_are_dropped():
+    clock = [0.0]
+    cache = MedicineCache(max_entries=2, max_age=60, clock=lambda: clock[0])
+    cache.put("med_1", INVENTORY, 1)
+    cache.put("med_2", INVENTORY, 1)
+    cache.get("med_1")
+    cache.put("med_3", INVENTORY, 1)
+    assert cache.get("med_2") is None and cache.get("med_1") is INVENTORY
+
+    clock[0] = 61
+    assert cache.get("med_3") is None
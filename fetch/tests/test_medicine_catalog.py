@@ -0,0 +1,95 @@
+from medicine_catalog import MedicineCatalog
+
+
+def full_catalog(version, medicine_versions):
+    return {
+        "medicines": [{"medicine_id": medicine_id, "name": medicine_id, "stock": 10} for medicine_id in medicine_versions],
+        "versions": [{"medicine_id": medicine_id, "version": v} for medicine_id, v in medicine_versions.items()],
+        "removed": [],
+        "version": version,
+        "full": True,
+    }
+
+
+def test_conflict_adopts_the_canister_version():
+    catalog = MedicineCatalog()
+    catalog.apply(full_catalog(7, {"med_1": 3}))
+
+    assert catalog.adopt_version("med_1", 9)
+    assert catalog.version_of("med_1") == 9
+    assert catalog.dirty
+    assert not catalog.needs_full_reload()
+
+
+def test_version_going_backwards_forces_a_full_reload():
+    catalog = MedicineCatalog()
+    catalog.apply(full_catalog(7, {"med_1": 5}))
+
+    # The canister lost its per-medicine versions (e.g. across an upgrade) and answers 0
+    assert not catalog.adopt_version("med_1", 0)
+    assert catalog.version_of("med_1") == 0
+    assert catalog.needs_full_reload()
+
+    catalog.apply(full_catalog(8, {"med_1": 8}))
+    assert not catalog.needs_full_reload()
+    assert catalog.version_of("med_1") == 8
+
+
+def medicine(medicine_id, name, generic_name="", stock=10, **fields):
+    return {"medicine_id": medicine_id, "name": name, "generic_name": generic_name, "stock": stock, **fields}
+
+
+def delta(version, medicines=(), removed=(), versions=None):
+    return {"medicines": list(medicines), "removed": list(removed), "version": version, "full": False,
+            "versions": [{"medicine_id": m, "version": v} for m, v in (versions or {}).items()]}
+
+
+def test_search_ranks_like_the_canister():
+    catalog = MedicineCatalog()
+    catalog.apply({**full_catalog(1, {}), "medicines": [
+        medicine("med_1", "Panadol Extra", "paracetamol"),
+        medicine("med_2", "Paracetamol 500mg", "paracetamol"),
+        medicine("med_3", "Paracetamol", "paracetamol"),
+        medicine("med_4", "Calpol", "paracetamol"),
+        medicine("med_5", "Ibuprofen", "ibuprofen"),
+    ]})
+
+    assert [m["medicine_id"] for m in catalog.search("Paracetamol")] == ["med_3", "med_2", "med_4", "med_1"]
+    assert [m["medicine_id"] for m in catalog.search("cetam")] == ["med_3", "med_2", "med_4", "med_1"]
+    # A query holding the whole name matches it too
+    assert [m["medicine_id"] for m in catalog.search("ibuprofen 400 tablets")] == ["med_5"]
+    assert catalog.search("   ") == []
+
+
+def test_deltas_update_rename_and_remove_medicines():
+    catalog = MedicineCatalog()
+    catalog.apply({**full_catalog(1, {}), "medicines": [medicine("med_1", "Amoxil", "amoxicillin"),
+                                                        medicine("med_2", "Zyrtec", "cetirizine")]})
+
+    assert catalog.apply(delta(2, [medicine("med_1", "Amoxicillin 250mg", "amoxicillin", stock=3)],
+                               removed=["med_2"], versions={"med_1": 2}))
+    assert catalog.version == 2 and len(catalog) == 1
+    assert catalog.search("zyrtec") == [] and catalog.search("amoxil") == []
+    assert catalog.get("med_1")["stock"] == 3 and catalog.version_of("med_1") == 2
+    assert catalog.version_of("med_2") is None
+
+
+def test_unusable_responses_and_old_replicas_need_a_full_reload():
+    clock = [0.0]
+    catalog = MedicineCatalog(max_age=60, clock=lambda: clock[0])
+    assert catalog.needs_full_reload()
+    assert not catalog.apply({"error": "canister unavailable"})
+    catalog.apply(full_catalog(1, {"med_1": 1}))
+    assert not catalog.needs_full_reload()
+    clock[0] = 61
+    assert catalog.needs_full_reload()
+
+
+def test_recorded_order_lowers_stock_without_a_refresh():
+    catalog = MedicineCatalog()
+    catalog.apply(full_catalog(1, {"med_1": 1}))
+    catalog.record_order("med_1", 4, version=5)
+    assert catalog.get("med_1")["stock"] == 6 and catalog.version_of("med_1") == 5 and not catalog.dirty
+
+    catalog.record_order("med_1", 1, version=None)  # the canister did not say which version it wrote
+    assert catalog.dirty
@@ -0,0 +1,47 @@
+from medicine_fuzzy import FuzzyNameIndex, damerau_levenshtein, deletes
+
+MEDICINES = [
+    {"medicine_id": "med_1", "name": "Paracetamol 500mg", "generic_name": "acetaminophen"},
+    {"medicine_id": "med_2", "name": "Ibuprofen", "generic_name": "ibuprofen"},
+    {"medicine_id": "med_3", "name": "Amoxicillin", "active_ingredient": "amoxicillin trihydrate"},
+    {"medicine_id": "med_4", "name": "Zyrtec", "generic_name": "cetirizine"},
+]
+
+
+def index():
+    fuzzy = FuzzyNameIndex()
+    for medicine in MEDICINES:
+        fuzzy.put(medicine)
+    return fuzzy
+
+
+def test_misspellings_within_the_allowed_distance_match():
+    fuzzy = index()
+    assert fuzzy.search("paracetmol")[0][:2] == ("med_1", 1)  # deletion
+    assert fuzzy.search("ibuprofne")[0][:2] == ("med_2", 1)  # transposition
+    assert fuzzy.search("amoxicilin")[0][:2] == ("med_3", 1)
+    assert fuzzy.search("acetaminofen")[0] == ("med_1", 2, "acetaminophen")  # two edits in a long word
+    assert fuzzy.search("zyrtek")[0][:2] == ("med_4", 1)
+
+
+def test_short_and_distant_words_do_not_match():
+    fuzzy = index()
+    assert fuzzy.search("zyr") == []  # three letters must match exactly
+    assert fuzzy.search("aspirin") == []
+    assert fuzzy.search("500") == []
+
+
+def test_removed_and_renamed_medicines_leave_the_index():
+    fuzzy = index()
+    fuzzy.remove("med_2")
+    assert fuzzy.search("ibuprofen") == []
+    fuzzy.put({"medicine_id": "med_4", "name": "Cetirizine"})
+    assert fuzzy.search("zyrtec") == []
+    assert [medicine_id for medicine_id, _, _ in fuzzy.search("cetirizin")] == ["med_4"]
+    assert len(fuzzy) == 3
+
+
+def test_distance_helpers():
+    assert damerau_levenshtein("ibuprofen", "ibuprofne", 2) == 1
+    assert damerau_levenshtein("ibuprofen", "paracetamol", 2) == 3
+    assert deletes("abc", 1) == {"bc", "ac", "ab"}
@@ -0,0 +1,130 @@
+import time
+
+from pending_requests import REQUEST_TIMEOUTS, PendingRequestRegistry
+from state_backend import MemoryStateBackend, SQLiteStateBackend
+
+
+def workers(backend):
+    return (PendingRequestRegistry(backend=backend, owner="worker-a"),
+            PendingRequestRegistry(backend=backend, owner="worker-b"))
+
+
+def test_only_the_owner_reports_a_timeout():
+    backend = MemoryStateBackend()
+    worker_a, worker_b = workers(backend)
+    worker_a.add("req_1", "doctor", user_sender="u1")
+    # worker-b sees the request when routing, e.g. a status lookup
+    assert "req_1" in worker_b
+
+    later = time.time() + 1000
+    assert worker_b.expire(now=later) == []
+    assert [request_id for request_id, _ in worker_a.expire(now=later)] == ["req_1"]
+
+
+def test_restarted_worker_only_loads_its_own_requests():
+    backend = MemoryStateBackend()
+    worker_a, worker_b = workers(backend)
+    worker_a.add("req_a", "doctor", user_sender="u1")
+    worker_b.add("req_b", "wellness", user_sender="u2")
+
+    restarted_b = PendingRequestRegistry(backend=backend, owner="worker-b")
+    assert [request_id for request_id, _ in restarted_b.items()] == ["req_b"]
+
+
+def test_response_handled_by_another_worker_is_not_reported():
+    backend = MemoryStateBackend()
+    worker_a, worker_b = workers(backend)
+    worker_a.add("req_1", "pharmacy_purchase", user_sender="u1")
+
+    # The sub-agent's response reached worker-b, which pops the shared record
+    assert worker_b.pop("req_1")["user_sender"] == "u1"
+    assert worker_a.expire(now=time.time() + 1000) == []
+    assert len(worker_a) == 0
+
+
+def test_backends_purge_expired_entries(tmp_path):
+    for backend in (MemoryStateBackend(), SQLiteStateBackend(str(tmp_path / "state.db"))):
+        backend.set("context", "idle_user", {"intent": "doctor"}, ttl=0.01)
+        backend.set("context", "active_user", {"intent": "wellness"}, ttl=60)
+        backend.set("agents", "agent1xyz", "DoctorAgent")
+        time.sleep(0.02)
+
+        assert backend.purge_expired() == 1
+        assert backend.get("context", "active_user") == {"intent": "wellness"}
+        assert backend.get("agents", "agent1xyz") == "DoctorAgent"
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_requests_expire_in_deadline_order_by_type():
+    clock = FakeClock()
+    registry = PendingRequestRegistry(timeouts={"doctor": 120, "wellness": 60}, clock=clock)
+    registry.add("req_doctor", "doctor", user_sender="u1")
+    registry.add("req_wellness", "wellness", user_sender="u1")
+
+    assert registry.expire(now=clock.now + 59) == []
+    assert [request_id for request_id, _ in registry.expire(now=clock.now + 60)] == ["req_wellness"]
+    assert [request_id for request_id, _ in registry.expire(now=clock.now + 120)] == ["req_doctor"]
+    assert len(registry) == 0 and registry.for_user("u1") == []
+
+
+def test_cart_requests_use_the_single_purchase_timeout():
+    clock = FakeClock()
+    registry = PendingRequestRegistry(clock=clock)
+    registry.add("req_cart", "pharmacy_cart", user_sender="u1")
+    assert registry.expire(now=clock.now + REQUEST_TIMEOUTS["pharmacy_purchase"] - 1) == []
+    assert [request_id for request_id, _ in registry.expire(now=clock.now + REQUEST_TIMEOUTS["pharmacy_purchase"])] == ["req_cart"]
+
+
+def test_answered_and_readded_requests_keep_only_their_live_deadline():
+    clock = FakeClock()
+    registry = PendingRequestRegistry(timeouts={"doctor": 100}, clock=clock)
+    registry.add("req_answered", "doctor", user_sender="u1")
+    registry.add("req_retried", "doctor", user_sender="u2")
+    assert registry.pop("req_answered")["user_sender"] == "u1"
+
+    clock.now += 50
+    registry.add("req_retried", "doctor", user_sender="u2")  # re-sent, so its deadline moves
+    assert registry.expire(now=clock.now + 60) == []
+    assert [request_id for request_id, _ in registry.expire(now=clock.now + 100)] == ["req_retried"]
+
+
+def test_full_registry_evicts_the_oldest_and_reports_it_on_the_next_sweep():
+    registry = PendingRequestRegistry(max_size=2)
+    registry.add("req_1", "doctor", user_sender="u1")
+    registry.add("req_2", "doctor", user_sender="u2")
+    registry.add("req_3", "doctor", user_sender="u3")
+
+    assert "req_1" not in registry and len(registry) == 2
+    assert [request_id for request_id, _ in registry.expire()] == ["req_1"]
+
+
+def test_heap_stays_bounded_while_requests_are_answered():
+    registry = PendingRequestRegistry()
+    for index in range(1000):
+        registry.add(f"req_{index}", "doctor", user_sender="u1")
+        registry.pop(f"req_{index}")
+    assert len(registry._expiry_heap) <= 64 + 2
+    assert registry.for_user("u1") == []
+
+
+def test_order_response_without_request_id_matches_the_users_own_order():
+    registry = PendingRequestRegistry()
+    registry.add("order_u1", "pharmacy_order", user_sender="u1", medicine="Paracetamol")
+    registry.add("order_u2", "pharmacy_order", user_sender="u2", medicine="paracetamol ")
+
+    assert registry.find_by_medicine("pharmacy_order", "PARACETAMOL", "u2") == "order_u2"
+    assert registry.find_by_medicine("pharmacy_check", "paracetamol", "u2") is None
+    # Without a user the response is ambiguous between the two orders
+    assert registry.find_by_medicine("pharmacy_order", "paracetamol") is None
+
+    registry.pop("order_u1")
+    assert registry.find_by_medicine("pharmacy_order", "paracetamol") == "order_u2"
+    registry.pop("order_u2")
+    assert registry.find_by_medicine("pharmacy_order", "paracetamol", "u2") is None
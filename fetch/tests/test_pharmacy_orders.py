@@ -0,0 +1,163 @@
+import asyncio
+import logging
+
+import pytest
+
+pytest.importorskip("uagents")  # pharmacy.py is a uAgents agent
+
+import pharmacy  # noqa: E402
+from medicine_cache import MedicineCache  # noqa: E402
+from medicine_catalog import MedicineCatalog  # noqa: E402
+from stock_reservations import StockReservations  # noqa: E402
+
+
+class Ctx:
+    logger = logging.getLogger("pharmacy-test")
+
+
+class FakeCanister:
+    """Answers the pharmacy's canister calls from a script of order results"""
+
+    def __init__(self, order_results, changes=None):
+        self.order_results = list(order_results)
+        self.changes = changes or {"medicines": [], "removed": [], "versions": [], "version": 1, "full": False}
+        self.calls = []
+
+    async def post(self, endpoint, data):
+        self.calls.append((endpoint, data))
+        await asyncio.sleep(0)
+        if endpoint in ("place-medicine-order", "place-medicine-orders"):
+            return self.order_results.pop(0)
+        if endpoint == "get-medicine-changes":
+            return self.changes
+        return {"error": f"unexpected call to {endpoint}"}
+
+    def orders(self):
+        return [data for endpoint, data in self.calls if endpoint.startswith("place-medicine-order")]
+
+
+def medicine(medicine_id, stock, version, **fields):
+    return {"medicine_id": medicine_id, "name": medicine_id, "stock": stock, "price": 2.0, **fields}, version
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    catalog = MedicineCatalog()
+    monkeypatch.setattr(pharmacy, "medicine_catalog", catalog)
+    monkeypatch.setattr(pharmacy, "stock_reservations", StockReservations())
+    monkeypatch.setattr(pharmacy, "medicine_cache", MedicineCache())
+    return catalog
+
+
+def load(catalog, *entries):
+    catalog.apply({"medicines": [m for m, _ in entries], "removed": [], "version": 1, "full": True,
+                   "versions": [{"medicine_id": m["medicine_id"], "version": v} for m, v in entries]})
+
+
+def install(monkeypatch, canister):
+    monkeypatch.setattr(pharmacy, "post_to_icp", canister.post)
+
+
+def test_conflict_refreshes_and_retries_with_the_new_version(catalog, monkeypatch):
+    load(catalog, medicine("med_1", stock=10, version=5))
+    restocked, _ = medicine("med_1", stock=20, version=7)
+    canister = FakeCanister(
+        [{"success": False, "conflict": True, "version": 7, "message": "Version conflict"},
+         {"success": True, "version": 8, "order_id": "ORD-1"}],
+        changes={"medicines": [restocked], "removed": [], "versions": [{"medicine_id": "med_1", "version": 7}],
+                 "version": 2, "full": False},
+    )
+    install(monkeypatch, canister)
+
+    result = asyncio.run(pharmacy.reserve_and_order(catalog.get("med_1"), 2, "u1", None, Ctx()))
+    assert result["order_id"] == "ORD-1"
+    assert [order["expected_version"] for order in canister.orders()] == [5, 7]
+    assert catalog.get("med_1")["stock"] == 18 and catalog.version_of("med_1") == 8
+    assert pharmacy.stock_reservations.held("med_1") == 0
+
+
+def test_repeated_conflicts_give_up_after_the_attempt_limit(catalog, monkeypatch):
+    load(catalog, medicine("med_1", stock=10, version=5))
+    canister = FakeCanister([{"success": False, "conflict": True, "version": 5}] * pharmacy.ORDER_ATTEMPTS)
+    install(monkeypatch, canister)
+
+    result = asyncio.run(pharmacy.reserve_and_order(catalog.get("med_1"), 1, "u1", None, Ctx()))
+    assert result == {"error": "Medicine is being updated, please try again"}
+    assert len(canister.orders()) == pharmacy.ORDER_ATTEMPTS
+    assert pharmacy.stock_reservations.held("med_1") == 0
+
+
+def test_concurrent_buyers_cannot_oversell_the_replica(catalog, monkeypatch):
+    load(catalog, medicine("med_1", stock=5, version=5))
+    canister = FakeCanister([{"success": True, "version": 6, "order_id": "ORD-1"}])
+    install(monkeypatch, canister)
+
+    async def scenario():
+        return await asyncio.gather(pharmacy.reserve_and_order(catalog.get("med_1"), 3, "u1", None, Ctx()),
+                                    pharmacy.reserve_and_order(catalog.get("med_1"), 3, "u2", None, Ctx()))
+
+    first, second = asyncio.run(scenario())
+    assert first["order_id"] == "ORD-1"
+    assert second["error"].startswith("Insufficient stock")
+    assert len(canister.orders()) == 1  # the second buyer failed without a canister call
+
+
+def cart_line(catalog, medicine_id, quantity):
+    entry = catalog.get(medicine_id)
+    return {"medicine_id": medicine_id, "medicine": entry, "price": entry["price"], "quantity": quantity,
+            "status": "available", "order_id": None, "total_price": None, "message": "", "suggested_alternatives": None}
+
+
+def test_cart_is_one_conditional_batch_with_one_version_per_medicine(catalog, monkeypatch):
+    load(catalog, medicine("med_1", stock=10, version=5), medicine("med_2", stock=10, version=9))
+    canister = FakeCanister([{"results": [
+        {"success": True, "version": 6, "order_id": "ORD-1"},
+        {"success": True, "version": 7, "order_id": "ORD-2"},
+        {"success": True, "version": 10, "order_id": "ORD-3", "order": {"total_price": 4.0}},
+    ], "placed_count": 3}])
+    install(monkeypatch, canister)
+    lines = [cart_line(catalog, "med_1", 1), cart_line(catalog, "med_1", 2), cart_line(catalog, "med_2", 2)]
+
+    asyncio.run(pharmacy.order_cart(lines, "u1", None, Ctx()))
+    [order] = canister.orders()
+    assert order["lines"] == [{"medicine_id": "med_1", "quantity": 1, "expected_version": 5},
+                              {"medicine_id": "med_1", "quantity": 2},
+                              {"medicine_id": "med_2", "quantity": 2, "expected_version": 9}]
+    assert [line["status"] for line in lines] == ["confirmed"] * 3
+    assert [line["order_id"] for line in lines] == ["ORD-1", "ORD-2", "ORD-3"]
+    assert lines[0]["total_price"] == 2.0 and lines[2]["total_price"] == 4.0
+    assert catalog.get("med_1")["stock"] == 7
+
+
+def test_cart_retries_conflicting_lines_and_rechecks_their_stock(catalog, monkeypatch):
+    load(catalog, medicine("med_1", stock=10, version=5), medicine("med_2", stock=10, version=9),
+         medicine("med_3", stock=10, version=1, active_ingredient="ibuprofen"),
+         medicine("med_4", stock=50, version=1, active_ingredient="ibuprofen"))
+    sold_out, _ = medicine("med_3", stock=1, version=2, active_ingredient="ibuprofen")
+    canister = FakeCanister(
+        [{"results": [{"success": True, "version": 6, "order_id": "ORD-1"},
+                      {"success": False, "conflict": True, "version": 10},
+                      {"success": False, "conflict": True, "version": 2},
+                      {"success": False, "message": "Prescription required"}]},
+         {"results": [{"success": True, "version": 11, "order_id": "ORD-2"}]}],
+        changes={"medicines": [sold_out], "removed": [], "versions": [{"medicine_id": "med_3", "version": 2}],
+                 "version": 2, "full": False},
+    )
+    install(monkeypatch, canister)
+    lines = [cart_line(catalog, "med_1", 1), cart_line(catalog, "med_2", 1), cart_line(catalog, "med_3", 5),
+             cart_line(catalog, "med_4", 1)]
+
+    asyncio.run(pharmacy.order_cart(lines, "u1", None, Ctx()))
+    assert [line["status"] for line in lines] == ["confirmed", "confirmed", "insufficient_stock", "prescription_required"]
+    # The retry only carries the line still orderable, conditioned on the version the conflict reported
+    assert canister.orders()[1]["lines"] == [{"medicine_id": "med_2", "quantity": 1, "expected_version": 10}]
+    assert [alternative["medicine_id"] for alternative in lines[2]["suggested_alternatives"]] == ["med_4"]
+
+
+def test_cart_write_failure_marks_every_line(catalog, monkeypatch):
+    load(catalog, medicine("med_1", stock=10, version=5))
+    install(monkeypatch, FakeCanister([{"error": "canister unavailable"}]))
+    lines = [cart_line(catalog, "med_1", 1)]
+
+    asyncio.run(pharmacy.order_cart(lines, "u1", None, Ctx()))
+    assert lines[0]["status"] == "error" and "canister unavailable" in lines[0]["message"]
@@ -0,0 +1,190 @@
+from datetime import datetime
+
+import pytest
+
+from reminder_scheduler import (DAY, REMINDER_TICK, WHEEL_SLOTS, ReminderScheduler, TimerWheel,
+                                parse_reminder_schedule, reminder_key)
+from state_backend import MemoryStateBackend
+
+NOW = datetime(2026, 3, 10, 7, 0).timestamp()
+
+
+def reminder(reminder_id, user_id, medicine, time="8:00 am"):
+    """An entry as /get-active-reminders returns it"""
+    return {"reminder_id": reminder_id, "medicine": medicine, "time": time,
+            "created_at": "2026-03-01T08:00:00+00:00", "user_id": user_id, "active": True}
+
+
+def scheduler():
+    return ReminderScheduler(clock=lambda: NOW)
+
+
+def test_full_sync_schedules_named_fields_and_records_version():
+    reminders = scheduler()
+    scheduled = reminders.sync([reminder("reminder_1", "u1", "aspirin"), reminder("reminder_2", "u2", "statin", "9pm")],
+                               full=True, version=4)
+    assert scheduled == 2
+    assert len(reminders) == 2
+    assert reminders.version == 4
+
+
+def test_delta_sync_adds_and_removes_by_id():
+    reminders = scheduler()
+    first, second = reminder("reminder_1", "u1", "aspirin"), reminder("reminder_2", "u1", "statin", "9pm")
+    reminders.sync([first, second], full=True, version=2)
+
+    # The frontend deleted reminder_1 and stored reminder_3 directly in the canister
+    third = reminder("reminder_3", "u2", "insulin", "7:30 pm")
+    reminders.sync([third], removed=["reminder_1"], version=4)
+    assert len(reminders) == 2
+    assert reminders.version == 4
+    assert reminder_key(first) not in reminders._wheel
+    assert reminder_key(third) in reminders._wheel
+
+
+def test_full_sync_drops_reminders_no_longer_listed():
+    reminders = scheduler()
+    kept, dropped = reminder("reminder_1", "u1", "aspirin"), reminder("reminder_2", "u1", "statin", "9pm")
+    reminders.sync([kept, dropped], full=True, version=2)
+
+    # A version older than the canister's change log gets every active reminder back
+    reminders.sync([kept], full=True, version=5)
+    assert len(reminders) == 1
+    assert reminder_key(dropped) not in reminders._wheel
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_daily_reminder_fires_once_and_reschedules_for_tomorrow():
+    clock = FakeClock(NOW)
+    backend = MemoryStateBackend()
+    reminders = ReminderScheduler(backend=backend, clock=clock)
+    entry = reminder("reminder_1", "u1", "aspirin")
+    eight = datetime(2026, 3, 10, 8, 0).timestamp()
+    assert reminders.schedule(entry) == eight
+
+    clock.now = eight - 60
+    assert reminders.due() == []
+    clock.now = eight + 10
+    assert reminders.due() == [entry]
+    assert backend.get("reminder_delivery", reminder_key(entry)) == eight
+    assert reminders.due() == []
+
+    clock.now = eight + DAY - 60
+    assert reminders.due() == []
+    clock.now = eight + DAY + 5
+    assert reminders.due() == [entry]
+
+
+def test_every_n_hours_reminder_counts_from_creation():
+    clock = FakeClock(NOW)
+    reminders = ReminderScheduler(clock=clock)
+    entry = reminder("reminder_1", "u1", "ibuprofen", "every 6 hours")
+    created = datetime.fromisoformat(entry["created_at"]).timestamp()
+    fire_at = reminders.schedule(entry)
+    assert NOW < fire_at <= NOW + 6 * 3600
+    assert (fire_at - created) % (6 * 3600) == 0
+
+    for occurrence in range(3):
+        clock.now = fire_at + occurrence * 6 * 3600 - 1
+        assert reminders.due() == []
+        clock.now += 2
+        assert reminders.due() == [entry]
+
+
+def test_missed_occurrences_fire_once_and_skip_ahead():
+    clock = FakeClock(NOW)
+    reminders = ReminderScheduler(clock=clock)
+    entry = reminder("reminder_1", "u1", "ibuprofen", "every 2 hours")
+    fire_at = reminders.schedule(entry)
+
+    # The agent was stalled for most of a day
+    clock.now = fire_at + 20 * 3600 + 60
+    assert reminders.due() == [entry]
+    clock.now += 3600
+    assert reminders.due() == []
+    clock.now += 3600
+    assert reminders.due() == [entry]
+
+
+def test_timer_a_lap_ahead_waits_in_its_slot():
+    wheel = TimerWheel(tick=30, slots=4, start=0)
+    lap = 4 * 30
+    wheel.add("later", lap + 60)  # slot 2, one revolution out
+    wheel.add("soon", 70)  # slot 2 this revolution
+
+    assert [key for key, _, _ in wheel.advance(90)] == ["soon"]
+    assert "later" in wheel
+    assert wheel.advance(lap + 30) == []
+    assert [key for key, _, _ in wheel.advance(lap + 65)] == ["later"]
+    assert len(wheel) == 0
+
+
+def test_day_wheel_wraps_past_its_last_slot():
+    wheel = TimerWheel(start=0)
+    last_tick = (WHEEL_SLOTS - 1) * REMINDER_TICK
+    wheel.add("end_of_day", last_tick + 5)
+    wheel.add("after_wrap", DAY + 2 * REMINDER_TICK)
+
+    assert [key for key, _, _ in wheel.advance(last_tick + 10)] == ["end_of_day"]
+    assert wheel.advance(DAY + REMINDER_TICK) == []
+    assert [key for key, _, _ in wheel.advance(DAY + 2 * REMINDER_TICK)] == ["after_wrap"]
+
+
+def test_advance_after_a_gap_longer_than_a_revolution_fires_everything_due():
+    wheel = TimerWheel(tick=30, slots=4, start=0)
+    for n in range(6):
+        wheel.add(f"timer_{n}", 40 * n)
+    assert sorted(key for key, _, _ in wheel.advance(1000)) == [f"timer_{n}" for n in range(6)]
+
+
+def test_restart_does_not_repeat_a_delivered_reminder():
+    clock = FakeClock(datetime(2026, 3, 10, 8, 0, 5).timestamp())
+    backend = MemoryStateBackend()
+    entry = reminder("reminder_1", "u1", "aspirin")
+    eight = datetime(2026, 3, 10, 8, 0).timestamp()
+    before_restart = ReminderScheduler(backend=backend, clock=clock)
+    before_restart.schedule(entry)
+    assert before_restart.due() == [entry]
+
+    clock.now = eight + 5 * 60
+    restarted = ReminderScheduler(backend=backend, clock=clock)
+    assert restarted.schedule(entry) == eight + DAY
+    assert restarted.due() == []
+
+
+def test_restart_fires_a_reminder_missed_within_the_grace_period():
+    clock = FakeClock(datetime(2026, 3, 10, 8, 5).timestamp())
+    entry = reminder("reminder_1", "u1", "aspirin")
+    restarted = ReminderScheduler(backend=MemoryStateBackend(), clock=clock)
+    assert restarted.schedule(entry) == datetime(2026, 3, 10, 8, 0).timestamp()
+    assert restarted.due() == [entry]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("8:00 am", ((8, 0), DAY)),
+    ("9pm", ((21, 0), DAY)),
+    ("7:30 p.m.", ((19, 30), DAY)),
+    ("20:15", ((20, 15), DAY)),
+    ("at 8", ((8, 0), DAY)),
+    ("2 tablets at 9pm", ((21, 0), DAY)),
+    ("every 8 hours", (None, 8 * 3600)),
+    ("twice daily", ((8, 0), DAY // 2)),
+    ("3 times a day", ((8, 0), DAY // 3)),
+    ("twice a day at 9am", ((9, 0), DAY // 2)),
+    ("after dinner", ((19, 0), DAY)),
+    ("once daily in the evening", ((18, 0), DAY)),
+])
+def test_parse_reminder_schedule(text, expected):
+    assert parse_reminder_schedule(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", "as needed", "2 tablets", "whenever", "every 30 hours", "13pm"])
+def test_unschedulable_reminder_times(text):
+    assert parse_reminder_schedule(text) is None
@@ -0,0 +1,69 @@
+import asyncio
+
+from pending_requests import ResponseWaiters
+
+
+def test_result_before_wait_is_kept_and_still_delivered():
+    async def scenario():
+        waiters = ResponseWaiters()
+        with waiters.collect() as request_ids:
+            waiters.track("req_1")
+        # The sub-agent answers while the chat handler is still busy, e.g. classifying
+        assert not waiters.resolve("req_1", {"message": "booked"})
+        return await waiters.wait(request_ids[-1], 1)
+
+    assert asyncio.run(scenario()) == {"message": "booked"}
+
+
+def test_result_for_an_awaiting_caller_is_taken_over():
+    async def scenario():
+        waiters = ResponseWaiters()
+        waiters.watch("req_1")
+        waiting = asyncio.create_task(waiters.wait("req_1", 1))
+        await asyncio.sleep(0)
+        assert waiters.resolve("req_1", {"message": "ordered"})
+        return await waiting
+
+    assert asyncio.run(scenario()) == {"message": "ordered"}
+
+
+def test_expect_marks_the_caller_as_waiting_before_the_task_runs():
+    async def scenario():
+        waiters = ResponseWaiters()
+        waiters.watch("req_1")
+        waiters.expect("req_1")
+        waiting = asyncio.create_task(waiters.wait("req_1", 1))
+        taken = waiters.resolve("req_1", {"message": "ordered"})
+        return taken, await waiting
+
+    assert asyncio.run(scenario()) == (True, {"message": "ordered"})
+
+
+def test_requests_are_not_watched_unless_the_caller_waits():
+    async def scenario():
+        waiters = ResponseWaiters()
+        with waiters.collect(watch=False) as request_ids:
+            waiters.track("req_1")
+        return request_ids, waiters.resolve("req_1", {"message": "booked"})
+
+    assert asyncio.run(scenario()) == (["req_1"], False)
+
+
+def test_timed_out_wait_leaves_the_result_to_other_delivery():
+    async def scenario():
+        waiters = ResponseWaiters()
+        waiters.watch("req_1")
+        assert await waiters.wait("req_1", 0.01) is None
+        return waiters.resolve("req_1", {"message": "late"})
+
+    assert asyncio.run(scenario()) is False
+
+
+def test_take_returns_a_result_the_caller_never_collected():
+    async def scenario():
+        waiters = ResponseWaiters()
+        waiters.expect("req_1")
+        assert waiters.resolve("req_1", {"message": "booked"})
+        return waiters.take("req_1"), waiters.take("req_1")
+
+    assert asyncio.run(scenario()) == ({"message": "booked"}, None)
@@ -0,0 +1,32 @@
+import asyncio
+
+from result_inbox import ResultInbox
+
+
+def test_cursor_from_current_epoch_is_kept():
+    inbox = ResultInbox()
+    first = inbox.publish("u1", {"message": "booked"})
+    second = inbox.publish("u1", {"message": "ordered"})
+
+    assert inbox.cursor(first, inbox.epoch) == first
+    assert [result["seq"] for result in asyncio.run(inbox.wait("u1", first, 0, inbox.epoch))] == [second]
+
+
+def test_cursor_from_a_restarted_agent_is_reset():
+    before_restart = ResultInbox()
+    for _ in range(5):
+        before_restart.publish("u1", {"message": "old"})
+
+    # The client still holds seq 5 from the old process, whose sequence numbers restarted
+    inbox = ResultInbox()
+    inbox.publish("u1", {"message": "new"})
+    results = asyncio.run(inbox.wait("u1", 5, 0, before_restart.epoch))
+    assert [result["message"] for result in results] == ["new"]
+
+
+def test_cursor_ahead_of_the_server_is_reset():
+    inbox = ResultInbox()
+    inbox.publish("u1", {"message": "new"})
+
+    assert inbox.cursor(40) == 0
+    assert [result["message"] for result in asyncio.run(inbox.wait("u1", 40, 0))] == ["new"]
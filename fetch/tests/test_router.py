@@ -0,0 +1,41 @@
+import pytest
+
+pytest.importorskip("aiohttp")  # router.py is an aiohttp app
+
+from router import HashRing  # noqa: E402
+
+WORKERS = [f"http://127.0.0.1:{8100 + index}" for index in range(4)]
+USERS = [f"frontend_user_{index}" for index in range(4000)]
+
+
+def test_users_split_evenly_and_stay_put():
+    ring = HashRing(WORKERS)
+    owners = [ring.node_for(user) for user in USERS]
+    assert owners == [HashRing(list(reversed(WORKERS))).node_for(user) for user in USERS]
+    for worker in WORKERS:
+        assert 0.15 < owners.count(worker) / len(USERS) < 0.35
+
+
+def test_removing_a_worker_only_moves_its_own_users():
+    ring = HashRing(WORKERS)
+    before = {user: ring.node_for(user) for user in USERS}
+    ring.remove_node(WORKERS[0])
+
+    assert ring.nodes() == sorted(WORKERS[1:])
+    for user, owner in before.items():
+        if owner != WORKERS[0]:
+            assert ring.node_for(user) == owner
+
+
+def test_adding_a_worker_moves_about_a_fair_share():
+    ring = HashRing(WORKERS)
+    before = {user: ring.node_for(user) for user in USERS}
+    ring.add_node("http://127.0.0.1:8104")
+
+    moved = [user for user, owner in before.items() if ring.node_for(user) != owner]
+    assert all(ring.node_for(user) == "http://127.0.0.1:8104" for user in moved)
+    assert 0.1 < len(moved) / len(USERS) < 0.3
+
+
+def test_empty_ring_has_no_owner():
+    assert HashRing().node_for("frontend_user_1") is None
@@ -0,0 +1,72 @@
+import pytest
+
+from specialty_resolver import (DEFAULT_SPECIALTY, MIN_CONFIDENCE, SpecialtyResolver, normalize_specialty,
+                                resolve_specialty)
+
+
+@pytest.mark.parametrize("text, specialty", [
+    ("I need a cardiologist", "Cardiology"),
+    ("book me with a dermatologist please", "Dermatology"),
+    ("Can I see an orthopaedic surgeon?", "Orthopedics"),
+    ("looking for a GP", "General Practitioner"),
+    ("my child's paediatrician", "Pediatrics"),
+])
+def test_decisive_names_skip_the_llm(text, specialty):
+    match = resolve_specialty(text)
+    assert match.specialty == specialty
+    assert match.confidence == 1.0
+
+
+@pytest.mark.parametrize("text, specialty", [
+    ("my heart is broken", "Cardiology"),
+    ("knee pain after running", "Orthopedics"),
+    ("I have a cancer question", "Oncology"),
+])
+def test_a_single_symptom_or_body_part_stays_below_the_threshold(text, specialty):
+    match = resolve_specialty(text)
+    assert match.specialty == specialty
+    assert 0 < match.confidence < MIN_CONFIDENCE
+
+
+def test_combined_evidence_clears_the_threshold():
+    match = resolve_specialty("chest pain and palpitations at night")
+    assert match.specialty == "Cardiology"
+    assert match.confidence >= MIN_CONFIDENCE
+    assert match.terms == ("chest pain", "palpitation")
+
+
+def test_plural_variants_match_the_singular_phrase():
+    assert resolve_specialty("moles and warts").terms == ("mole", "wart")
+    assert resolve_specialty("she sees orthopedists").specialty == "Orthopedics"
+    assert resolve_specialty("Oncologists").terms == ("oncologist",)
+
+
+def test_leftmost_longest_phrase_wins():
+    resolver = SpecialtyResolver({"Chest": {"chest": 0.5}, "Cardiology": {"chest pain": 0.7}})
+    assert resolver.matches("sharp chest pain today") == [("chest pain", "Cardiology", 0.7)]
+    assert resolve_specialty("heart doctor").terms == ("heart doctor",)
+
+
+def test_repeated_words_are_not_more_evidence():
+    assert resolve_specialty("knee knee knee").confidence == resolve_specialty("knee").confidence
+
+
+def test_tied_specialties_give_zero_confidence():
+    match = resolve_specialty("my skin and my heart")
+    assert match.confidence == 0.0
+    assert set(match.terms) == {"skin", "heart"}
+
+
+def test_no_match():
+    assert resolve_specialty("hello there") == (None, 0.0, ())
+
+
+@pytest.mark.parametrize("text, specialty", [
+    ("Cardiology", "Cardiology"),
+    ("pediatrics", "Pediatrics"),
+    ("something else", DEFAULT_SPECIALTY),
+    ("", DEFAULT_SPECIALTY),
+    (None, DEFAULT_SPECIALTY),
+])
+def test_normalize_specialty(text, specialty):
+    assert normalize_specialty(text) == specialty
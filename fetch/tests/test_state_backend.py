@@ -0,0 +1,91 @@
+import pytest
+
+import state_backend
+from state_backend import MemoryStateBackend, SQLiteStateBackend
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(state_backend.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path, clock):
+    if request.param == "memory":
+        return MemoryStateBackend()
+    return SQLiteStateBackend(str(tmp_path / "state.db"))
+
+
+def test_get_set_delete(backend):
+    assert backend.get("context", "u1") is None
+    assert backend.get("context", "u1", {}) == {}
+    backend.set("context", "u1", {"last_intent": "doctor"})
+    assert backend.get("context", "u1") == {"last_intent": "doctor"}
+    # Namespaces are separate
+    assert backend.get("user_origin", "u1") is None
+
+    backend.delete("context", "u1")
+    assert backend.get("context", "u1") is None
+    backend.delete("context", "missing")
+
+
+def test_ttl_expiry(backend, clock):
+    backend.set("context", "short", 1, ttl=10)
+    backend.set("context", "forever", 2)
+    clock[0] += 9
+    assert backend.get("context", "short") == 1
+    clock[0] += 1
+    assert backend.get("context", "short") is None
+    assert backend.get("context", "forever") == 2
+
+
+def test_append_keeps_the_newest_items(backend):
+    for n in range(5):
+        backend.append("symptoms", "u1", {"n": n}, max_items=3)
+    assert backend.get_list("symptoms", "u1") == [{"n": 2}, {"n": 3}, {"n": 4}]
+    # The list is an ordinary value at the key
+    assert backend.get("symptoms", "u1") == [{"n": 2}, {"n": 3}, {"n": 4}]
+    assert backend.get_list("symptoms", "u2") == []
+
+    backend.delete("symptoms", "u1")
+    assert backend.get_list("symptoms", "u1") == []
+
+
+def test_append_ttl_restarts_and_is_kept_without_one(backend, clock):
+    backend.append("reminders", "u1", "a", ttl=10)
+    clock[0] += 8
+    backend.append("reminders", "u1", "b", ttl=10)
+    clock[0] += 8
+    assert backend.get_list("reminders", "u1") == ["a", "b"]
+
+    # Without a ttl the list keeps its expiry
+    backend.append("reminders", "u1", "c")
+    clock[0] += 3
+    assert backend.get_list("reminders", "u1") == []
+
+    # An expired list starts over
+    backend.append("reminders", "u1", "d")
+    assert backend.get_list("reminders", "u1") == ["d"]
+
+
+def test_items_include_values_and_lists_but_not_expired_entries(backend, clock):
+    backend.set("inbox", "u1", {"cursor": 3})
+    backend.append("inbox", "u2", "result")
+    backend.set("inbox", "u3", "stale", ttl=5)
+    backend.set("other", "u4", "elsewhere")
+    clock[0] += 5
+    assert sorted(backend.items("inbox")) == [("u1", {"cursor": 3}), ("u2", ["result"])]
+
+
+def test_purge_expired_counts_dropped_entries(backend, clock):
+    backend.set("context", "u1", 1, ttl=5)
+    backend.set("context", "u2", 2, ttl=50)
+    backend.append("symptoms", "u1", "headache", ttl=5)
+    backend.set("user_origin", "u1", "chat")
+    clock[0] += 10
+    assert backend.purge_expired() == 2
+    assert backend.purge_expired() == 0
+    assert backend.get("context", "u2") == 2
+    assert backend.get("user_origin", "u1") == "chat"
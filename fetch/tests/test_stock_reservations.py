@@ -0,0 +1,45 @@
+import asyncio
+
+from stock_reservations import StockReservations
+
+
+def test_holds_cover_stock_until_released_or_expired():
+    clock = [0.0]
+    reservations = StockReservations(ttl=30, clock=lambda: clock[0])
+    first = reservations.reserve("med_1", stock=5, quantity=3)
+    assert first is not None
+    assert reservations.reserve("med_1", stock=5, quantity=3) is None
+    assert reservations.available("med_1", 5) == 2
+    assert reservations.reserve("med_2", stock=5, quantity=3) is not None  # other medicines are unaffected
+
+    reservations.release(first)
+    reservations.release(first)  # releasing twice is harmless
+    assert reservations.available("med_1", 5) == 5
+
+    reservations.reserve("med_1", stock=5, quantity=5)
+    clock[0] = 31  # the order never completed
+    assert reservations.held("med_1") == 0
+
+
+def test_invalid_quantities_are_not_held():
+    reservations = StockReservations()
+    assert reservations.reserve("med_1", stock=5, quantity=0) is None
+    assert reservations.reserve("med_1", stock=None, quantity=1) is None
+
+
+def test_writes_for_one_medicine_are_serialized():
+    async def scenario():
+        reservations = StockReservations()
+        order = []
+
+        async def write(name):
+            async with reservations.write_lock("med_1"):
+                order.append(f"{name} start")
+                await asyncio.sleep(0.01)
+                order.append(f"{name} end")
+
+        await asyncio.gather(write("a"), write("b"))
+        assert reservations.write_lock("med_1") is reservations.write_lock("med_1")
+        return order
+
+    assert asyncio.run(scenario()) == ["a start", "a end", "b start", "b end"]
@@ -0,0 +1,68 @@
+import math
+
+import numpy as np
+
+from wellness_analytics import ICP_LOG_KEYS, WellnessAnalytics, normalize_log
+
+
+def log(date, sleep=None, steps=None, mood=None, exercise=None, water_intake=None):
+    return {"user_id": "u1", "date": date, "sleep": sleep, "steps": steps, "mood": mood,
+            "exercise": exercise, "water_intake": water_intake}
+
+
+def test_stats_ignore_missing_zero_and_non_numeric_readings():
+    analytics = WellnessAnalytics([log("2026-03-02", sleep=6), log("2026-03-03", sleep=0), log("2026-03-04", sleep="8"),
+                                   log("2026-03-05", sleep=8.0), log("2026-03-06")])
+    stats = analytics.stats("sleep")
+    assert (stats["count"], stats["total"], stats["mean"], stats["min"], stats["max"]) == (2, 14.0, 7.0, 6.0, 8.0)
+    assert stats["p50"] == 7.0
+    assert analytics.stats("steps")["count"] == 0
+    assert analytics.calendar_days == 5 and analytics.days_with_data == 2
+
+
+def test_rolling_windows_and_weekdays_count_calendar_days():
+    # Logged out of order, with a gap and two readings on one day
+    analytics = WellnessAnalytics([log("2026-03-09", steps=9000), log("2026-03-02", steps=1000),
+                                   log("2026-03-02", steps=3000), log("2026-03-10", steps=5000)])
+    assert analytics.span == 9
+    daily = analytics.daily("steps")
+    assert daily[0] == 2000 and np.isnan(daily[1]) and daily[-1] == 5000
+    assert analytics.latest_rolling("steps", 7) == 7000  # 2026-03-04..10
+    assert analytics.latest_rolling("steps", 30) == (2000 + 9000 + 5000) / 3
+    weekdays = analytics.weekday_means("steps")
+    assert weekdays[0] == (2000 + 9000) / 2 and weekdays[1] == 5000 and np.isnan(weekdays[2])
+
+
+def test_trend_and_anomalies():
+    logs = [log(f"2026-03-{day:02d}", sleep=7 + 0.1 * day, water_intake=6) for day in range(1, 11)]
+    logs.append(log("2026-03-11", sleep=7.0, water_intake=30))
+    analytics = WellnessAnalytics(logs)
+    assert math.isclose(WellnessAnalytics(logs[:10]).trend("sleep"), 0.1)
+    assert analytics.anomalies("water_intake") == []  # no spread around the median
+    assert WellnessAnalytics(logs[:2]).trend("sleep") is None
+
+    for day, entry in enumerate(logs[:10]):
+        entry["water_intake"] = 5 + day % 3
+    assert WellnessAnalytics(logs).anomalies("water_intake") == ["2026-03-11"]
+
+
+def test_summary_of_moods_activities_and_hash_keyed_logs():
+    keys = {field: key for key, field in ICP_LOG_KEYS.items()}
+    hashed = {keys[field]: value for field, value in log("2026-03-03", sleep=7, mood="calm", exercise="yoga").items()}
+    assert normalize_log(hashed)["date"] == "2026-03-03"
+
+    analytics = WellnessAnalytics([hashed, log("2026-03-04", mood="Tired", exercise="Not logged"),
+                                   log("2026-03-05", mood="calm", exercise="run"), log(None, mood="happy"),
+                                   log("2026-03-06", exercise="yoga")])
+    summary = analytics.summary()
+    assert summary["entries"] == 5 and summary["calendar_days"] == 4
+    assert summary["moods"] == {"Calm": 2, "Tired": 1}
+    assert summary["top_mood"] == "Calm"
+    assert summary["activities"] == ["yoga", "run"] and summary["exercise_days"] == 3
+    assert summary["metrics"]["sleep"]["best_weekday"] == "Tuesday"
+
+
+def test_no_logs():
+    summary = WellnessAnalytics([]).summary()
+    assert summary["calendar_days"] == 0 and summary["top_mood"] is None
+    assert summary["metrics"]["steps"]["rolling_7"] is None and summary["metrics"]["steps"]["anomalies"] == []
@@ -0,0 +1,76 @@
+import datetime
+
+from wellness_analytics import ICP_LOG_KEYS
+from wellness_rollups import WellnessRollups, stamp_of
+
+FIELD_KEYS = {field: key for key, field in ICP_LOG_KEYS.items()}
+DAY = datetime.date(2026, 3, 10)
+
+
+def canister_log(date, sleep, steps):
+    """A wellness log as get-wellness-summary returns it: hashed field names"""
+    log = {"user_id": "u1", "date": date, "sleep": sleep, "steps": steps,
+           "exercise": "yoga", "mood": "calm", "water_intake": 5}
+    return {FIELD_KEYS[field]: value for field, value in log.items()}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_load_reads_hash_keyed_logs():
+    rollups = WellnessRollups()
+    rollups.load("u1", [canister_log("2026-03-09", 7, 8000), canister_log("2026-03-10", 8, 6000)], (2, "wellness_2"))
+
+    totals = rollups.window("u1", DAY - datetime.timedelta(days=6), DAY)
+    assert totals.days == 2
+    assert totals.average("sleep") == 7.5
+    assert totals.sums["steps"] == 14000
+    assert totals.exercise_sessions == 2
+
+
+def test_stamp_follows_own_writes():
+    rollups = WellnessRollups()
+    rollups.load("u1", [canister_log("2026-03-09", 7, 8000)], stamp_of({"total_count": 1, "last_log_id": "wellness_1"}))
+
+    rollups.add("u1", {"date": "2026-03-10", "sleep": 6}, "wellness_2")
+    assert rollups.current("u1", (2, "wellness_2"))
+
+    rollups.delete_date("u1", "2026-03-09")
+    assert rollups.current("u1", (1, "wellness_2"))
+
+
+def test_writes_made_elsewhere_are_stale():
+    rollups = WellnessRollups()
+    rollups.load("u1", [canister_log("2026-03-09", 7, 8000)], (1, "wellness_1"))
+
+    # The frontend logged directly: the canister's newest id moved on
+    assert not rollups.current("u1", (2, "wellness_7"))
+    # The frontend deleted a date directly: the count dropped
+    assert not rollups.current("u1", (0, None))
+    # An add without a storage id cannot be stamped, so the next read rebuilds
+    rollups.add("u1", {"date": "2026-03-10", "sleep": 6})
+    assert not rollups.current("u1", (2, "wellness_2"))
+
+
+def test_idle_and_excess_users_are_evicted():
+    clock = Clock()
+    rollups = WellnessRollups(max_users=2, idle_ttl=60, clock=clock)
+    rollups.load("a", [], (0, None))
+    rollups.load("b", [], (0, None))
+    rollups.current("a", (0, None))  # a is now the most recently used
+    rollups.load("c", [], (0, None))
+    assert not rollups.loaded("b")
+    assert rollups.loaded("a") and rollups.loaded("c")
+
+    clock.now = 30
+    rollups.current("c", (0, None))
+    clock.now = 70
+    rollups.evict_idle()
+    assert not rollups.loaded("a")
+    assert rollups.loaded("c")
+    assert len(rollups) == 1
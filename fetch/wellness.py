@@ -6,6 +6,8 @@ from typing import Optional, List
 from uagents import Agent, Context, Model, Protocol
 import requests
 from dotenv import load_dotenv
+from wellness_analytics import normalize_log
+from wellness_rollups import WellnessRollups, stamp_of
 
 # --- Agent communication with request tracking ---
 class RequestACK(Model):
@@ -62,6 +64,7 @@ if os.path.exists(ic_env_path):
 # === Configuration (same as doctor.py) ===
 CANISTER_ID = os.getenv("CANISTER_ID_BACKEND", "uxrrr-q7777-77774-qaaaq-cai")
 BASE_URL = os.getenv("BASE_URL", "http://127.0.0.1:4943")
+ROLLUP_EVICT_INTERVAL = 300  # seconds between sweeps of idle users' rollups
 
 HEADERS = {
     "Host": f"{CANISTER_ID}.localhost",
@@ -76,6 +79,10 @@ agent = Agent(
     mailbox=True,
 )
 
+# Per-user daily/weekly/monthly aggregates, kept current by the log and delete handlers
+# and rebuilt when the canister's stamp shows writes made elsewhere
+wellness_rollups = WellnessRollups()
+
 # === ICP Integration Functions (same pattern as doctor.py) ===
 async def store_to_icp(endpoint: str, data: dict) -> dict:
     """Store data to ICP canister backend"""
@@ -102,6 +109,7 @@ async def get_from_icp(endpoint: str, params: dict = None) -> dict:
 
 def parse_wellness_from_icp(log_data: dict) -> dict:
     """Convert ICP wellness log format to a standard dictionary if needed."""
+    log_data = normalize_log(log_data)
     return {
         "sleep": log_data.get("sleep"),
         "steps": log_data.get("steps"),
@@ -124,7 +132,7 @@ async def log_wellness_data(wellness_data: WellnessLog) -> dict:
         if "error" in store_result:
             return {"success": False, "error": store_result["error"]}
         
-        return {"success": True, "message": "Wellness data logged successfully"}
+        return {"success": True, "message": "Wellness data logged successfully", "id": store_result.get("id")}
         
     except Exception as e:
         return {"success": False, "error": f"Failed to log wellness data: {str(e)}"}
@@ -145,36 +153,53 @@ async def delete_wellness_data(user_id: str, date: str) -> dict:
     except Exception as e:
         return {"success": False, "error": f"Failed to delete wellness data: {str(e)}"}
 
+async def load_wellness_rollups(user_id: str) -> dict:
+    """Make a user's rollups match the ICP backend, rebuilding from raw logs when they are stale"""
+    # The frontend adds and deletes logs directly in the canister, so compare stamps on every read
+    if wellness_rollups.loaded(user_id):
+        stamp_data = await get_from_icp("get-wellness-log-stamp", {"user_id": user_id})
+        if "error" in stamp_data:
+            return {"success": False, "error": stamp_data["error"]}
+        if wellness_rollups.current(user_id, stamp_of(stamp_data)):
+            return {"success": True}
+    response_data = await get_from_icp("get-wellness-summary", {"user_id": user_id, "days": 0})
+    if "error" in response_data:
+        return {"success": False, "error": response_data["error"]}
+    # The logs and their stamp come from one query, so a log or delete handled while we
+    # waited either is in them or leaves the stamp behind and the next read rebuilds
+    wellness_rollups.load(
+        user_id,
+        [parse_wellness_from_icp(log) for log in response_data.get("logs", [])],
+        stamp_of(response_data),
+    )
+    return {"success": True}
+
 async def get_wellness_summary(user_id: str, days: int = 7) -> dict:
-    """Get wellness summary from ICP backend"""
+    """Get wellness summary for the last `days` days from the user's rollups"""
     try:
-        icp_params = {"user_id": user_id, "days": days}
-        response_data = await get_from_icp("get-wellness-summary", icp_params)
-
-        if "error" in response_data:
-            return {"success": False, "error": response_data["error"]}
+        load_result = await load_wellness_rollups(user_id)
+        if not load_result["success"]:
+            return {"success": False, "error": load_result["error"]}
 
-        # Parse logs from ICP
-        logs = [parse_wellness_from_icp(log) for log in response_data.get("logs", [])]
+        today = datetime.date.today()
+        start = today - datetime.timedelta(days=max(days, 1) - 1)
+        totals = wellness_rollups.window(user_id, start, today)
         
-        if not logs:
+        if not totals.entries:
             return {
                 "success": True,
                 "summary": "No logs found for the requested period.",
                 "advice": ["Start logging your daily habits to track your progress."],
-                "logs": []
+                "days_logged": 0
             }
 
-        # Calculate averages
-        total_sleep = sum(log.get('sleep') or 0 for log in logs)
-        total_steps = sum(log.get('steps') or 0 for log in logs)
-        logs_found = len(logs)
-        
-        avg_sleep = total_sleep / logs_found if logs_found > 0 else 0
-        avg_steps = total_steps / logs_found if logs_found > 0 else 0
+        # Averages over the days each metric was recorded
+        days_logged = totals.days
+        avg_sleep = totals.average("sleep")
+        avg_steps = totals.average("steps")
         
         summary_text = (
-            f"Here is your summary for the last {logs_found} logged day(s): "
+            f"Here is your summary for the last {days_logged} logged day(s): "
             f"Average sleep: {avg_sleep:.1f} hours. "
             f"Average steps: {int(avg_steps)}."
         )
@@ -182,9 +207,11 @@ async def get_wellness_summary(user_id: str, days: int = 7) -> dict:
         return {
             "success": True,
             "summary": summary_text,
-            "logs": logs,
+            "days_logged": days_logged,
             "avg_sleep": avg_sleep,
-            "avg_steps": avg_steps
+            "avg_steps": avg_steps,
+            "totals": totals.to_dict(),
+            "weekly": wellness_rollups.rows(user_id, "week", limit=max(1, (days + 6) // 7))
         }
         
     except Exception as e:
@@ -282,6 +309,7 @@ async def handle_log_request(ctx: Context, sender: str, msg: LogRequest):
             )
             await ctx.send(sender, error_response)
             return
+        wellness_rollups.add(msg.user_id, wellness_log.dict(), log_result.get("id"))
         
         # Generate advice
         daily_prompt = f"User's daily log:\n- Hours Slept: {msg.sleep or 'Not logged'}\n- Steps Taken: {msg.steps or 'Not logged'}\n- Exercise Done: {msg.exercise or 'Not logged'}"
@@ -341,7 +369,7 @@ async def handle_summary_request(ctx: Context, sender: str, msg: SummaryRequest)
         
         # Generate advice for summary
         advice_text = ["Start logging your daily habits to track your progress."]
-        if summary_result.get("logs"):
+        if summary_result.get("days_logged"):
             avg_sleep = summary_result.get("avg_sleep", 0)
             avg_steps = summary_result.get("avg_steps", 0)
             summary_prompt = f"User's Weekly Summary:\n- Average Sleep: {avg_sleep:.1f} hours\n- Average Steps: {int(avg_steps)}"
@@ -408,6 +436,7 @@ async def handle_delete_request(ctx: Context, sender: str, msg: DeleteRequest):
             )
             await ctx.send(sender, error_response)
             return
+        wellness_rollups.delete_date(msg.user_id, msg.date)
         
         # Send success response
         success_response = WellnessAdviceResponse(
@@ -440,6 +469,10 @@ async def wellness_agent_startup(ctx: Context):
     ctx.logger.info(f"Connected to wellness canister: {CANISTER_ID}")
     ctx.logger.info(f"Ready for wellness logging and summary requests from HealthAgent")
 
+@agent.on_interval(period=ROLLUP_EVICT_INTERVAL)
+async def evict_idle_rollups(ctx: Context):
+    wellness_rollups.evict_idle()
+
 if __name__ == "__main__":
     print("Starting WellnessAgent...")
     print(f"Agent Address: {agent.address}")
@@ -0,0 +1,229 @@
+import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+METRICS = ("sleep", "steps", "water_intake")
+ROLLING_WINDOWS = (7, 30)
+PERCENTILES = (25, 50, 75)
+ANOMALY_Z = 2.5  # robust z-score beyond which a day is flagged
+MIN_TREND_POINTS = 3
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+LOG_FIELDS = ("user_id", "date", "sleep", "steps", "exercise", "mood", "water_intake")
+# Field-name hashes the canister emits when a log's JSON keys are not listed
+ICP_LOG_KEYS = {
+    "1_869_947_023": "user_id",
+    "1_113_806_382": "date",
+    "2_126_822_679": "sleep",
+    "2_215_541_671": "steps",
+    "1_450_210_392": "exercise",
+    "1_214_307_575": "mood",
+    "1_152_427_284": "water_intake",
+}
+EMPTY_EXERCISE = ("", "None", "Not logged")
+
+
+def normalize_log(log: dict) -> dict:
+    """A wellness log with field names, whether it arrived with names or numeric ICP keys"""
+    if "date" in log or not any(key in ICP_LOG_KEYS for key in log):
+        return log
+    return {ICP_LOG_KEYS[key]: value for key, value in log.items() if key in ICP_LOG_KEYS and value is not None}
+
+
+def _column(values: list) -> np.ndarray:
+    # Missing, zero and non-numeric readings are "not recorded"
+    column = np.array([value if value.__class__ in (int, float) else np.nan for value in values], dtype=float)
+    column[~(column > 0)] = np.nan
+    return column
+
+
+def _to_days(values: list) -> np.ndarray:
+    """YYYY-MM-DD strings as datetime64[D], NaT where a date is missing or malformed"""
+    texts = [str(value)[:10] if value else "NaT" for value in values]
+    try:
+        return np.array(texts, dtype="datetime64[D]")
+    except ValueError:
+        days = []
+        for text in texts:
+            try:
+                days.append(np.datetime64(datetime.date.fromisoformat(text), "D"))
+            except ValueError:
+                days.append(np.datetime64("NaT"))
+        return np.array(days, dtype="datetime64[D]")
+
+
+class WellnessAnalytics:
+    """A user's wellness logs as NumPy columns, built once and queried many times.
+
+    Numeric metrics are float arrays with NaN where nothing was recorded. Per-day series
+    cover every calendar day from the first dated log to the last, so rolling windows and
+    weekday patterns count calendar days, not log entries.
+    """
+
+    def __init__(self, logs: List[dict]):
+        logs = [normalize_log(log) for log in logs]
+        self.entries = len(logs)
+        days = _to_days([log.get("date") for log in logs])
+        order = np.argsort(days, kind="stable")  # NaT sorts last
+        order = order[~np.isnat(days[order])]
+
+        self.dates = days[order]
+        self.columns: Dict[str, np.ndarray] = {
+            metric: _column([log.get(metric) for log in logs])[order] for metric in METRICS
+        }
+        # Moods become integer codes into mood_labels, -1 where none was logged
+        labels: Dict[str, int] = {}
+        moods = [str(log.get("mood") or "").strip().capitalize() for log in logs]
+        codes = np.array([labels.setdefault(mood, len(labels)) if mood else -1 for mood in moods], dtype=np.int64)
+        self.mood_labels = np.array(list(labels), dtype=object)
+        self.mood_codes = codes[order]
+        exercises = np.array([str(log.get("exercise") or "").strip() for log in logs], dtype=object)
+        self.exercises = exercises[order]
+        self.exercised = np.array([exercise not in EMPTY_EXERCISE for exercise in self.exercises], dtype=bool)
+
+        # Calendar-day grid: day index of every log, and the number of days spanned
+        if self.dates.size:
+            self.first_day = self.dates[0]
+            self.day_index = (self.dates - self.first_day).astype(np.int64)
+            self.span = int(self.day_index[-1]) + 1
+        else:
+            self.first_day = None
+            self.day_index = np.zeros(0, dtype=np.int64)
+            self.span = 0
+        self._daily: Dict[str, np.ndarray] = {}
+
+    @property
+    def calendar_days(self) -> int:
+        """Distinct dates with a log"""
+        return int(np.unique(self.day_index).size)
+
+    @property
+    def days_with_data(self) -> int:
+        """Distinct dates where at least one metric, mood or exercise was recorded"""
+        recorded = self.exercised | (self.mood_codes >= 0)
+        for values in self.columns.values():
+            recorded |= ~np.isnan(values)
+        return int(np.unique(self.day_index[recorded]).size)
+
+    def daily(self, metric: str) -> np.ndarray:
+        """Per calendar day mean of a metric, NaN on days without a reading"""
+        if metric not in self._daily:
+            self._daily[metric] = self._aggregate_daily(metric)
+        return self._daily[metric]
+
+    def _aggregate_daily(self, metric: str) -> np.ndarray:
+        values = self.columns[metric]
+        present = ~np.isnan(values)
+        sums = np.bincount(self.day_index[present], weights=values[present], minlength=self.span)
+        counts = np.bincount(self.day_index[present], minlength=self.span)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+    def stats(self, metric: str) -> dict:
+        values = self.columns[metric]
+        values = values[~np.isnan(values)]
+        if not values.size:
+            return {"count": 0, "total": 0.0, "mean": 0.0, "min": 0.0, "max": 0.0,
+                    **{f"p{p}": 0.0 for p in PERCENTILES}}
+        quantiles = np.percentile(values, PERCENTILES)
+        return {"count": int(values.size), "total": float(values.sum()), "mean": float(values.mean()),
+                "min": float(values.min()), "max": float(values.max()),
+                **{f"p{p}": float(q) for p, q in zip(PERCENTILES, quantiles)}}
+
+    def rolling(self, metric: str, window: int) -> np.ndarray:
+        """Mean over the trailing window of calendar days ending on each day, ignoring days without a reading"""
+        daily = self.daily(metric)
+        present = ~np.isnan(daily)
+        sums = np.concatenate(([0.0], np.cumsum(np.where(present, daily, 0.0))))
+        counts = np.concatenate(([0], np.cumsum(present)))
+        end = np.arange(1, daily.size + 1)
+        start = np.maximum(end - window, 0)
+        window_counts = counts[end] - counts[start]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(window_counts > 0, (sums[end] - sums[start]) / np.maximum(window_counts, 1), np.nan)
+
+    def latest_rolling(self, metric: str, window: int) -> Optional[float]:
+        rolled = self.rolling(metric, window)
+        return float(rolled[-1]) if rolled.size and not np.isnan(rolled[-1]) else None
+
+    def trend(self, metric: str) -> Optional[float]:
+        """Least-squares change per day over the daily series; None with too few readings"""
+        daily = self.daily(metric)
+        days = np.flatnonzero(~np.isnan(daily))
+        if days.size < MIN_TREND_POINTS:
+            return None
+        slope, _ = np.polyfit(days.astype(float), daily[days], 1)
+        return float(slope)
+
+    def weekday_means(self, metric: str) -> np.ndarray:
+        """Mean per weekday, Monday first; NaN for weekdays never recorded"""
+        daily = self.daily(metric)
+        days = np.flatnonzero(~np.isnan(daily))
+        if not days.size:
+            return np.full(7, np.nan)
+        # 1970-01-01 was a Thursday
+        weekdays = (self.first_day.astype(np.int64) + days + 3) % 7
+        sums = np.bincount(weekdays, weights=daily[days], minlength=7)
+        counts = np.bincount(weekdays, minlength=7)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+    def anomalies(self, metric: str, threshold: float = ANOMALY_Z) -> List[str]:
+        """Dates whose daily value is far from the median (robust z-score on the median absolute deviation)"""
+        daily = self.daily(metric)
+        days = np.flatnonzero(~np.isnan(daily))
+        if days.size < MIN_TREND_POINTS:
+            return []
+        values = daily[days]
+        median = np.median(values)
+        mad = np.median(np.abs(values - median))
+        if mad == 0:
+            return []
+        scores = 0.6745 * (values - median) / mad
+        flagged = days[np.abs(scores) > threshold]
+        return [str(self.first_day + int(day)) for day in flagged]
+
+    def mood_counts(self) -> Dict[str, int]:
+        """Mood label -> times logged, most common first"""
+        recorded = self.mood_codes[self.mood_codes >= 0]
+        counts = np.bincount(recorded, minlength=len(self.mood_labels))
+        order = np.lexsort((self.mood_labels.astype(str), -counts)) if counts.size else counts
+        return {str(self.mood_labels[code]): int(counts[code]) for code in order if counts[code]}
+
+    def top_mood(self) -> Optional[str]:
+        counts = self.mood_counts()
+        return next(iter(counts), None)
+
+    def activities(self, limit: int = 5) -> List[str]:
+        """Distinct exercises, most frequent first"""
+        logged = self.exercises[self.exercised]
+        if not logged.size:
+            return []
+        labels, counts = np.unique(logged.astype(str), return_counts=True)
+        return [str(labels[index]) for index in np.argsort(-counts, kind="stable")[:limit]]
+
+    def summary(self) -> dict:
+        """Everything the insight builders report, per metric and overall"""
+        metrics = {}
+        for metric in METRICS:
+            weekday = self.weekday_means(metric)
+            known = np.flatnonzero(~np.isnan(weekday))
+            metrics[metric] = {
+                **self.stats(metric),
+                **{f"rolling_{window}": self.latest_rolling(metric, window) for window in ROLLING_WINDOWS},
+                "trend_per_day": self.trend(metric),
+                "best_weekday": WEEKDAYS[known[np.argmax(weekday[known])]] if known.size else None,
+                "worst_weekday": WEEKDAYS[known[np.argmin(weekday[known])]] if known.size else None,
+                "anomalies": self.anomalies(metric),
+            }
+        return {
+            "entries": self.entries,
+            "calendar_days": self.calendar_days,
+            "days_with_data": self.days_with_data,
+            "exercise_days": int(np.unique(self.day_index[self.exercised]).size),
+            "activities": self.activities(),
+            "moods": self.mood_counts(),
+            "top_mood": self.top_mood(),
+            "metrics": metrics,
+        }
@@ -0,0 +1,228 @@
+import datetime
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from wellness_analytics import normalize_log
+
+METRICS = ("sleep", "steps", "water_intake")
+PERIODS = ("day", "week", "month")
+EMPTY_EXERCISE = ("", "None", "Not logged")
+ROLLUP_MAX_USERS = 1000
+ROLLUP_IDLE_TTL = 3600  # seconds before an unread user's rows are dropped
+
+# (total_count, last_log_id) as the canister reports it; any add or delete changes it
+Stamp = Tuple[int, Optional[str]]
+
+
+def stamp_of(response: dict) -> Stamp:
+    return int(response.get("total_count") or 0), response.get("last_log_id")
+
+
+def period_keys(date: datetime.date) -> Dict[str, str]:
+    """Row keys for the day, ISO week and month a date falls in"""
+    year, week, _ = date.isocalendar()
+    return {"day": date.isoformat(), "week": f"{year}-W{week:02d}", "month": f"{date.year}-{date.month:02d}"}
+
+
+def parse_date(value) -> Optional[datetime.date]:
+    try:
+        return datetime.date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+class Rollup:
+    """Sums, counts and mood histogram of the logs in one period"""
+
+    __slots__ = ("days", "entries", "sums", "counts", "moods", "exercise_sessions")
+
+    def __init__(self):
+        self.days = 0  # distinct dates logged
+        self.entries = 0
+        self.sums = dict.fromkeys(METRICS, 0.0)
+        self.counts = dict.fromkeys(METRICS, 0)
+        self.moods: Dict[str, int] = {}
+        self.exercise_sessions = 0
+
+    def add_log(self, log: dict):
+        self.entries += 1
+        for metric in METRICS:
+            value = log.get(metric)
+            # Missing, zero and non-numeric readings are "not recorded"
+            if value.__class__ in (int, float) and value > 0:
+                self.sums[metric] += value
+                self.counts[metric] += 1
+        mood = str(log.get("mood") or "").strip().capitalize()
+        if mood:
+            self.moods[mood] = self.moods.get(mood, 0) + 1
+        if str(log.get("exercise") or "").strip() not in EMPTY_EXERCISE:
+            self.exercise_sessions += 1
+
+    def merge(self, other: "Rollup", sign: int = 1):
+        """Add other's totals into this one, or take them out with sign=-1"""
+        self.days += sign * other.days
+        self.entries += sign * other.entries
+        for metric in METRICS:
+            self.sums[metric] += sign * other.sums[metric]
+            self.counts[metric] += sign * other.counts[metric]
+        for mood, count in other.moods.items():
+            remaining = self.moods.get(mood, 0) + sign * count
+            if remaining > 0:
+                self.moods[mood] = remaining
+            else:
+                self.moods.pop(mood, None)
+        self.exercise_sessions += sign * other.exercise_sessions
+
+    def average(self, metric: str) -> float:
+        return self.sums[metric] / self.counts[metric] if self.counts[metric] else 0.0
+
+    def top_mood(self) -> Optional[str]:
+        return max(sorted(self.moods), key=self.moods.get) if self.moods else None
+
+    def to_dict(self) -> dict:
+        return {
+            "days": self.days,
+            "entries": self.entries,
+            **{f"avg_{metric}": round(self.average(metric), 2) for metric in METRICS},
+            **{f"total_{metric}": self.sums[metric] for metric in METRICS},
+            "moods": dict(self.moods),
+            "top_mood": self.top_mood(),
+            "exercise_sessions": self.exercise_sessions,
+        }
+
+
+class WellnessRollups:
+    """Per-user daily, weekly and monthly rollups, updated as logs are added and deleted.
+
+    A user's rows are built from their raw logs, then kept current by add() and
+    delete_date(). Deleting a date takes its daily row back out of its week and month, so
+    a date that is deleted and logged again is counted exactly once. Window totals are
+    read from monthly rows for whole months and daily rows for the partial months at
+    either end.
+
+    Each user's rows carry the canister stamp they match. Writes that bypass this agent
+    (the frontend stores and deletes logs directly) change the canister's stamp, and a
+    caller that sees a different stamp rebuilds. Users not read for idle_ttl, or beyond
+    max_users, are dropped least recently used first.
+    """
+
+    def __init__(self, max_users: int = ROLLUP_MAX_USERS, idle_ttl: float = ROLLUP_IDLE_TTL, clock=time.monotonic):
+        self.max_users = max_users
+        self.idle_ttl = idle_ttl
+        self._clock = clock
+        self._rows: "OrderedDict[str, Dict[str, Dict[str, Rollup]]]" = OrderedDict()  # user_id -> period -> key -> rollup
+        self._stamps: Dict[str, Optional[Stamp]] = {}
+        self._used: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def loaded(self, user_id: str) -> bool:
+        return user_id in self._rows
+
+    def current(self, user_id: str, stamp: Stamp) -> bool:
+        """Whether the user's rows match the canister's stamp; marks the user as used"""
+        if not self.loaded(user_id):
+            return False
+        self._touch(user_id)
+        return self._stamps.get(user_id) == stamp
+
+    def load(self, user_id: str, logs: List[dict], stamp: Optional[Stamp] = None):
+        """Build a user's rows from all of their raw logs, as of the canister stamp"""
+        self._rows[user_id] = {period: {} for period in PERIODS}
+        self._stamps[user_id] = stamp
+        for log in logs:
+            self._add(user_id, log)
+        self._touch(user_id)
+        self.evict_idle()
+
+    def forget(self, user_id: str):
+        self._rows.pop(user_id, None)
+        self._stamps.pop(user_id, None)
+        self._used.pop(user_id, None)
+
+    def _touch(self, user_id: str):
+        self._used[user_id] = self._clock()
+        self._rows.move_to_end(user_id)
+
+    def evict_idle(self):
+        """Drop users not read within idle_ttl, then the least recently used beyond max_users"""
+        cutoff = self._clock() - self.idle_ttl
+        while self._rows:
+            user_id = next(iter(self._rows))
+            if len(self._rows) <= self.max_users and self._used.get(user_id, 0.0) > cutoff:
+                break
+            self.forget(user_id)
+
+    def add(self, user_id: str, log: dict, log_id: Optional[str] = None):
+        """Count a newly stored log (log_id is its canister storage id); ignored until the user's rows are loaded"""
+        if not self.loaded(user_id):
+            return
+        self._add(user_id, log)
+        stamp = self._stamps.get(user_id)
+        # Our add made the canister's count one higher and this log its newest
+        self._stamps[user_id] = (stamp[0] + 1, log_id) if stamp is not None and log_id else None
+
+    def _add(self, user_id: str, log: dict):
+        log = normalize_log(log)
+        date = parse_date(log.get("date"))
+        if date is None:
+            return
+        rows = self._rows[user_id]
+        keys = period_keys(date)
+        day = Rollup()
+        day.add_log(log)
+        day.days = 0 if keys["day"] in rows["day"] else 1
+        for period, key in keys.items():
+            rows[period].setdefault(key, Rollup()).merge(day)
+
+    def delete_date(self, user_id: str, date: str):
+        """Drop every log of one date, as the canister's delete does"""
+        parsed = parse_date(date)
+        if not self.loaded(user_id) or parsed is None:
+            return
+        rows = self._rows[user_id]
+        keys = period_keys(parsed)
+        day = rows["day"].pop(keys["day"], None)
+        if day is None:
+            return
+        stamp = self._stamps.get(user_id)
+        if stamp is not None:
+            # If the newest log was on this date, last_log_id no longer matches and the next read rebuilds
+            self._stamps[user_id] = (stamp[0] - day.entries, stamp[1])
+        for period in ("week", "month"):
+            rollup = rows[period].get(keys[period])
+            if rollup is None:
+                continue
+            rollup.merge(day, sign=-1)
+            if rollup.entries <= 0:
+                del rows[period][keys[period]]
+
+    def rows(self, user_id: str, period: str, limit: Optional[int] = None) -> List[Tuple[str, dict]]:
+        """(period key, totals) for the user's most recent periods, oldest first"""
+        keys = sorted(self._rows.get(user_id, {}).get(period, {}))
+        if limit is not None:
+            keys = keys[-limit:] if limit > 0 else []
+        return [(key, self._rows[user_id][period][key].to_dict()) for key in keys]
+
+    def window(self, user_id: str, start: datetime.date, end: datetime.date) -> Rollup:
+        """Totals for start..end inclusive"""
+        total = Rollup()
+        rows = self._rows.get(user_id)
+        if not rows or start > end:
+            return total
+        date = start
+        while date <= end:
+            month_end = (date.replace(day=28) + datetime.timedelta(days=4)).replace(day=1) - datetime.timedelta(days=1)
+            if date.day == 1 and month_end <= end:
+                month = rows["month"].get(f"{date.year}-{date.month:02d}")
+                if month is not None:
+                    total.merge(month)
+                date = month_end + datetime.timedelta(days=1)
+                continue
+            day = rows["day"].get(date.isoformat())
+            if day is not None:
+                total.merge(day)
+            date += datetime.timedelta(days=1)
+        return total
@@ -1,6 +1,6 @@
 import { useState, useEffect, useRef } from 'react';
 import Navbar from './nav';
-import { sendChatMessage } from './services/flaskService';
+import { sendChatMessage, pollAgentResults } from './services/flaskService';
 import { useAuth } from './contexts/AuthContext';
 
 interface Message {
@@ -18,6 +18,10 @@ interface Message {
   };
 }
 
+// Resends of a message the agent rejected as busy, each after its retry_after
+const MAX_BUSY_RETRIES = 3;
+const MAX_BUSY_WAIT_SECONDS = 30;
+
 interface QuickAction {
   label: string;
   icon: string;
@@ -98,6 +102,60 @@ Just speak naturally - I'll understand and connect you with the right healthcare
     { label: 'Water Intake', icon: 'water', prompt: 'I drank 6 glasses of water', category: 'wellness' },
   ];
 
+  // Receive booking/order/wellness outcomes as soon as the agent has them
+  useEffect(() => {
+    if (!principal) return;
+    let active = true;
+    // Resume from the last result shown, so a remount does not replay results already in the saved messages
+    const cursorKey = `healthchat-results-cursor_${principal}`;
+    let lastSeq = 0;
+    let epoch: string | null = null;
+    try {
+      const savedCursor = JSON.parse(localStorage.getItem(cursorKey) || 'null');
+      if (savedCursor) {
+        lastSeq = Number(savedCursor.seq) || 0;
+        epoch = savedCursor.epoch || null;
+      }
+    } catch (error) {
+      console.error('Failed to load results cursor:', error);
+    }
+
+    const poll = async () => {
+      while (active) {
+        try {
+          const response = await pollAgentResults(principal, lastSeq, epoch);
+          if (!active) return;
+          const { results } = response;
+          lastSeq = response.last_seq;
+          epoch = response.epoch;
+          localStorage.setItem(cursorKey, JSON.stringify({ seq: lastSeq, epoch }));
+          if (results.length > 0) {
+            const resultMessages: Message[] = results.map(result => ({
+              id: `result-${result.request_id}-${response.epoch}-${result.seq}`,
+              content: formatText(result.message),
+              timestamp: new Date(result.timestamp),
+              isUser: false,
+              type: result.kind === 'doctor_booking' ? 'appointment'
+                : result.kind === 'wellness' ? 'wellness'
+                : result.kind.startsWith('medicine') ? 'medicine'
+                : 'text',
+              metadata: { intent: result.kind, requestId: result.request_id }
+            }));
+            setMessages(prev => [...prev, ...resultMessages]);
+          }
+        } catch (error) {
+          // Agent unreachable: back off before polling again
+          await new Promise(resolve => setTimeout(resolve, 5000));
+        }
+      }
+    };
+
+    poll();
+    return () => {
+      active = false;
+    };
+  }, [principal]);
+
   // Auto-focus input after messages are loaded
   useEffect(() => {
     if (inputRef.current) {
@@ -244,8 +302,25 @@ Just speak naturally - I'll understand and connect you with the right healthcare
     try {
       const userIdToUse = principal || 'development_user_fallback';
       console.log('Sending chat message with user principal:', userIdToUse);
-      const data = await sendChatMessage(userInput, userIdToUse, uploadedFile);
-      
+      let data = await sendChatMessage(userInput, userIdToUse, uploadedFile);
+
+      // The agent's queue is full: tell the user, wait the suggested time and send again
+      for (let attempt = 1; data.communication_status === 'busy' && attempt <= MAX_BUSY_RETRIES; attempt++) {
+        const waitSeconds = Math.min(Math.max(data.retry_after ?? 1, 1), MAX_BUSY_WAIT_SECONDS);
+        const noticeId = `busy-${Date.now()}`;
+        setMessages(prev => [...prev, {
+          id: noticeId,
+          content: formatText(`The HealthAgent is busy right now. Retrying in ${Math.ceil(waitSeconds)} seconds (attempt ${attempt} of ${MAX_BUSY_RETRIES})...`),
+          timestamp: new Date(),
+          isUser: false,
+          type: 'text',
+          metadata: { intent: 'busy' }
+        }]);
+        await new Promise(resolve => setTimeout(resolve, waitSeconds * 1000));
+        setMessages(prev => prev.filter(msg => msg.id !== noticeId));
+        data = await sendChatMessage(userInput, userIdToUse, uploadedFile);
+      }
+
       let type: Message['type'] = 'text';
       if (data.intent === 'wellness') type = 'wellness';
       else if (data.intent === 'book_doctor') type = 'appointment';
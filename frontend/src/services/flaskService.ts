@@ -61,6 +61,8 @@ interface ApiResponse {
   request_id?: string;
   error?: string;
   message?: string;
+  communication_status?: string; // "busy" when the agent's chat queue is full
+  retry_after?: number; // seconds to wait before resending a busy message
 }
 
 // Chat directly with HealthAgent via REST API
@@ -103,6 +105,46 @@ export const sendChatMessage = async (
   }
 };
 
+// Outcome of an asynchronous request (booking, order, wellness log) made through chat
+export interface AgentResult {
+  seq: number;
+  request_id: string;
+  kind: string;
+  status: string;
+  message: string;
+  data: Record<string, any>;
+  timestamp: string;
+}
+
+// Long-poll the HealthAgent for results newer than `after`; resolves when one
+// arrives or after `timeoutSeconds` with an empty list. `epoch` is the one the
+// agent returned with `after`; if the agent restarted since, it resets the cursor
+export const pollAgentResults = async (
+  userId: string,
+  after: number = 0,
+  epoch: string | null = null,
+  timeoutSeconds: number = 25
+): Promise<{ results: AgentResult[]; last_seq: number; epoch: string }> => {
+  const response = await fetch(`${AGENT_BASE_URL}/api/results`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify({
+      user_id: userId,
+      after,
+      epoch,
+      timeout: timeoutSeconds,
+    }),
+  });
+
+  if (!response.ok) {
+    throw new Error(`HTTP error! status: ${response.status}`);
+  }
+
+  return await response.json();
+};
+
 // All healthcare requests now go through the main chat endpoint
 // The agent intelligently routes based on message content
 
@@ -49,6 +49,15 @@ BASE_URL=http://127.0.0.1:4943
 # API Keys - Get from https://asi1.ai/dashboard/api-keys
 ASI1_API_KEY=your_actual_api_key_here
 
+# Shared HealthAgent state: memory (default), sqlite or redis
+# STATE_BACKEND=sqlite
+# STATE_SQLITE_PATH=health_state.db
+# STATE_REDIS_URL=redis://localhost:6379/0
+# CONTEXT_TTL_SECONDS=1800
+
+# Run N HealthAgent workers behind a consistent-hash router on port 8000
+# HEALTH_AGENT_WORKERS=4
+
 EOL
     
     echo ""
@@ -53,8 +53,14 @@ cd fetch
 # Activate venv
 source venv/bin/activate
 
-echo "Starting Agent service on port 8000..."
-$PYTHON_CMD agent.py &
+if [ "${HEALTH_AGENT_WORKERS:-1}" -gt 1 ]; then
+    # Sharded mode: router on port 8000 pins each user to one of N agent workers
+    echo "Starting Agent router on port 8000 with $HEALTH_AGENT_WORKERS workers..."
+    $PYTHON_CMD router.py --workers "$HEALTH_AGENT_WORKERS" &
+else
+    echo "Starting Agent service on port 8000..."
+    $PYTHON_CMD agent.py &
+fi
 AGENT_PID=$!
 sleep 2
 